@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+製品の組立ページから組立番号画像・部品をまとめて検出して登録する（utils/batch_pipeline）
+
+製品ID（登録済みの組立ページ）またはページ画像のディレクトリを指定する。
+途中で止まった場合は同じコマンドで再実行すると、チェックポイントに記録済みのページを飛ばして続きから実行する。
+
+ローカルの Supabase（supabase start）に対して実行する場合は --supabase-url / --supabase-key
+（または環境変数 SUPABASE_URL / SUPABASE_KEY）にその URL と service_role キーを指定する。
+--output-dir を指定すると Supabase には書き込まず、画像と行をディレクトリに保存する。
+
+Usage:
+    python batch_pipeline.py --product-id <製品ID> [--workers 4] [--work-dir batch_work]
+    python batch_pipeline.py --pages-dir ./pages --product-id <製品ID> [--start-number 1] [--overwrite]
+    python batch_pipeline.py --pages-dir ./pages --output-dir ./batch_output
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.batch_pipeline import (Checkpoint, LocalWriter, SupabaseWriter, directory_page_jobs,
+                                  product_page_jobs, run_pipeline)
+from utils.logger import logger
+from utils.supabase_client import get_supabase_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--product-id', default=None,
+                        help='製品ID（--pages-dir なしの場合は登録済みの組立ページを処理する）')
+    parser.add_argument('--pages-dir', default=None,
+                        help='ページ画像のディレクトリ（ページ番号はファイル名の最後の数字）')
+    parser.add_argument('--output-dir', default=None,
+                        help='Supabase の代わりに画像と行を保存するディレクトリ')
+    parser.add_argument('--work-dir', default='batch_work',
+                        help='ダウンロードしたページ画像とチェックポイントの保存先')
+    parser.add_argument('--checkpoint', default=None,
+                        help='チェックポイントのファイル（省略時は work-dir/checkpoint_<製品ID or ディレクトリ名>.json）')
+    parser.add_argument('--workers', type=int, default=None, help='検出のプロセス数（省略時は CPU数）')
+    parser.add_argument('--upload-threads', type=int, default=4, help='画像アップロードのスレッド数')
+    parser.add_argument('--start-number', type=int, default=1, help='最初の組立番号')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='--pages-dir: 登録済みのページの画像もアップロードして image_url を置き換える')
+    parser.add_argument('--supabase-url', default=None, help='Supabase の URL（省略時は環境変数 SUPABASE_URL）')
+    parser.add_argument('--supabase-key', default=None, help='Supabase のキー（省略時は環境変数 SUPABASE_KEY）')
+    args = parser.parse_args()
+
+    if not args.product_id and not args.pages_dir:
+        parser.error('--product-id または --pages-dir を指定してください')
+    if args.pages_dir and not args.product_id and args.output_dir is None:
+        parser.error('--pages-dir を Supabase に登録する場合は --product-id も指定してください')
+
+    if args.supabase_url:
+        os.environ['SUPABASE_URL'] = args.supabase_url
+    if args.supabase_key:
+        os.environ['SUPABASE_KEY'] = args.supabase_key
+
+    # --pages-dir と --output-dir の組み合わせ以外は Supabase を使う
+    client = None if args.pages_dir and args.output_dir else get_supabase_client()
+    writer = LocalWriter(args.output_dir) if args.output_dir else SupabaseWriter(client)
+
+    work_dir = Path(args.work_dir)
+    if args.pages_dir:
+        jobs = directory_page_jobs(args.pages_dir, product_id=args.product_id, client=client,
+                                   overwrite=args.overwrite)
+        name = args.product_id or Path(args.pages_dir).resolve().name
+    else:
+        jobs = product_page_jobs(client, args.product_id, work_dir)
+        name = args.product_id
+    checkpoint = Checkpoint(args.checkpoint or work_dir / f"checkpoint_{name}.json")
+
+    print(f"{len(jobs)} pages (checkpoint: {checkpoint.path})")
+    summary = run_pipeline(jobs, writer, checkpoint, workers=args.workers,
+                           start_number=args.start_number, upload_threads=args.upload_threads)
+    logger.info(f"一括登録: product_id={args.product_id}, pages={summary['pages']}, "
+                f"skipped={summary['skipped']}, assembly_images={summary['assembly_images']}, "
+                f"parts={summary['parts']}, failed={summary['failed']}")
+    if summary['failed'] is not None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
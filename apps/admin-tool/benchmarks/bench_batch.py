@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+複数ページの一括検出（utils/batch_detection）のワーカー数によるスピードアップの計測
+
+サンプルの組立ページ（docs/AssemblyDiagram_sample）と合成ページを一時ディレクトリに JPEG で保存し、
+detect_pages（組立番号の領域 + 領域ごとの部品）をワーカー数を変えて実行する。
+  - ワーカー数ごとの全ページの処理時間（repeat 回の最小値）、ページ/秒、workers=1 に対するスピードアップ
+    （プロセスの起動も含む。結果が workers=1 と同じかも確認する）
+  - ページ1枚をワーカーに渡すコスト: pickle してパイプで送る（ProcessPoolExecutor の引数と同じ経路）時間と、
+    共有メモリへのコピーの時間、それぞれの転送バイト数
+
+Usage:
+    python benchmarks/bench_batch.py [--workers 1 --workers 2 --workers 4] [--synthetic 8] [--repeat 2] [--output batch.json]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Pipe
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import cv2
+
+from bench_pipeline import environment, sample_pages
+from synthetic_pages import generate_page
+from utils import batch_detection
+
+
+def default_workers():
+    """1, 2, 4, ... と CPU数"""
+    cpus = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 < cpus:
+        workers.append(workers[-1] * 2)
+    if cpus > 1:
+        workers.append(cpus)
+    return workers
+
+
+def write_pages(directory, synthetic):
+    """サンプルページと合成ページ（dpi 256 / 384 を交互に）を JPEG で保存してパスを返す"""
+    paths = list(sample_pages())
+    for seed in range(synthetic):
+        img, _ = generate_page(n_frames=12, clutter=1.0, dpi=(256, 384)[seed % 2], seed=seed)
+        path = os.path.join(directory, f"synthetic_{seed:02d}.jpg")
+        cv2.imwrite(path, img)
+        paths.append(path)
+    return paths
+
+
+def transfer_cost(path, repeat=5):
+    """ページ1枚をワーカーに渡すコスト（pickle + パイプと、共有メモリへのコピー）"""
+    img = cv2.imread(path)
+    data = pickle.dumps(img, protocol=pickle.HIGHEST_PROTOCOL)
+    pickled, copied = [], []
+    for _ in range(repeat):
+        sender, receiver = Pipe()
+        reader = threading.Thread(target=receiver.recv)
+        start = time.perf_counter()
+        reader.start()
+        sender.send(img)
+        reader.join()
+        pickled.append(time.perf_counter() - start)
+        sender.close()
+        receiver.close()
+
+        start = time.perf_counter()
+        shm = batch_detection._to_shared_memory(img)
+        copied.append(time.perf_counter() - start)
+        shm.close()
+        shm.unlink()
+    task = pickle.dumps(('psm_00000000', img.shape, img.dtype.str, {}))
+    return {
+        'shape': list(img.shape),
+        'pickle_s': round(min(pickled), 5), 'pickle_bytes': len(data),
+        'shared_memory_s': round(min(copied), 5), 'shared_memory_task_bytes': len(task),
+    }
+
+
+def run(paths, workers, repeat, opencv_threads=None):
+    """detect_pages の時間（最小値）と結果"""
+    best, records = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = batch_detection.detect_pages(paths, workers=workers, opencv_threads=opencv_threads,
+                                               lazy_upscale=True)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return round(best, 4), [{k: v for k, v in r.items() if k != 'seconds'} for r in records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, action='append',
+                        help='計測するワーカー数（省略時は 1, 2, 4, ... と CPU数）')
+    parser.add_argument('--opencv-threads', type=int, default=None,
+                        help='ワーカーごとの OpenCV のスレッド数（省略時は CPU数 // workers）')
+    parser.add_argument('--synthetic', type=int, default=8, help='サンプルに加える合成ページの枚数')
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--output', default=None, help='結果を保存する JSON')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_batch_')
+    try:
+        paths = write_pages(directory, args.synthetic)
+        results = {'environment': environment(), 'pages': len(paths), 'repeat': args.repeat,
+                   'transfer': transfer_cost(paths[0]), 'workers': {}}
+
+        t = results['transfer']
+        print(f"transfer of one {t['shape'][1]}x{t['shape'][0]} page: "
+              f"pickle {t['pickle_s'] * 1000:.1f}ms / {t['pickle_bytes'] / 2**20:.1f}MB, "
+              f"shared memory {t['shared_memory_s'] * 1000:.1f}ms / {t['shared_memory_task_bytes']}B per task\n")
+
+        print(f"{'workers':>7} {'total[s]':>9} {'pages/s':>8} {'speedup':>8} {'same':>5}")
+        reference, baseline = None, None
+        for workers in args.workers or default_workers():
+            seconds, records = run(paths, workers, args.repeat, args.opencv_threads)
+            if reference is None:
+                reference, baseline = records, seconds
+            entry = {'total_s': seconds, 'pages_per_s': round(len(paths) / seconds, 3),
+                     'speedup': round(baseline / seconds, 3), 'same': records == reference}
+            results['workers'][workers] = entry
+            print(f"{workers:>7} {seconds:>9.3f} {entry['pages_per_s']:>8.2f} {entry['speedup']:>7.2f}x "
+                  f"{str(entry['same']):>5}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"\nsaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+枠ごとのチェック（FRAME_CHECKS）の実行順の計測
+
+サンプルの組立ページ（docs/AssemblyDiagram_sample）と合成ページについて、以下を行う。
+  - チェックごとに、そのチェックを先頭にした順序で detect_assembly_regions を実行し、
+    全枠候補に対する 1回あたりの時間と除外率を DetectionStats.checks から集計する
+  - 除外1件あたりのコスト（1回あたりの時間 / 除外率）の小さい順に並べた順序を求める
+    （除外しないチェックは最後に、1回あたりの時間の小さい順）
+  - 'fixed' と求めた順序で、フィルタリング + 抽出後バリデーションの時間と結果を比較する
+
+求めた順序を image_processing.MEASURED_FILTER_ORDER に設定すると filter_order='measured' で使われる。
+
+Usage:
+    python benchmarks/bench_filter_order.py [--repeat 3] [--seeds 2] [--output filter_order.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import cv2
+
+from bench_pipeline import environment, sample_pages
+from synthetic_pages import generate_page
+from utils import image_processing as ip
+
+CHECK_STAGES = ('filtering', 'validation')
+
+
+def check_profile(pages):
+    """各チェックを先頭で実行したときの {name: {'calls', 'rejected', 'seconds'}}（全ページの合計）"""
+    default = tuple(ip.FRAME_CHECKS)
+    profile = {}
+    for name in default:
+        order = (name,) + tuple(n for n in default if n != name)
+        total = {'calls': 0, 'rejected': 0, 'seconds': 0.0}
+        for _, img in pages:
+            stats = ip.DetectionStats()
+            ip.detect_assembly_regions(img, filter_order=order, stats=stats)
+            for key in total:
+                total[key] += stats.checks[name][key]
+        profile[name] = total
+    return profile
+
+
+def cost_order(profile):
+    """除外1件あたりのコストの小さい順（除外しないチェックは最後に、1回あたりの時間の小さい順）"""
+    def rank(name):
+        entry = profile[name]
+        per_call = entry['seconds'] / max(entry['calls'], 1)
+        if entry['rejected'] == 0:
+            return (1, per_call)
+        return (0, entry['seconds'] / entry['rejected'])
+    return tuple(sorted(profile, key=rank))
+
+
+def check_time(img, filter_order, repeat):
+    """filter_order で実行したフィルタリング + 抽出後バリデーションの時間（最小値）と検出領域"""
+    best, regions = None, None
+    for _ in range(repeat):
+        stats = ip.DetectionStats()
+        regions = ip.detect_assembly_regions(img, filter_order=filter_order, stats=stats)
+        seconds = sum(stats.timings.get(s, 0.0) for s in CHECK_STAGES)
+        best = seconds if best is None else min(best, seconds)
+    return round(best, 5), regions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seeds', type=int, default=2, help='合成ページの枚数（解像度ごと）')
+    parser.add_argument('--dpi', type=int, action='append', help='合成ページの解像度（省略時は 256 と 384）')
+    parser.add_argument('--output', default=None, help='結果を保存する JSON')
+    args = parser.parse_args()
+
+    pages = [(os.path.basename(p), cv2.imread(p)) for p in sample_pages()]
+    for dpi in args.dpi or [256, 384]:
+        for seed in range(args.seeds):
+            img, _ = generate_page(n_frames=12, clutter=1.0, dpi=dpi, seed=seed)
+            pages.append((f"synthetic_dpi{dpi}_seed{seed}", img))
+
+    profile = check_profile(pages)
+    order = cost_order(profile)
+    print(f"{'check':<18} {'calls':>6} {'rejected':>8} {'rate':>6} {'per call[ms]':>12} {'per reject[ms]':>14}")
+    for name in order:
+        entry = profile[name]
+        rate = entry['rejected'] / max(entry['calls'], 1)
+        per_call = entry['seconds'] / max(entry['calls'], 1) * 1000
+        per_reject = entry['seconds'] / entry['rejected'] * 1000 if entry['rejected'] else float('inf')
+        print(f"{name:<18} {entry['calls']:>6} {entry['rejected']:>8} {rate:>6.2f} {per_call:>12.2f} {per_reject:>14.2f}")
+    print(f"\nmeasured order: {order}")
+
+    results = {'environment': environment(), 'repeat': args.repeat, 'profile': profile,
+               'order': list(order), 'pages': {}}
+    print(f"\n{'page':<34} {'fixed[s]':>9} {'measured[s]':>11} {'same':>5}")
+    for name, img in pages:
+        fixed_s, fixed_regions = check_time(img, 'fixed', args.repeat)
+        ordered_s, ordered_regions = check_time(img, order, args.repeat)
+        same = ordered_regions == fixed_regions
+        results['pages'][name] = {'fixed_s': fixed_s, 'measured_s': ordered_s, 'same': same}
+        print(f"{name:<34} {fixed_s:>9.3f} {ordered_s:>11.3f} {str(same):>5}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"\nsaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
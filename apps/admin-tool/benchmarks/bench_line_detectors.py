@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+枠線検出（HoughLinesP / モルフォロジー / 3色まとめたモルフォロジー）の速度と精度の比較
+
+サンプルの組立ページ（docs/AssemblyDiagram_sample）と合成ページについて、以下を比較する。
+  - 色マスク（赤・黒・青）ごとの線検出の時間と、線から作った矩形の一致度
+    （IoU 0.9 以上で対応づけ、'hough' の矩形のうち 'morph' でも見つかった割合と座標の最大差）
+  - 3色の線検出の合計時間（'morph' を色ごとに3回）と 'fused'（_detect_lines_fused を1回）、
+    および両者の線が一致するか
+  - detect_assembly_regions 全体の時間と、検出領域の一致度（合成ページは期待枠の再現率・適合率も）
+
+Usage:
+    python benchmarks/bench_line_detectors.py [--repeat 3] [--seeds 2] [--output line_detectors.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import cv2
+
+from bench_pipeline import environment, measure, sample_pages
+from synthetic_pages import frame_precision, frame_recall, generate_page
+from utils import image_processing as ip
+
+COLORS = ('red', 'black', 'blue')
+REGION_KEYS = ('region_x', 'region_y', 'region_width', 'region_height')
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    return inter / (aw * ah + bw * bh - inter) if inter else 0.0
+
+
+def match_boxes(reference, other, min_iou=0.9):
+    """reference の各矩形に IoU 最大の other の矩形を対応づけ、(一致率, 座標の最大差) を返す"""
+    if not reference:
+        return 1.0, 0
+    matched, max_diff = 0, 0
+    for box in reference:
+        best = max(other, key=lambda o: _iou(box, o), default=None)
+        if best is not None and _iou(box, best) >= min_iou:
+            matched += 1
+            max_diff = max(max_diff, max(abs(int(p) - int(q)) for p, q in zip(box, best)))
+    return round(matched / len(reference), 3), max_diff
+
+
+def compare_masks(img, repeat):
+    """色マスクごとに 'hough' と 'morph' の時間と矩形の一致度、3色まとめた 'fused' の時間を返す"""
+    page = ip.PageAnalysis(img)
+    min_line_length = max(50, min(page.width, page.height) // 20)
+    result = {}
+    for color in COLORS:
+        mask = page.mask(color)
+        entry = {}
+        boxes = {}
+        for detector in ('hough', 'morph'):
+            stats, (h_lines, v_lines) = measure(ip._detect_frame_lines, repeat, mask, detector,
+                                                min_line_length=min_line_length)
+            min_w, min_h = (60, 40) if color == 'blue' else (80, 60)
+            rects = ip._rectangles_from_frame_lines(h_lines, v_lines, page.width, page.height, min_w, min_h)
+            rects = ip._remove_duplicate_rectangles(rects)
+            boxes[detector] = [r['bbox'] for r in rects]
+            entry[detector] = {'best_s': stats['best_s'], 'lines': len(h_lines) + len(v_lines),
+                               'rectangles': len(rects)}
+        entry['matched'], entry['max_diff_px'] = match_boxes(boxes['hough'], boxes['morph'])
+        result[color] = entry
+
+    masks = {color: page.mask(color) for color in COLORS}
+    morph_stats, morph_lines = measure(
+        lambda: {c: ip._detect_lines_morph(m, min_line_length) for c, m in masks.items()}, repeat)
+    fused_stats, fused_lines = measure(ip._detect_lines_fused, repeat, masks, min_line_length)
+    result['all'] = {'morph': {'best_s': morph_stats['best_s']}, 'fused': {'best_s': fused_stats['best_s']},
+                     'identical': morph_lines == fused_lines}
+    return result
+
+
+def compare_regions(img, repeat, expected=None):
+    """detect_assembly_regions 全体を両方の検出器で実行して比較する"""
+    result = {}
+    regions = {}
+    for detector in ip.LINE_DETECTORS:
+        stats, found = measure(ip.detect_assembly_regions, repeat, img, line_detector=detector)
+        regions[detector] = found
+        entry = {'best_s': stats['best_s'], 'regions': len(found)}
+        if expected is not None:
+            entry['recall'] = round(frame_recall(found, expected), 3)
+            entry['precision'] = round(frame_precision(found, expected), 3)
+        result[detector] = entry
+    boxes = {d: [tuple(r[k] for k in REGION_KEYS) for r in found] for d, found in regions.items()}
+    result['matched'], result['max_diff_px'] = match_boxes(boxes['hough'], boxes['morph'])
+    result['fused_identical'] = regions['fused'] == regions['morph']
+    return result
+
+
+def print_row(name, masks, regions):
+    line_times = ' '.join(f"{masks[c]['hough']['best_s']:>7.3f}/{masks[c]['morph']['best_s']:<7.3f}" for c in COLORS)
+    matched = ' '.join(f"{masks[c]['matched']:>5.2f}" for c in COLORS)
+    fused = masks['all']
+    print(f"{name:<34} {line_times} {matched}  "
+          f"{fused['morph']['best_s']:>7.3f}/{fused['fused']['best_s']:<7.3f} {str(fused['identical']):>5}  "
+          f"{regions['hough']['best_s']:>7.3f}/{regions['morph']['best_s']:>7.3f}/{regions['fused']['best_s']:<7.3f} "
+          f"{regions['hough']['regions']:>3}/{regions['morph']['regions']:<3} "
+          f"{regions['matched']:>5.2f} {regions['max_diff_px']:>4} {str(regions['fused_identical']):>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seeds', type=int, default=2, help='合成ページの枚数（解像度ごと）')
+    parser.add_argument('--dpi', type=int, action='append', help='合成ページの解像度（省略時は 256 と 384）')
+    parser.add_argument('--output', default=None, help='結果を保存する JSON')
+    args = parser.parse_args()
+
+    pages = [(os.path.basename(p), cv2.imread(p), None) for p in sample_pages()]
+    for dpi in args.dpi or [256, 384]:
+        for seed in range(args.seeds):
+            img, info = generate_page(n_frames=12, clutter=1.0, dpi=dpi, seed=seed)
+            pages.append((f"synthetic_dpi{dpi}_seed{seed}", img, info['expected']))
+
+    print(f"{'page':<34} " + ' '.join(f"{c + ' hough/morph[s]':>15}" for c in COLORS)
+          + '  match(r/k/b)  3 colors morph/fused[s] same'
+          + '  regions hough/morph/fused[s]  count  match diff fused=morph')
+    results = {'environment': environment(), 'repeat': args.repeat, 'pages': {}}
+    for name, img, expected in pages:
+        masks = compare_masks(img, args.repeat)
+        regions = compare_regions(img, args.repeat, expected)
+        results['pages'][name] = {'shape': list(img.shape[:2]), 'masks': masks, 'regions': regions}
+        print_row(name, masks, regions)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"\nsaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+画像処理パイプライン全体のベンチマーク（docs/AssemblyDiagram_sample を使用）
+
+サンプルの組立ページごとに以下を計測し、JSON に保存する。
+  - extract_assembly_images（return_stats=True によるステージ別内訳と件数）
+  - extract_parts（ページから切り出した組立番号画像ごと）
+  - NumberExtractor.extract（組立番号の下の数字をテンプレートとして使用）
+  - create_transparent_crop（組立番号画像の領域）
+
+時間は repeat 回のうち最小値と中央値、メモリは tracemalloc のピーク
+（Python / NumPy の確保分。OpenCV 内部の一時バッファは含まれない）。
+--compare で以前の JSON と比較し、閾値を超えて遅くなった項目があれば終了コード 1 を返す。
+
+Usage:
+    python benchmarks/bench_pipeline.py [--repeat 3] [--workers 1] [--opencv-threads 1] [--output benchmarks/baseline_pipeline.json]
+    python benchmarks/bench_pipeline.py --compare benchmarks/baseline_pipeline.json [--threshold 1.25]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import cv2
+import numpy as np
+
+from utils import image_processing as ip
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'docs', 'AssemblyDiagram_sample')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), 'baseline_pipeline.json')
+
+STAGES = ('masks', 'hough', 'rectangles', 'nms', 'filtering', 'validation')
+
+
+def sample_pages():
+    """組立ページ全体のサンプル（部品単体の *_parts*.jpg は除く）"""
+    paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, 'AssemblyDiagram*.jpg')))
+    return [p for p in paths if '_parts' not in os.path.basename(p)]
+
+
+def measure(func, repeat, *args, **kwargs):
+    """func を repeat 回実行し、時間（最小・中央値）とメモリのピークを返す"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    # メモリ計測は tracemalloc のオーバーヘッドを時間に含めないよう別に1回実行
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = {
+        'best_s': round(min(times), 5),
+        'median_s': round(statistics.median(times), 5),
+        'peak_mb': round(peak / 2**20, 2),
+    }
+    return stats, result
+
+
+def number_template_bbox(img, region):
+    """
+    NumberExtractor 用のテンプレート枠を決める。
+    組立番号画像の下端付近で _find_nearby_number と同じ条件を満たす、最も左の数字を使う。
+    """
+    x, y, w, h = (region[k] for k in ('region_x', 'region_y', 'region_width', 'region_height'))
+    y0 = max(y, y + h - 110)
+    gray = cv2.cvtColor(img[y0:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(gray, 120, 255, cv2.THRESH_BINARY_INV)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    digits = []
+    for cnt in contours:
+        if 200 < cv2.contourArea(cnt) < 50000:
+            bx, by, bw, bh = cv2.boundingRect(cnt)
+            if 0.2 < bw / bh < 4.0 and bh > 12:
+                digits.append((bx, by, bw, bh))
+    if not digits:
+        return (x, max(y, y + h - 80), min(w, 80), min(h, 60))
+
+    bx, by, bw, bh = min(digits)
+    pad = 5
+    return (x + bx - pad, y0 + by - pad, bw + 2 * pad, bh + 2 * pad)
+
+
+def bench_page(path, repeat, workers=1):
+    img = cv2.imread(path)
+    name = os.path.basename(path)
+    entry = {'shape': list(img.shape[:2])}
+
+    entry['extract_assembly_images'], assembly = measure(
+        ip.extract_assembly_images, repeat, img, return_coords=True, workers=workers)
+    entry['extract_assembly_images']['count'] = len(assembly)
+
+    # ステージ別内訳（各ステージの最小値）と件数
+    stage_runs = [ip.extract_assembly_images(img, workers=workers, return_stats=True)[1] for _ in range(repeat)]
+    entry['stages'] = {s: round(min(run.timings.get(s, 0.0) for run in stage_runs), 5) for s in STAGES}
+    entry['counts'] = stage_runs[0].counts
+
+    parts_runs = []
+    crop_runs = []
+    for item in assembly:
+        assembly_bgr = cv2.cvtColor(np.array(item['image']), cv2.COLOR_RGB2BGR)
+        stats, parts = measure(ip.extract_parts, repeat, assembly_bgr)
+        stats['count'] = len(parts)
+        parts_runs.append(stats)
+
+        stats, _ = measure(ip.create_transparent_crop, repeat, img,
+                           item['region_x'], item['region_y'],
+                           item['region_width'], item['region_height'])
+        crop_runs.append(stats)
+    entry['extract_parts'] = parts_runs
+    entry['create_transparent_crop'] = crop_runs
+
+    if assembly:
+        template = number_template_bbox(img, assembly[0])
+        extractor = ip.NumberExtractor()
+        stats, result = measure(extractor.extract, repeat, img, template)
+        stats['template_bbox'] = [int(v) for v in template]
+        stats['count'] = len(result['regions'])
+        entry['number_extractor'] = stats
+
+    return name, entry
+
+
+def environment():
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+    }
+
+
+def flatten_timings(results):
+    """比較用に {'page/項目': 秒} の辞書にする"""
+    flat = {}
+    for name, entry in results['pages'].items():
+        flat[f"{name}/extract_assembly_images"] = entry['extract_assembly_images']['best_s']
+        for stage, seconds in entry['stages'].items():
+            flat[f"{name}/stages/{stage}"] = seconds
+        flat[f"{name}/extract_parts"] = sum(r['best_s'] for r in entry['extract_parts'])
+        flat[f"{name}/create_transparent_crop"] = sum(r['best_s'] for r in entry['create_transparent_crop'])
+        if 'number_extractor' in entry:
+            flat[f"{name}/number_extractor"] = entry['number_extractor']['best_s']
+    return flat
+
+
+def compare(current, baseline_path, threshold, min_seconds):
+    """ベースラインと比較して表示し、回帰した項目数を返す"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    old = flatten_timings(baseline)
+    new = flatten_timings(current)
+    regressions = 0
+    print(f"\n{'item':<60} {'baseline[s]':>12} {'current[s]':>11} {'ratio':>7}")
+    for key in sorted(new):
+        if key not in old:
+            continue
+        ratio = new[key] / max(old[key], 1e-9)
+        # ごく短い処理はノイズが大きいので回帰判定から外す
+        regressed = ratio > threshold and new[key] >= min_seconds
+        regressions += regressed
+        mark = '  <-- regression' if regressed else ''
+        print(f"{key:<60} {old[key]:>12.4f} {new[key]:>11.4f} {ratio:>6.2f}x{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='extract_assembly_images の枠ごとのチェックのスレッド数')
+    parser.add_argument('--opencv-threads', type=int, default=None,
+                        help='OpenCV のスレッド数（cv2.setNumThreads。省略時は変更しない）')
+    parser.add_argument('--output', default=None,
+                        help=f'結果を保存する JSON（--compare なしの既定: {DEFAULT_OUTPUT}）')
+    parser.add_argument('--compare', default=None, help='比較するベースライン JSON')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='ベースラインに対するこの倍率を超えたら回帰とみなす')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='これより短い項目は回帰判定しない')
+    args = parser.parse_args()
+    if args.opencv_threads is not None:
+        cv2.setNumThreads(args.opencv_threads)
+
+    results = {'environment': environment(), 'repeat': args.repeat, 'workers': args.workers, 'pages': {}}
+    print(f"{'page':<34} {'size':>10} {'frames':>6} {'assembly[s]':>11} {'peak[MB]':>8}  "
+          + ' '.join(f"{s:>10}" for s in STAGES))
+    for path in sample_pages():
+        name, entry = bench_page(path, args.repeat, args.workers)
+        results['pages'][name] = entry
+        a = entry['extract_assembly_images']
+        size = 'x'.join(str(v) for v in entry['shape'])
+        print(f"{name:<34} {size:>10} {a['count']:>6} {a['best_s']:>11.3f} {a['peak_mb']:>8.1f}  "
+              + ' '.join(f"{entry['stages'][s]:>10.3f}" for s in STAGES))
+
+    results['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    output = args.output or (None if args.compare else DEFAULT_OUTPUT)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"\nsaved: {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n{regressions} regression(s) over {args.threshold}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+矩形組み立て（_find_rectangles_from_lines）のベンチマーク
+
+線分数を増やしながら、旧実装（_find_rectangles_from_lines_reference）と
+新実装の実行時間を比較する。旧実装は時間がかかりすぎるサイズではスキップする。
+
+Usage:
+    python benchmarks/bench_rectangles.py [--max-lines 800] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from utils.image_processing import (
+    MAX_RECTANGLE_CANDIDATES,
+    _find_rectangles_from_lines,
+    _find_rectangles_from_lines_reference,
+)
+
+IMG_W = 3000
+IMG_H = 2150
+
+
+def make_lines(n_lines: int, seed: int = 0):
+    """マニュアルページ風の線分（枠の辺 + ランダムな短い線）を生成する"""
+    rng = np.random.default_rng(seed)
+    h_lines, v_lines = [], []
+
+    # 半分は枠の辺（矩形を形成する線）
+    n_frames = max(1, n_lines // 8)
+    for _ in range(n_frames):
+        w = int(rng.integers(100, 600))
+        h = int(rng.integers(80, 500))
+        x = int(rng.integers(0, IMG_W - w))
+        y = int(rng.integers(0, IMG_H - h))
+        h_lines += [(x, x + w, y), (x, x + w, y + h)]
+        v_lines += [(y, y + h, x), (y, y + h, x + w)]
+
+    # 残りはノイズ線
+    while len(h_lines) + len(v_lines) < n_lines:
+        length = int(rng.integers(50, 800))
+        if rng.random() < 0.5:
+            x = int(rng.integers(0, IMG_W - length))
+            h_lines.append((x, x + length, int(rng.integers(0, IMG_H))))
+        else:
+            y = int(rng.integers(0, IMG_H - length))
+            v_lines.append((y, y + length, int(rng.integers(0, IMG_W))))
+
+    h_lines.sort(key=lambda l: l[2])
+    v_lines.sort(key=lambda l: l[2])
+    return h_lines, v_lines
+
+
+def time_call(func, repeat, *args, **kwargs):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--max-lines', type=int, default=800)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--reference-limit', type=float, default=20.0,
+                        help='旧実装の1回あたりの実行時間がこの秒数を超えたら以降スキップ')
+    args = parser.parse_args()
+
+    kwargs = dict(min_width=80, min_height=60, img_width=IMG_W, img_height=IMG_H)
+
+    print(f"max_candidates = {MAX_RECTANGLE_CANDIDATES}")
+    print(f"{'lines':>6} {'rects':>7} {'reference[s]':>13} {'engine[s]':>10} {'speedup':>8} {'same':>5}")
+    skip_reference = False
+    n_lines = 25
+    while n_lines <= args.max_lines:
+        h_lines, v_lines = make_lines(n_lines)
+        t_new, rects = time_call(_find_rectangles_from_lines, args.repeat, h_lines, v_lines, **kwargs)
+
+        if skip_reference:
+            print(f"{n_lines:>6} {len(rects):>7} {'-':>13} {t_new:>10.4f} {'-':>8} {'-':>5}")
+        else:
+            t_ref, ref = time_call(_find_rectangles_from_lines_reference, 1, h_lines, v_lines, **kwargs)
+            # 上限に達した場合は先頭部分が一致することを確認する
+            same = ([r['bbox'] for r in rects] ==
+                     [tuple(int(v) for v in r['bbox']) for r in ref[:len(rects)]])
+            print(f"{n_lines:>6} {len(rects):>7} {t_ref:>13.4f} {t_new:>10.4f} "
+                  f"{t_ref / max(t_new, 1e-9):>7.1f}x {str(same):>5}")
+            skip_reference = t_ref > args.reference_limit
+
+        n_lines *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+合成ページによるスケーリングベンチマーク
+
+synthetic_pages.generate_page で枠の数・クラッタ（線の密度）・解像度をそれぞれ変えたページを作り、
+extract_assembly_images と extract_parts（抽出された組立番号画像すべて）の
+実行時間と tracemalloc のピークを計測する。検出精度（期待枠の再現率・適合率）も記録する。
+
+結果は JSON に保存し、matplotlib がインストールされていればパラメータごとのグラフ（PNG）も出力する。
+
+Usage:
+    python benchmarks/bench_scaling.py [--repeat 1] [--seeds 2] [--output scaling.json] [--plot scaling.png]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import cv2
+import numpy as np
+
+from bench_pipeline import environment, measure
+from synthetic_pages import REFERENCE_DPI, frame_precision, frame_recall, generate_page
+from utils import image_processing as ip
+
+DEFAULTS = {'n_frames': 8, 'clutter': 0.5, 'dpi': REFERENCE_DPI}
+
+SWEEPS = {
+    'n_frames': [2, 4, 8, 16, 32],
+    'clutter': [0.0, 0.25, 0.5, 1.0, 2.0],
+    'dpi': [128, 192, 256, 384, 512],
+}
+
+
+def run_point(params, repeat, seeds):
+    """1つのパラメータの組み合わせを seeds 枚のページで計測し、平均を返す"""
+    rows = []
+    for seed in range(seeds):
+        img, info = generate_page(seed=seed, **params)
+        assembly_stats, assembly = measure(ip.extract_assembly_images, repeat, img, return_coords=True)
+
+        parts_s, parts_peak, parts_count = 0.0, 0.0, 0
+        for item in assembly:
+            assembly_bgr = cv2.cvtColor(np.array(item['image']), cv2.COLOR_RGB2BGR)
+            stats, parts = measure(ip.extract_parts, repeat, assembly_bgr)
+            parts_s += stats['best_s']
+            parts_peak = max(parts_peak, stats['peak_mb'])
+            parts_count += len(parts)
+
+        regions = [{k: v for k, v in a.items() if k != 'image'} for a in assembly]
+        rows.append({
+            'assembly_s': assembly_stats['best_s'],
+            'assembly_peak_mb': assembly_stats['peak_mb'],
+            'parts_s': parts_s,
+            'parts_peak_mb': parts_peak,
+            'frames': len(assembly),
+            'parts': parts_count,
+            'recall': frame_recall(regions, info['expected']),
+            'precision': frame_precision(regions, info['expected']),
+        })
+
+    result = {k: round(float(np.mean([r[k] for r in rows])), 4) for k in rows[0]}
+    result['pixels'] = int(img.shape[0] * img.shape[1])
+    return result
+
+
+def plot(results, path):
+    """パラメータごとに時間とメモリのグラフを描く（matplotlib がなければスキップ）"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping plot")
+        return
+
+    fig, axes = plt.subplots(2, len(SWEEPS), figsize=(5 * len(SWEEPS), 8))
+    for col, (param, points) in enumerate(results['sweeps'].items()):
+        xs = [p['value'] for p in points]
+        ax_t, ax_m = axes[0][col], axes[1][col]
+        ax_t.plot(xs, [p['assembly_s'] for p in points], 'o-', label='extract_assembly_images')
+        ax_t.plot(xs, [p['parts_s'] for p in points], 's-', label='extract_parts (all frames)')
+        ax_t.set_xlabel(param)
+        ax_t.set_ylabel('time [s]')
+        ax_t.legend()
+        ax_m.plot(xs, [p['assembly_peak_mb'] for p in points], 'o-', label='extract_assembly_images')
+        ax_m.plot(xs, [p['parts_peak_mb'] for p in points], 's-', label='extract_parts')
+        ax_m.set_xlabel(param)
+        ax_m.set_ylabel('tracemalloc peak [MB]')
+        ax_m.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"saved: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seeds', type=int, default=2, help='各点で平均するページ数')
+    parser.add_argument('--sweep', choices=list(SWEEPS), action='append',
+                        help='実行するパラメータ（省略時はすべて）')
+    parser.add_argument('--output', default='scaling.json')
+    parser.add_argument('--plot', default='scaling.png')
+    args = parser.parse_args()
+
+    results = {'environment': environment(), 'defaults': DEFAULTS, 'sweeps': {}}
+    for param in args.sweep or SWEEPS:
+        print(f"\n{param:>10} {'pixels':>10} {'frames':>6} {'recall':>6} {'prec':>6} "
+              f"{'assembly[s]':>11} {'peak[MB]':>8} {'parts[s]':>8} {'peak[MB]':>8}")
+        points = []
+        for value in SWEEPS[param]:
+            params = dict(DEFAULTS, **{param: value})
+            point = {'value': value, **run_point(params, args.repeat, args.seeds)}
+            points.append(point)
+            print(f"{value:>10} {point['pixels']:>10} {point['frames']:>6.1f} {point['recall']:>6.2f} "
+                  f"{point['precision']:>6.2f} {point['assembly_s']:>11.3f} {point['assembly_peak_mb']:>8.1f} "
+                  f"{point['parts_s']:>8.3f} {point['parts_peak_mb']:>8.1f}")
+        results['sweeps'][param] = points
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    print(f"\nsaved: {args.output}")
+    plot(results, args.plot)
+
+
+if __name__ == "__main__":
+    main()
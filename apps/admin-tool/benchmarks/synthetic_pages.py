@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+マニュアルのレイアウトを模した合成組立ページの生成
+
+上段に部品一覧枠（赤/黒の枠・部品・"x1" などの数量ラベル・枠の下の組立番号）を格子状に並べ、
+下段にメインの組立図（線画のクラッタ）を描く。一部の枠は矢印でメイン図とつなぎ、
+一部は青枠で囲む（どちらも extract_assembly_images では除外される枠）。
+
+パラメータ:
+    n_frames: 部品一覧枠の数
+    clutter: メイン図の線画の密度（0 で線画なし、1.0 で約300本）
+    dpi: 解像度（REFERENCE_DPI で docs/AssemblyDiagram_sample/AssemblyDiagram.jpg とほぼ同じ 3000x2150）
+
+Usage:
+    python benchmarks/synthetic_pages.py --frames 12 --clutter 0.5 --dpi 256 -o /tmp/page.png
+"""
+
+import argparse
+import math
+
+import cv2
+import numpy as np
+
+REFERENCE_DPI = 256
+PAGE_INCHES = (11.69, 8.27)  # A4 横
+
+RED = (0, 0, 220)
+BLACK = (30, 30, 30)
+BLUE = (200, 80, 0)
+
+
+def _draw_part(img, rng, cx, cy, size, s):
+    """部品（灰色の塗り + 黒の輪郭の楕円か多角形）を描く"""
+    shade = int(rng.integers(120, 200))
+    if rng.random() < 0.5:
+        axes = (int(size * rng.uniform(0.3, 0.5)), int(size * rng.uniform(0.15, 0.4)))
+        angle = float(rng.uniform(0, 180))
+        cv2.ellipse(img, (cx, cy), axes, angle, 0, 360, (shade, shade, shade), -1)
+        cv2.ellipse(img, (cx, cy), axes, angle, 0, 360, BLACK, max(1, int(2 * s)))
+    else:
+        n = int(rng.integers(4, 8))
+        angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+        radius = size * rng.uniform(0.25, 0.5, n)
+        pts = np.stack([cx + radius * np.cos(angles), cy + radius * np.sin(angles)], axis=1)
+        pts = pts.astype(np.int32).reshape(-1, 1, 2)
+        cv2.fillPoly(img, [pts], (shade, shade, shade))
+        cv2.polylines(img, [pts], True, BLACK, max(1, int(2 * s)))
+
+
+def _draw_frame(img, rng, bbox, color, number, s):
+    """部品一覧枠（枠線・部品・数量ラベル）と枠の下の組立番号を描く"""
+    x, y, w, h = bbox
+    cv2.rectangle(img, (x, y), (x + w, y + h), color, max(2, int(3 * s)))
+
+    # 部品と数量ラベル
+    n_parts = int(rng.integers(1, 4))
+    slot = w // n_parts
+    font_scale = 0.9 * s
+    for i in range(n_parts):
+        cx = x + slot * i + slot // 2
+        cy = y + int(h * 0.4)
+        _draw_part(img, rng, cx, cy, min(slot, h) * 0.6, s)
+        label = f"x{int(rng.integers(1, 5))}"
+        (tw, _), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, max(1, int(2 * s)))
+        cv2.putText(img, label, (cx - tw // 2, y + int(h * 0.85)),
+                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, RED, max(1, int(2 * s)), cv2.LINE_AA)
+
+    # 小さな青いインジケーター（枠の右上）
+    if rng.random() < 0.3:
+        size = int(28 * s)
+        cv2.rectangle(img, (x + w - size - int(8 * s), y + int(8 * s)),
+                      (x + w - int(8 * s), y + int(8 * s) + size), BLUE, max(1, int(2 * s)))
+
+    # 組立番号（枠の左下の外側）
+    cv2.putText(img, str(number), (x + int(5 * s), y + h + int(60 * s)),
+                cv2.FONT_HERSHEY_SIMPLEX, 2.0 * s, BLACK, max(2, int(5 * s)), cv2.LINE_AA)
+
+
+def _draw_clutter(img, rng, area, clutter, s):
+    """メイン図の線画（直線・折れ線・円・塗り）を area (x1, y1, x2, y2) 内に描く"""
+    x1, y1, x2, y2 = area
+    n_strokes = int(round(clutter * 300))
+
+    def point():
+        return int(rng.integers(x1, x2)), int(rng.integers(y1, y2))
+
+    def near(p, reach=int(250 * s)):
+        return (int(np.clip(p[0] + rng.integers(-reach, reach + 1), x1, x2)),
+                int(np.clip(p[1] + rng.integers(-reach, reach + 1), y1, y2)))
+
+    for _ in range(n_strokes):
+        kind = rng.random()
+        thickness = max(1, int(rng.integers(1, 4) * s))
+        if kind < 0.5:
+            start = point()
+            cv2.line(img, start, near(start), BLACK, thickness, cv2.LINE_AA)
+        elif kind < 0.75:
+            pts = [point()]
+            for _ in range(int(rng.integers(2, 5))):
+                pts.append(near(pts[-1]))
+            pts = np.array(pts, dtype=np.int32)
+            cv2.polylines(img, [pts.reshape(-1, 1, 2)], False, BLACK, thickness, cv2.LINE_AA)
+        elif kind < 0.9:
+            cx, cy = point()
+            r = int(rng.integers(10, 80) * s)
+            cv2.circle(img, (cx, cy), r, BLACK, thickness, cv2.LINE_AA)
+        else:
+            cx, cy = point()
+            r = int(rng.integers(10, 60) * s)
+            shade = int(rng.integers(150, 230))
+            cv2.circle(img, (cx, cy), r, (shade, shade, shade), -1)
+
+
+def generate_page(n_frames: int = 8, clutter: float = 0.5, dpi: int = REFERENCE_DPI,
+                  arrow_ratio: float = 0.25, blue_ratio: float = 0.1, seed: int = 0):
+    """
+    合成組立ページを生成する。
+
+    Args:
+        n_frames: 部品一覧枠の数
+        clutter: メイン図の線画の密度
+        dpi: 解像度
+        arrow_ratio: 最下段の枠のうち、矢印でメイン図とつなぐ割合
+        blue_ratio: 青枠で囲む枠の割合
+        seed: 乱数シード
+
+    Returns:
+        (img, info)
+        img: BGR 画像
+        info: {'size': (w, h), 'frames': [{'bbox', 'color', 'number', 'arrow', 'in_blue'}],
+               'expected': extract_assembly_images で抽出されるべき枠の bbox のリスト}
+    """
+    rng = np.random.default_rng(seed)
+    s = dpi / REFERENCE_DPI
+    page_w, page_h = int(PAGE_INCHES[0] * dpi), int(PAGE_INCHES[1] * dpi)
+    img = np.full((page_h, page_w, 3), 255, dtype=np.uint8)
+
+    # 上段: 部品一覧枠の格子 / 下段: メイン図
+    margin = int(40 * s)
+    band_h = int(page_h * 0.55)
+    cols = max(1, math.ceil(math.sqrt(n_frames * (page_w / band_h))))
+    rows = max(1, math.ceil(n_frames / cols))
+    cols = max(1, math.ceil(n_frames / rows))
+    cell_w = (page_w - 2 * margin) // cols
+    cell_h = (band_h - margin) // rows
+    gap = int(30 * s)
+    number_space = int(80 * s)
+
+    frames = []
+    for i in range(n_frames):
+        row, col = divmod(i, cols)
+        # 実際のページと同じく、隣の枠と辺の位置がそろわないようにずらす
+        w = int((cell_w - 2 * gap) * rng.uniform(0.7, 0.95))
+        h = int((cell_h - number_space - gap) * rng.uniform(0.7, 0.95))
+        x = margin + col * cell_w + gap + int(rng.integers(0, cell_w - 2 * gap - w + 1))
+        y = margin + row * cell_h + gap // 2 + int(rng.integers(0, cell_h - number_space - gap - h + 1))
+        color = RED if i % 2 == 0 else BLACK
+        _draw_frame(img, rng, (x, y, w, h), color, i + 1, s)
+        frames.append({'bbox': (x, y, w, h), 'color': 'red' if color == RED else 'black',
+                       'number': i + 1, 'arrow': False, 'in_blue': False})
+
+    # 青枠で囲まれた枠
+    pad = int(15 * s)
+    for frame in frames:
+        if rng.random() < blue_ratio:
+            x, y, w, h = frame['bbox']
+            cv2.rectangle(img, (x - pad, y - pad), (x + w + pad, y + h + number_space),
+                          BLUE, max(2, int(3 * s)))
+            frame['in_blue'] = True
+
+    # メイン図
+    drawing = (margin, band_h + margin, page_w - margin, page_h - margin)
+    _draw_clutter(img, rng, drawing, clutter, s)
+
+    # 最下段の枠の一部を矢印でメイン図とつなぐ（矢印の先端が枠の下辺）
+    bottom_row = [f for f in frames if f['bbox'][1] + f['bbox'][3] + cell_h > band_h]
+    for frame in bottom_row:
+        if frame['in_blue'] or rng.random() >= arrow_ratio:
+            continue
+        x, y, w, h = frame['bbox']
+        tip = (x + w // 2, y + h)
+        tail = (int(tip[0] + rng.uniform(-0.5, 0.5) * w), int(rng.integers(drawing[1] + 50, drawing[3])))
+        # 矢じりの線も枠の辺に接するので、検出器は2本以上の接続として扱う
+        length = math.hypot(tip[0] - tail[0], tip[1] - tail[1])
+        cv2.arrowedLine(img, tail, tip, BLACK, max(2, int(3 * s)), cv2.LINE_AA,
+                        tipLength=60 * s / length)
+        frame['arrow'] = True
+
+    expected = [f['bbox'] for f in frames if not f['arrow'] and not f['in_blue']]
+    return img, {'size': (page_w, page_h), 'dpi': dpi, 'clutter': clutter,
+                 'frames': frames, 'expected': expected}
+
+
+def _contains(region, bbox) -> bool:
+    x, y, w, h = bbox
+    rx, ry = region['region_x'], region['region_y']
+    return (rx <= x and ry <= y and
+            x + w <= rx + region['region_width'] and y + h <= ry + region['region_height'])
+
+
+def frame_recall(regions, expected) -> float:
+    """検出された領域（region_*）に含まれる期待枠の割合"""
+    if not expected:
+        return 1.0
+    hits = sum(any(_contains(r, bbox) for r in regions) for bbox in expected)
+    return hits / len(expected)
+
+
+def frame_precision(regions, expected) -> float:
+    """検出された領域のうち、期待枠を含むものの割合"""
+    if not regions:
+        return 1.0
+    hits = sum(any(_contains(r, bbox) for bbox in expected) for r in regions)
+    return hits / len(regions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--frames', type=int, default=8)
+    parser.add_argument('--clutter', type=float, default=0.5)
+    parser.add_argument('--dpi', type=int, default=REFERENCE_DPI)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='synthetic_page.png')
+    args = parser.parse_args()
+
+    img, info = generate_page(args.frames, args.clutter, args.dpi, seed=args.seed)
+    cv2.imwrite(args.output, img)
+    print(f"{args.output}: {info['size'][0]}x{info['size'][1]}, "
+          f"{len(info['frames'])} frames, {len(info['expected'])} expected")
+
+
+if __name__ == "__main__":
+    main()
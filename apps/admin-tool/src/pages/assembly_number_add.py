@@ -3,7 +3,8 @@ import numpy as np
 import cv2
 from PIL import Image
 from utils.supabase_client import get_supabase_client, upload_image_to_supabase, add_cache_buster, check_db_response
-from utils.image_processing import extract_assembly_images
+from utils.detection_cache import cached_iter_assembly_images
+from utils.image_processing import TILED_MEMORY_BUDGET_MB
 import uuid
 from streamlit_cropper import st_cropper
 import requests
@@ -254,7 +255,13 @@ def app():
                 if st.button("🔍 自動検出", type="primary", help="画像から組立番号領域を自動検出します"):
                     with st.spinner("組立番号領域を検出中..."):
                         try:
-                            detected_images = extract_assembly_images(image)
+                            # 検出できた領域から順にプレビューを表示
+                            detected_images = []
+                            preview_cols = st.columns(4)
+                            for detected_img in cached_iter_assembly_images(image, max_memory_mb=TILED_MEMORY_BUDGET_MB):
+                                detected_images.append(detected_img)
+                                with preview_cols[(len(detected_images) - 1) % 4]:
+                                    st.image(detected_img, caption=f"検出領域 #{len(detected_images)}", width=200)
                             if detected_images:
                                 st.session_state['auto_detected_images'] = detected_images
                                 st.session_state['success_message'] = f"✅ {len(detected_images)}個の組立番号領域を検出しました！"
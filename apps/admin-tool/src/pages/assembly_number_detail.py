@@ -1,7 +1,7 @@
 import streamlit as st
 from PIL import Image
 from utils.supabase_client import get_supabase_client, upload_image_to_supabase, add_cache_buster, check_db_response, delete_part
-from utils import image_processing
+from utils.detection_cache import cached_extract_parts
 import uuid
 import requests
 from io import BytesIO
@@ -166,7 +166,8 @@ def app():
                     if 'assembly_img_loaded' in st.session_state:
                         with st.spinner("部品を検出中…"):
                             # 部品を自動検出
-                            detected_parts = image_processing.extract_parts(st.session_state['assembly_img_loaded'])
+                            detected_parts, stats = cached_extract_parts(st.session_state['assembly_img_loaded'], lazy_upscale=True, return_stats=True)
+                            stats.log("部品検出")
                             parts_count = len(detected_parts)
 
                             if parts_count == 0:
@@ -254,7 +255,8 @@ def app():
             if st.session_state.get('trigger_auto_extract') and 'assembly_img_loaded' in st.session_state:
                 slots_count = st.session_state.get('slots_created_count', 0)
                 with st.spinner("パーツを自動抽出中…"):
-                    parts = image_processing.extract_parts(st.session_state['assembly_img_loaded'])
+                    parts, stats = cached_extract_parts(st.session_state['assembly_img_loaded'], lazy_upscale=True, return_stats=True)
+                    stats.log("部品検出")
                     st.session_state['extracted_parts'] = parts
                     st.session_state['success_message'] = f"✅ {slots_count}個の部品枠を作成し、{len(parts)}個のパーツを自動抽出しました！"
                 del st.session_state['trigger_auto_extract']
@@ -268,7 +270,8 @@ def app():
                 if st.button("🔍 パーツを自動抽出", type="primary"):
                     if 'assembly_img_loaded' in st.session_state:
                         with st.spinner("パーツを抽出中…"):
-                            parts = image_processing.extract_parts(st.session_state['assembly_img_loaded'])
+                            parts, stats = cached_extract_parts(st.session_state['assembly_img_loaded'], lazy_upscale=True, return_stats=True)
+                            stats.log("部品検出")
                             st.session_state['extracted_parts'] = parts
                             st.session_state['success_message'] = f"✅ {len(parts)}個のパーツを検出しました。下の部品枠に割り当ててください。"
                             st.rerun()
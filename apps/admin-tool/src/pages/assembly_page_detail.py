@@ -1,6 +1,7 @@
 import streamlit as st
 from utils.supabase_client import get_supabase_client, get_supabase_image_url, add_cache_buster, check_db_response, get_deletion_impact, delete_assembly_image, upload_image_to_supabase
-from utils.image_processing import extract_assembly_images
+from utils.detection_cache import cached_iter_assembly_images
+from utils.image_processing import DetectionStats, TILED_MEMORY_BUDGET_MB
 import pandas as pd
 import requests
 from io import BytesIO
@@ -20,6 +21,20 @@ def load_image_from_url(url: str):
     except Exception:
         return None
 
+def detect_assembly_images_progressively(page_image):
+    """組立番号領域を検出し、見つかった領域から順にプレビューを表示する"""
+    stats = DetectionStats()
+    detected = []
+    progress = st.empty()
+    cols = st.columns(4)
+    for item in cached_iter_assembly_images(page_image, return_coords=True, max_memory_mb=TILED_MEMORY_BUDGET_MB, stats=stats):
+        detected.append(item)
+        with cols[(len(detected) - 1) % 4]:
+            st.image(item['image'], caption=f"検出 {len(detected)}", width=200)
+        progress.caption(f"{len(detected)}個の組立番号領域を検出しました（検出中...）")
+    progress.empty()
+    return detected, stats
+
 def app():
     """組立ページ詳細ページを表示する。
     選択された組立ページの詳細情報と、そのページに紐づく組立番号一覧を表示する。
@@ -231,13 +246,16 @@ def app():
                 # ページが変わったら検出結果もクリア
                 if 'extracted_assembly_images' in st.session_state:
                     del st.session_state['extracted_assembly_images']
+                st.session_state.pop('assembly_detection_stats', None)
                 st.info(f"✅ 新しいページ画像を読み込みました (page_id: {page_id[:8]}...)")
 
         # 枠作成直後の自動検出トリガー
         if st.session_state.get('trigger_assembly_auto_detect') and 'assembly_page_img_loaded' in st.session_state:
             with st.spinner("🔍 組立番号領域を自動検出中..."):
                 try:
-                    detected = extract_assembly_images(st.session_state['assembly_page_img_loaded'], return_coords=True)
+                    detected, stats = detect_assembly_images_progressively(st.session_state['assembly_page_img_loaded'])
+                    stats.log("組立番号領域検出")
+                    st.session_state['assembly_detection_stats'] = stats.as_dict()
                     if detected:
                         st.session_state['extracted_assembly_images'] = detected
                         st.session_state['success_message'] = f"✅ {len(detected)}個の組立番号領域を検出しました。下の一覧で画像を割り当ててください。"
@@ -261,7 +279,9 @@ def app():
                     if 'assembly_page_img_loaded' in st.session_state:
                         with st.spinner("検出中..."):
                             try:
-                                detected = extract_assembly_images(st.session_state['assembly_page_img_loaded'], return_coords=True)
+                                detected, stats = detect_assembly_images_progressively(st.session_state['assembly_page_img_loaded'])
+                                stats.log("組立番号領域検出")
+                                st.session_state['assembly_detection_stats'] = stats.as_dict()
                                 if detected:
                                     st.session_state['extracted_assembly_images'] = detected
                                     st.session_state['success_message'] = f"✅ {len(detected)}個の組立番号領域を検出しました。下の一覧で画像を割り当ててください。"
@@ -294,8 +314,27 @@ def app():
                     else:
                         st.image(item, caption=f"検出 {j+1}", width=200)
 
+            # 検出処理の内訳（処理時間・件数）
+            detection_stats = st.session_state.get('assembly_detection_stats')
+            if detection_stats:
+                with st.expander("⏱️ 検出処理の詳細", expanded=False):
+                    timings = detection_stats['timings']
+                    st.caption(f"合計 {sum(timings.values()) * 1000:.0f} ms")
+                    col_timings, col_counts = st.columns(2)
+                    with col_timings:
+                        st.dataframe(
+                            pd.DataFrame([{"ステージ": k, "時間 (ms)": round(v * 1000, 1)} for k, v in timings.items()]),
+                            hide_index=True, use_container_width=True
+                        )
+                    with col_counts:
+                        st.dataframe(
+                            pd.DataFrame([{"項目": k, "件数": v} for k, v in detection_stats['counts'].items()]),
+                            hide_index=True, use_container_width=True
+                        )
+
             if st.button("検出結果をクリア"):
                 del st.session_state['extracted_assembly_images']
+                st.session_state.pop('assembly_detection_stats', None)
                 st.rerun()
 
         # 追加フォームの表示
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# Ensure the src directory is on PYTHONPATH for relative imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import batch_detection, detection_cache, image_processing
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'docs', 'AssemblyDiagram_sample')
+REGION_KEYS = ('region_x', 'region_y', 'region_width', 'region_height')
+
+
+def _without_timings(records):
+    return [{k: v for k, v in r.items() if k != 'seconds'} for r in records]
+
+
+def test_process_pool_matches_sequential_detection(tmp_path):
+    paths = [os.path.join(SAMPLE_DIR, name) for name in
+             ('AssemblyDiagram_no33.jpg', 'AssemblyDiagram_no36.jpg', 'AssemblyDiagram_no32.jpg')]
+    paths.insert(1, str(tmp_path / 'missing.jpg'))
+
+    sequential = batch_detection.detect_pages(paths, workers=1, lazy_upscale=True)
+    pooled = batch_detection.detect_pages(paths, workers=2, max_pending=1, lazy_upscale=True)
+    assert _without_timings(pooled) == _without_timings(sequential)
+    assert [r['index'] for r in pooled] == [0, 1, 2, 3]
+    assert pooled[1] == {'index': 1, 'source': paths[1], 'error': 'decode_failed', 'regions': []}
+
+    img = cv2.imread(paths[0])
+    assert ([{k: r[k] for k in REGION_KEYS} for r in pooled[0]['regions']] ==
+            image_processing.detect_assembly_regions(img))
+    # 共有メモリはすべて解放される
+    if os.path.isdir('/dev/shm'):
+        assert not [name for name in os.listdir('/dev/shm') if name.startswith('psm_')]
+
+
+def test_part_records_render_like_extract_parts():
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram_no33.jpg'))
+    record = batch_detection.detect_page(img, contours=True)
+    assert record['regions']
+    for region in record['regions']:
+        x1, y1 = region['region_x'], region['region_y']
+        crop = img[y1:y1 + region['region_height'], x1:x1 + region['region_width']]
+        expected = image_processing.extract_parts(crop)
+        detection = detection_cache.decode_parts_detection(region['parts_detection'])
+        rendered = image_processing.render_parts(crop, detection)
+        assert len(rendered) == len(expected) == len(region['parts'])
+        assert all(np.array_equal(np.asarray(a), np.asarray(b)) for a, b in zip(rendered, expected))
+        # 部品の座標はページ座標で、組立番号画像の中にある
+        for part in region['parts']:
+            assert x1 <= part['x'] and part['x'] + part['width'] <= x1 + region['region_width']
+            assert y1 <= part['y'] and part['y'] + part['height'] <= y1 + region['region_height']
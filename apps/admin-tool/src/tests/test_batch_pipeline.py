@@ -0,0 +1,214 @@
+import os
+import shutil
+import sys
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+# Ensure the src directory is on PYTHONPATH for relative imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import batch_pipeline, supabase_client
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'docs', 'AssemblyDiagram_sample')
+PAGES = ('AssemblyDiagram_no33.jpg', 'AssemblyDiagram_no36.jpg', 'AssemblyDiagram_no32.jpg')
+
+
+class _FailingWriter(batch_pipeline.LocalWriter):
+    """fail_table への書き込みが fail_after 回目で失敗する"""
+
+    def __init__(self, directory, fail_table, fail_after):
+        super().__init__(directory)
+        self.fail_table, self.remaining = fail_table, fail_after
+
+    def upsert(self, table, rows, on_conflict=None):
+        if table == self.fail_table and rows:
+            self.remaining -= 1
+            if self.remaining < 0:
+                raise RuntimeError('interrupted')
+        super().upsert(table, rows, on_conflict)
+
+
+class _FakeStorage:
+    """Storage のアップロードを記録する"""
+
+    def __init__(self):
+        self.uploaded = []
+
+    def from_(self, bucket):
+        return self
+
+    def upload(self, filename, data, options):
+        self.uploaded.append(filename)
+        return SimpleNamespace(path=filename)
+
+    def get_public_url(self, filename):
+        return f"https://storage.example/{filename}"
+
+
+class _FakeQuery:
+    """client.table(...) の select / eq / in_ / execute だけを行のリストで再現する"""
+
+    def __init__(self, rows):
+        self.data = rows
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return _FakeQuery([row for row in self.data if row[column] == value])
+
+    def in_(self, column, values):
+        return _FakeQuery([row for row in self.data if row[column] in values])
+
+    def execute(self):
+        return self
+
+
+def _pages_dir(tmp_path):
+    pages = tmp_path / 'pages'
+    pages.mkdir()
+    for name in PAGES:
+        shutil.copy(os.path.join(SAMPLE_DIR, name), pages / name)
+    return pages
+
+
+def _run(jobs, writer, checkpoint_path):
+    return batch_pipeline.run_pipeline(jobs, writer, batch_pipeline.Checkpoint(checkpoint_path),
+                                       workers=1, log=lambda message: None)
+
+
+def test_interrupted_run_resumes_with_same_rows(tmp_path):
+    pages = _pages_dir(tmp_path)
+    jobs = batch_pipeline.directory_page_jobs(pages, product_id='product-1')
+    assert [job['page_number'] for job in jobs] == [32, 33, 36]
+
+    reference = batch_pipeline.LocalWriter(tmp_path / 'reference')
+    summary = _run(jobs, reference, tmp_path / 'reference.json')
+    assert summary['pages'] == 3 and summary['failed'] is None
+
+    # 2ページ目の assembly_image_parts の書き込みで中断（parts / assembly_images は書き込み済み）
+    resumed = _FailingWriter(tmp_path / 'resumed', 'assembly_image_parts', 1)
+    with pytest.raises(RuntimeError):
+        _run(jobs, resumed, tmp_path / 'resumed.json')
+    assert list(batch_pipeline.Checkpoint(tmp_path / 'resumed.json').pages) == [jobs[0]['key']]
+
+    resumed.remaining = float('inf')
+    summary = _run(jobs, resumed, tmp_path / 'resumed.json')
+    assert (summary['pages'], summary['skipped']) == (2, 1)
+    for table in batch_pipeline.TABLES:
+        rows = resumed.rows(table)
+        assert rows.keys() == reference.rows(table).keys()
+        assert all(row['id'] == key for key, row in rows.items())
+
+    numbers = sorted(int(row['assembly_number']) for row in resumed.rows('assembly_images').values())
+    assert numbers == list(range(1, len(numbers) + 1))
+
+
+def test_pages_with_manual_assembly_images_are_kept(tmp_path):
+    jobs = batch_pipeline.directory_page_jobs(_pages_dir(tmp_path))
+    manual, interrupted = jobs[0], jobs[1]
+    manual['existing'] = [{'id': 'manual', 'page_id': manual['page_id'], 'assembly_number': '7', 'display_order': 1}]
+    # パイプラインが途中まで書いたページはやり直す
+    interrupted['existing'] = [{'id': batch_pipeline.pipeline_id(interrupted['page_id'], 'assembly', 1),
+                                'page_id': interrupted['page_id'], 'assembly_number': '8', 'display_order': 1}]
+
+    writer = batch_pipeline.LocalWriter(tmp_path / 'output')
+    summary = _run(jobs, writer, tmp_path / 'checkpoint.json')
+    assert (summary['pages'], summary['skipped']) == (2, 1)
+
+    rows = writer.rows('assembly_images').values()
+    assert not [row for row in rows if row['page_id'] == manual['page_id']]
+    first = min(int(row['assembly_number']) for row in rows if row['page_id'] == interrupted['page_id'])
+    assert first == 8
+
+
+def test_rerun_with_other_start_number_replaces_previous_rows(tmp_path):
+    jobs = batch_pipeline.directory_page_jobs(_pages_dir(tmp_path), product_id='product-1')
+    writer = batch_pipeline.LocalWriter(tmp_path / 'output')
+    _run(jobs, writer, tmp_path / 'first.json')
+    first = {table: writer.rows(table) for table in batch_pipeline.TABLES}
+    assert all(row['name'].startswith('パーツ ') for row in first['parts'].values())
+
+    # 前回の実行で書いた、今回は検出されない組立番号画像（部品・紐付けつき）
+    page_id = jobs[0]['page_id']
+    stale_id = batch_pipeline.pipeline_id(page_id, 'assembly', 99)
+    stale_part = batch_pipeline.pipeline_id(stale_id, 'part', 1)
+    writer.upsert('assembly_images', [{'id': stale_id, 'page_id': page_id, 'assembly_number': '99',
+                                       'display_order': 99}])
+    writer.upsert('parts', [{'id': stale_part, 'name': 'パーツ 1'}])
+    writer.upsert('assembly_image_parts', [{'id': batch_pipeline.pipeline_id(stale_id, 'slot', 1),
+                                            'assembly_image_id': stale_id, 'part_id': stale_part,
+                                            'display_order': 1}])
+
+    batch_pipeline.run_pipeline(jobs, writer, batch_pipeline.Checkpoint(tmp_path / 'second.json'),
+                                workers=1, start_number=10, log=lambda message: None)
+    # 同じ行が番号だけ振り直され、前回の余分な行は残らない
+    for table in batch_pipeline.TABLES:
+        assert writer.rows(table).keys() == first[table].keys()
+    images = writer.rows('assembly_images').values()
+    numbers = sorted(int(row['assembly_number']) for row in images)
+    assert numbers == list(range(10, 10 + len(first['assembly_images'])))
+    assert len({(row['page_id'], row['assembly_number']) for row in images}) == len(numbers)
+
+    # 登録済みのページ番号の行（別の ID）は一意キーで置き換える
+    writer.upsert('assembly_pages', [{'id': 'registered', 'product_id': 'product-1', 'page_number': 32}],
+                  on_conflict=batch_pipeline.ON_CONFLICT['assembly_pages'])
+    pages = writer.rows('assembly_pages')
+    assert 'registered' in pages and len(pages) == len(first['assembly_pages'])
+
+
+def test_directory_jobs_use_registered_page_ids(tmp_path):
+    tables = {
+        'assembly_pages': [{'id': 'page-33', 'product_id': 'product-1', 'page_number': 33, 'image_url': None},
+                           {'id': 'other-32', 'product_id': 'product-2', 'page_number': 32, 'image_url': None}],
+        'assembly_images': [{'id': 'manual', 'page_id': 'page-33', 'assembly_number': '5', 'display_order': 1}],
+    }
+    client = SimpleNamespace(table=lambda name: _FakeQuery(tables.get(name, [])))
+    jobs = batch_pipeline.directory_page_jobs(_pages_dir(tmp_path), product_id='product-1', client=client)
+    page_ids = {job['page_number']: job['page_id'] for job in jobs}
+    assert page_ids[33] == 'page-33'
+    assert page_ids[32] == batch_pipeline.pipeline_id('product-1', 'page', PAGES[2])
+    assert [row['id'] for row in jobs[1]['existing']] == ['manual']
+
+
+def test_registered_page_image_is_kept_unless_overwrite(tmp_path):
+    pages = tmp_path / 'pages'
+    pages.mkdir()
+    shutil.copy(os.path.join(SAMPLE_DIR, PAGES[0]), pages / PAGES[0])
+    manual_url = 'https://storage.example/assembly_pages/manual.webp'
+    tables = {'assembly_pages': [{'id': 'page-33', 'product_id': 'product-1', 'page_number': 33,
+                                  'image_url': manual_url}]}
+    client = SimpleNamespace(table=lambda name: _FakeQuery(tables.get(name, [])))
+
+    # 手動で差し替えたページ画像はアップロードせず、ページの行も書き込まない
+    kept = batch_pipeline.LocalWriter(tmp_path / 'kept')
+    jobs = batch_pipeline.directory_page_jobs(pages, product_id='product-1', client=client)
+    _run(jobs, kept, tmp_path / 'kept.json')
+    assert kept.rows('assembly_pages') == {}
+    assert not (tmp_path / 'kept' / 'assembly_pages').exists()
+
+    replaced = batch_pipeline.LocalWriter(tmp_path / 'replaced')
+    jobs = batch_pipeline.directory_page_jobs(pages, product_id='product-1', client=client, overwrite=True)
+    _run(jobs, replaced, tmp_path / 'replaced.json')
+    page = replaced.rows('assembly_pages')['page-33']
+    assert page['image_url'] == (tmp_path / 'replaced' / 'assembly_pages' / 'page-33.webp').as_uri()
+
+    # 組立番号画像の座標はどちらも Storage のページ画像の座標
+    def regions(writer):
+        return {key: [row[k] for k in batch_pipeline.REGION_KEYS]
+                for key, row in writer.rows('assembly_images').items()}
+    assert regions(kept) == regions(replaced) != {}
+
+
+def test_supabase_writer_uploads_with_its_client(monkeypatch):
+    def no_global_client():
+        raise AssertionError('get_supabase_client() should not be used')
+
+    monkeypatch.setattr(supabase_client, 'get_supabase_client', no_global_client)
+    storage = _FakeStorage()
+    writer = batch_pipeline.SupabaseWriter(SimpleNamespace(storage=storage))
+    url = writer.upload(Image.new('RGB', (8, 8)), 'parts/part.webp')
+    assert storage.uploaded == ['parts/part.webp']
+    assert url == 'https://storage.example/parts/part.webp'
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# Ensure the src directory is on PYTHONPATH for relative imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import detection_cache, image_processing
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'docs', 'AssemblyDiagram_sample')
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = detection_cache.DetectionCache(tmp_path / 'cache.sqlite3', max_bytes=100)
+    cache.put('a', ['x' * 20])
+    cache.put('b', ['y' * 20])
+    assert cache.get('a') == ['x' * 20]   # a を最近使用に更新
+    cache.put('c', ['z' * 60])            # 合計が上限を超える → b を削除
+    assert cache.get('b') is None
+    assert cache.get('a') == ['x' * 20]
+    assert cache.get('c') == ['z' * 60]
+    assert cache.total_bytes() <= 100
+
+def test_cache_closes_its_connections(tmp_path, monkeypatch):
+    connections = []
+    connect = detection_cache.sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        connections.append(connect(*args, **kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(detection_cache.sqlite3, 'connect', tracking_connect)
+    cache = detection_cache.DetectionCache(tmp_path / 'cache.sqlite3')
+    cache.put('a', [1])
+    assert cache.get('a') == [1] and cache.get('b') is None
+    assert len(cache) == 1
+    assert len(connections) == 5
+    for conn in connections:   # 閉じた接続は使えない
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+def test_cache_key_depends_on_content_and_params():
+    img = np.zeros((20, 30, 3), dtype=np.uint8)
+    other = img.copy()
+    other[5, 5] = 1
+    key = detection_cache._cache_key('parts', img, lazy_upscale=True)
+    assert key == detection_cache._cache_key('parts', img.copy(), lazy_upscale=True)
+    assert key != detection_cache._cache_key('parts', other, lazy_upscale=True)
+    assert key != detection_cache._cache_key('parts', img, lazy_upscale=False)
+
+def test_cached_extraction_matches_uncached(tmp_path):
+    cache = detection_cache.DetectionCache(tmp_path / 'cache.sqlite3')
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram_no33.jpg'))
+
+    expected = image_processing.extract_assembly_images(img, return_coords=True)
+    for _ in range(2):   # 1回目: 検出して保存、2回目: キャッシュから復元
+        result = detection_cache.cached_extract_assembly_images(img, return_coords=True, cache=cache)
+        assert [{k: v for k, v in r.items() if k != 'image'} for r in result] == \
+               [{k: v for k, v in r.items() if k != 'image'} for r in expected]
+        assert all(np.array_equal(np.asarray(r['image']), np.asarray(e['image'])) for r, e in zip(result, expected))
+
+    expected_parts = image_processing.extract_parts(img)
+    for _ in range(2):
+        parts = detection_cache.cached_extract_parts(img, cache=cache)
+        assert len(parts) == len(expected_parts)
+        assert all(np.array_equal(np.asarray(p), np.asarray(e)) for p, e in zip(parts, expected_parts))
+    assert len(cache) == 2
+
+def test_cached_iteration_stores_only_complete_results(tmp_path):
+    cache = detection_cache.DetectionCache(tmp_path / 'cache.sqlite3')
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    expected = image_processing.detect_assembly_regions(img)
+
+    # 途中で打ち切った検出結果は保存しない
+    next(detection_cache.cached_iter_assembly_images(img, return_coords=True, cache=cache))
+    assert len(cache) == 0
+
+    for hit in (False, True):
+        stats = image_processing.DetectionStats()
+        result = list(detection_cache.cached_iter_assembly_images(img, return_coords=True, cache=cache, stats=stats))
+        assert [{k: v for k, v in r.items() if k != 'image'} for r in result] == expected
+        assert stats.counts.get('cache.hit', 0) == hit
+    assert len(cache) == 1
+
+def test_parts_frame_is_enhanced_once_per_detection(tmp_path, monkeypatch):
+    cache = detection_cache.DetectionCache(tmp_path / 'cache.sqlite3')
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram_no31.jpg'))
+    calls = []
+    enhance = image_processing._enhance_for_parts
+
+    def counting_enhance(frame):
+        calls.append(frame.shape)
+        return enhance(frame)
+
+    monkeypatch.setattr(image_processing, '_enhance_for_parts', counting_enhance)
+    expected = image_processing.extract_parts(img)
+    assert expected and len(calls) == 1
+    # キャッシュミスは検出時の拡大画像をそのまま使い、ヒットは部品画像の生成時に拡大する
+    for _ in range(2):
+        calls.clear()
+        parts = detection_cache.cached_extract_parts(img, cache=cache)
+        assert len(calls) == 1
+        assert all(np.array_equal(np.asarray(p), np.asarray(e)) for p, e in zip(parts, expected))
@@ -1,9 +1,16 @@
+import glob
+import os
+
 import numpy as np
 import cv2
+import pytest
 from PIL import Image
 
 from utils import image_processing
 
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'docs', 'AssemblyDiagram_sample')
+SAMPLE_PAGES = sorted(glob.glob(os.path.join(SAMPLE_DIR, 'AssemblyDiagram*.jpg')))
+
 def make_dummy_image(color=(255, 255, 255)):
     """白い 200x200 のダミー画像を作成"""
     return Image.new("RGB", (200, 200), color)
@@ -26,3 +33,467 @@ def test_extract_parts_detects_red_boxes():
     assert len(parts) >= 1
     for p in parts:
         assert isinstance(p, Image.Image)
+
+def _random_lines(rng, n, length_limit, pos_limit):
+    lines = []
+    for _ in range(n):
+        start = int(rng.integers(0, length_limit))
+        end = int(rng.integers(start, length_limit))
+        lines.append((start, end, int(rng.integers(0, pos_limit))))
+    return lines
+
+def test_find_rectangles_matches_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        w, h = int(rng.integers(200, 1500)), int(rng.integers(200, 1500))
+        h_lines = sorted(_random_lines(rng, int(rng.integers(0, 30)), w, h), key=lambda l: l[2])
+        v_lines = _random_lines(rng, int(rng.integers(0, 30)), h, w)
+        kwargs = dict(min_width=int(rng.integers(1, 100)), min_height=int(rng.integers(1, 100)),
+                      img_width=w, img_height=h, tolerance=int(rng.integers(0, 30)))
+        result = image_processing._find_rectangles_from_lines(h_lines, v_lines, **kwargs)
+        expected = image_processing._find_rectangles_from_lines_reference(h_lines, v_lines, **kwargs)
+        assert [r['bbox'] for r in result] == [tuple(int(v) for v in r['bbox']) for r in expected]
+        assert [r['area'] for r in result] == [int(r['area']) for r in expected]
+
+def test_find_rectangles_respects_candidate_budget():
+    # 10本の水平線 x 10本の垂直線の格子 → 多数の矩形候補
+    h_lines = [(0, 1000, y) for y in range(0, 1000, 100)]
+    v_lines = [(0, 1000, x) for x in range(0, 1000, 100)]
+    kwargs = dict(min_width=80, min_height=60, img_width=1000, img_height=1000)
+    full = image_processing._find_rectangles_from_lines(h_lines, v_lines, **kwargs)
+    capped = image_processing._find_rectangles_from_lines(h_lines, v_lines, max_candidates=50, **kwargs)
+    assert len(full) > 50
+    assert capped == full[:50]
+
+def test_page_analysis_region_matches_crop_conversion():
+    rng = np.random.default_rng(1)
+    img = rng.integers(0, 256, size=(120, 160, 3), dtype=np.uint8)
+    page = image_processing.PageAnalysis(img)
+    region = page.region(10, 20, 90, 100).region(5, 5, 60, 50)
+    crop = img[25:70, 15:70]
+    assert np.shares_memory(region.img, img)
+    assert np.array_equal(region.hsv, cv2.cvtColor(crop, cv2.COLOR_BGR2HSV))
+    assert np.array_equal(region.gray, cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY))
+    for color in ('red', 'black', 'blue'):
+        assert np.array_equal(region.mask(color), image_processing._get_color_mask(crop, color))
+
+def test_count_pixels_matches_count_nonzero():
+    rng = np.random.default_rng(2)
+    img = rng.integers(0, 256, size=(90, 130, 3), dtype=np.uint8)
+    page = image_processing.PageAnalysis(img)
+    region = page.region(7, 3, 120, 80)
+    for view in (page, region):
+        for color in ('red', 'blue', 'text_red', 'label_red'):
+            mask = view.mask(color)
+            for _ in range(20):
+                x1, x2 = sorted(rng.integers(0, view.width + 1, size=2).tolist())
+                y1, y2 = sorted(rng.integers(0, view.height + 1, size=2).tolist())
+                expected = np.count_nonzero(mask[y1:y2, x1:x2])
+                assert view.count_pixels(color, x1, y1, x2, y2) == expected
+
+def _count_arrow_connections_brute_force(bbox, all_lines, tolerance=10):
+    x, y, w, h = bbox
+    left, right, top, bottom = x, x + w, y, y + h
+    count = 0
+    for x1, y1, x2, y2, angle in all_lines:
+        if not (20 <= angle <= 70) or np.hypot(x2 - x1, y2 - y1) < 30:
+            continue
+        for (px, py), (ox, oy) in [((x1, y1), (x2, y2)), ((x2, y2), (x1, y1))]:
+            on_edge = ((abs(px - left) < tolerance or abs(px - right) < tolerance) and top < py < bottom) or \
+                      ((abs(py - top) < tolerance or abs(py - bottom) < tolerance) and left < px < right)
+            outside = ox < left - tolerance or ox > right + tolerance or oy < top - tolerance or oy > bottom + tolerance
+            if on_edge and outside:
+                count += 1
+                break
+    return count
+
+def test_line_endpoint_index_matches_brute_force():
+    rng = np.random.default_rng(3)
+    lines = []
+    for _ in range(300):
+        x1, y1 = rng.integers(0, 500, 2).tolist()
+        x2, y2 = x1 + int(rng.integers(-80, 80)), y1 + int(rng.integers(-80, 80))
+        angle = 90 if x2 == x1 else abs(np.degrees(np.arctan((y2 - y1) / (x2 - x1))))
+        lines.append((x1, y1, x2, y2, angle))
+    index = image_processing.LineEndpointIndex(lines, cell_size=16)
+    for _ in range(200):
+        bbox = tuple(rng.integers(0, 400, 2).tolist() + rng.integers(1, 200, 2).tolist())
+        assert index.count_connections(bbox) == _count_arrow_connections_brute_force(bbox, lines)
+
+@pytest.mark.parametrize('path', SAMPLE_PAGES, ids=os.path.basename)
+def test_remove_duplicate_rectangles_matches_reference_on_samples(path):
+    img = cv2.imread(path)
+    page = image_processing.PageAnalysis(img)
+    min_line_length = max(50, min(page.width, page.height) // 20)
+    frames = (image_processing._detect_colored_frames(page, 'red', min_line_length) +
+              image_processing._detect_colored_frames(page, 'black', min_line_length))
+    for threshold in (0.3, 0.5, 0.8):
+        result = image_processing._remove_duplicate_rectangles(frames, iou_threshold=threshold)
+        expected = image_processing._remove_duplicate_rectangles_reference(frames, iou_threshold=threshold)
+        assert [r['bbox'] for r in result] == [r['bbox'] for r in expected]
+
+def test_remove_duplicate_rectangles_keeps_larger_and_threshold_is_strict():
+    big = {'bbox': (0, 0, 100, 100), 'area': 10000}
+    half = {'bbox': (0, 0, 100, 50), 'area': 5000}       # IoU = 0.5 ちょうど → 残す
+    inner = {'bbox': (0, 0, 100, 60), 'area': 6000}      # IoU = 0.6 → 除外
+    apart = {'bbox': (200, 200, 50, 50), 'area': 2500}
+    result = image_processing._remove_duplicate_rectangles([half, apart, inner, big])
+    assert result == [big, half, apart]
+
+def test_number_extractor_groups_digits_per_row():
+    img = np.full((300, 600, 3), 255, dtype=np.uint8)
+    for y in (80, 200):
+        for x in (50, 300):
+            cv2.putText(img, '12', (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3)
+    result = image_processing.NumberExtractor().extract(img, (45, 45, 60, 45))
+    assert result['params']['color'] == 'black'
+    assert result['candidates_count'] == 8
+    assert len(result['regions']) == 4
+    assert all(r['count'] == 2 for r in result['regions'])
+
+def test_contour_stats_match_opencv():
+    img = cv2.imread(SAMPLE_PAGES[0]) if SAMPLE_PAGES else np.zeros((10, 10, 3), np.uint8)
+    edges = cv2.Canny(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), 50, 150)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    xs, ys, ws, hs = image_processing._contour_bounding_rects(contours)
+    assert list(zip(xs.tolist(), ys.tolist(), ws.tolist(), hs.tolist())) == [cv2.boundingRect(c) for c in contours]
+    assert image_processing._contour_areas(contours).tolist() == [cv2.contourArea(c) for c in contours]
+
+def test_count_significant_objects_in_boxes():
+    gray = np.full((200, 300), 255, dtype=np.uint8)
+    cv2.rectangle(gray, (10, 10), (60, 60), 0, -1)        # 単独の部品
+    cv2.rectangle(gray, (110, 10), (150, 60), 0, -1)      # 同程度の2部品
+    cv2.rectangle(gray, (160, 10), (200, 60), 0, -1)
+    cv2.rectangle(gray, (10, 100), (120, 190), 0, 3)      # 枠線（内部の小物体は数えない）
+    cv2.rectangle(gray, (50, 140), (70, 160), 0, -1)
+    counts = image_processing._count_significant_objects_in_boxes(
+        gray, [5, 105, 5], [5, 5, 95], [60, 100, 120], [60, 60, 100]
+    )
+    assert counts.tolist() == [1, 2, 1]
+
+@pytest.mark.parametrize('path', SAMPLE_PAGES[:3])
+def test_count_significant_objects_in_boxes_matches_per_crop_reference(path):
+    img = cv2.imread(path)
+    x1, y1, x2, y2 = image_processing.detect_parts(img)['frame_roi']
+    frame = image_processing._enhance_for_parts(img[y1:y2, x1:x2])
+    contours, _ = cv2.findContours(image_processing._part_mask(frame), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    xs, ys, ws, hs = image_processing._contour_bounding_rects(contours)
+    counts = image_processing._count_significant_objects_in_boxes(
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), xs, ys, ws, hs)
+    expected = [image_processing._count_significant_objects(frame[y:y + h, x:x + w])
+                for x, y, w, h in zip(xs, ys, ws, hs)]
+    assert len(expected) > 10
+    assert counts.tolist() == expected
+
+def test_part_mask_is_rendered_in_roi_like_full_frame():
+    frame = np.full((120, 160, 3), 255, dtype=np.uint8)
+    cv2.circle(frame, (6, 60), 20, (40, 40, 40), -1)      # 枠の左端に接する部品
+    mask = cv2.inRange(frame, (0, 0, 0), (100, 100, 100))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    part = {'bbox': cv2.boundingRect(contours[0]), 'contour': contours[0]}
+
+    rgba = np.asarray(image_processing._create_part_with_transparent_bg(frame, part, margin=10))
+
+    full = np.zeros(frame.shape[:2], dtype=np.uint8)
+    cv2.drawContours(full, [cv2.convexHull(contours[0])], -1, 255, thickness=cv2.FILLED)
+    cv2.drawContours(full, [contours[0]], -1, 255, thickness=cv2.FILLED)
+    full = cv2.dilate(full, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=2)
+    x, y, w, h = part['bbox']
+    expected = full[max(0, y - 10):y + h + 10, max(0, x - 10):x + w + 10]
+    assert np.array_equal(rgba[..., 3], expected)
+
+def test_downscaled_page_keeps_thin_lines():
+    img = np.full((400, 600, 3), 255, dtype=np.uint8)
+    cv2.line(img, (50, 101), (550, 101), (0, 0, 255), 1)   # 1px の赤線
+    coarse = image_processing.PageAnalysis(img).downscaled(4)
+    assert (coarse.width, coarse.height) == (150, 100)
+    assert np.count_nonzero(coarse.mask('red')[25]) >= 120
+
+@pytest.mark.parametrize('factor', [2, 5, 23, 32])
+def test_downscaled_page_keeps_lines_of_each_color(factor):
+    img = np.full((700, 900, 3), 255, dtype=np.uint8)
+    colors = {'red': (0, 0, 255), 'black': (0, 0, 0), 'blue': (255, 0, 0)}
+    for i, (color, bgr) in enumerate(colors.items()):
+        y, x = 111 + 222 * i, 144 + 300 * i
+        cv2.line(img, (0, y), (899, y), bgr, 1)            # 1px の横線
+        cv2.line(img, (x, 0), (x, 450), bgr, 1)            # 途中で終わる縦線
+        img[600, x + 20] = bgr                             # 1px の点
+    coarse = image_processing.PageAnalysis(img).downscaled(factor)
+    for i, color in enumerate(colors):
+        y, x = 111 + 222 * i, 144 + 300 * i
+        mask = coarse.mask(color)
+        # 他の色の縦線（2本）と交差するブロックはその色になる
+        assert np.count_nonzero(mask[y // factor]) >= coarse.width - 2
+        assert mask[450 // factor, x // factor] and mask[600 // factor, (x + 20) // factor]
+
+def test_pyramid_mode_never_converts_the_full_page(monkeypatch):
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram_no32.jpg'))
+    shapes = []
+    for name in ('cvtColor', 'Canny'):
+        original = getattr(cv2, name)
+        def record(src, *args, _original=original, **kwargs):
+            shapes.append(src.shape[:2])
+            return _original(src, *args, **kwargs)
+        monkeypatch.setattr(cv2, name, record)
+    regions = image_processing.detect_assembly_regions(img, pyramid=True, working_size=500)
+    assert regions and shapes
+    # HSV・Canny は縮小画像・枠ごとのクロップ・辺の帯のみ（ページの半分以上の画素を持つ配列はない）
+    assert max(h * w for h, w in shapes) < img.shape[0] * img.shape[1] / 2
+
+@pytest.mark.parametrize('name', ['AssemblyDiagram_no32.jpg', 'AssemblyDiagram_no36.jpg'])
+def test_pyramid_mode_matches_full_resolution(name):
+    img = cv2.imread(os.path.join(SAMPLE_DIR, name))
+    keys = ('region_x', 'region_y', 'region_width', 'region_height')
+    full = image_processing.extract_assembly_images(img, return_coords=True)
+    coarse = image_processing.extract_assembly_images(img, return_coords=True, pyramid=True, working_size=500)
+    assert len(coarse) == len(full) >= 1
+    for a, b in zip(full, coarse):
+        assert all(isinstance(b[k], int) for k in keys)
+        assert max(abs(a[k] - b[k]) for k in keys) <= 3
+        assert b['image'].size == (b['region_width'], b['region_height'])
+
+def test_lazy_upscale_parts_match_full_frame_upscale():
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram_no31.jpg'))
+    full = image_processing.extract_parts(img)
+    lazy = image_processing.extract_parts(img, lazy_upscale=True)
+    assert len(lazy) == len(full) >= 1
+    for a, b in zip(full, lazy):
+        assert b.mode == 'RGBA'
+        assert abs(a.width - b.width) <= 10 and abs(a.height - b.height) <= 10
+        opaque_a = np.count_nonzero(np.asarray(a)[..., 3])
+        opaque_b = np.count_nonzero(np.asarray(b)[..., 3])
+        assert abs(opaque_a - opaque_b) <= 0.05 * opaque_a
+
+def test_detection_stats_are_optional_and_consistent():
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram_no31.jpg'))
+    images, stats = image_processing.extract_assembly_images(img, return_stats=True)
+    assert [np.asarray(i).shape for i in images] == \
+           [np.asarray(i).shape for i in image_processing.extract_assembly_images(img)]
+    assert stats.counts['regions'] == len(images)
+    assert stats.counts['rectangles.after_nms'] <= stats.counts['rectangles.before_nms']
+    assert {'masks', 'hough', 'filtering', 'validation'} <= set(stats.timings)
+
+    parts, stats = image_processing.extract_parts(img, return_stats=True)
+    assert stats.counts['parts'] == len(parts)
+    # 各輪郭は最初に除外したフィルタに1回だけ数えられる
+    rejected = sum(v for k, v in stats.counts.items() if k.startswith('rejected.'))
+    assert rejected + len(parts) == stats.counts['contours']
+
+@pytest.mark.parametrize('budget_mb', [8, 30])
+def test_tiled_mode_matches_full_page(budget_mb):
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    keys = ('region_x', 'region_y', 'region_width', 'region_height')
+    full = image_processing.detect_assembly_regions(img)
+    stats = image_processing.DetectionStats()
+    tiled = image_processing.detect_assembly_regions(img, max_memory_mb=budget_mb, stats=stats)
+    assert stats.counts['tiles'] > 1
+    assert len(tiled) == len(full) >= 1
+    for a, b in zip(full, tiled):
+        assert max(abs(a[k] - b[k]) for k in keys) <= 15
+
+# 子プロセスで検出の前の RSS（VmRSS）と後のピーク RSS（VmHWM）の差を測る
+# （tracemalloc は OpenCV 内部の C++ の一時バッファを数えない。getrusage の ru_maxrss は
+# fork 時の親プロセスの RSS を引き継ぐため、exec 後の新しいアドレス空間の VmHWM を使う）
+_PEAK_RSS_SCRIPT = """
+import sys
+import cv2
+from utils import image_processing
+
+def status_kb(key):
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(key + ':'))
+
+img = cv2.resize(cv2.imread(sys.argv[1]), (6000, 4300))
+budget = float(sys.argv[2]) if sys.argv[2] != 'none' else None
+rss = status_kb('VmRSS')
+regions = image_processing.detect_assembly_regions(img, max_memory_mb=budget)
+print(len(regions), (status_kb('VmHWM') - rss) * 1024)
+"""
+
+def _detection_peak_rss(budget_mb):
+    import subprocess
+    import sys
+    src_dir = os.path.dirname(os.path.dirname(image_processing.__file__))
+    out = subprocess.run([sys.executable, '-c', _PEAK_RSS_SCRIPT,
+                          os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'), str(budget_mb)],
+                         cwd=src_dir, capture_output=True, text=True, check=True).stdout
+    n_regions, peak = (int(v) for v in out.split())
+    return n_regions, peak
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason='RSS は Linux の /proc で測る')
+def test_tiled_mode_bounds_peak_memory():
+    # 6000x4300 のページ（通常処理ではピーク RSS が約350MB 増える）
+    n_full, peak_full = _detection_peak_rss('none')
+    n_tiled, peak_tiled = _detection_peak_rss(64)
+    assert n_full >= 1 and n_tiled >= 1
+    assert peak_full > 4 * 64 * 2**20
+    assert peak_tiled <= 64 * 2**20
+
+def test_iter_assembly_images_streams_same_results():
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    expected, expected_stats = image_processing.extract_assembly_images(img, return_coords=True, return_stats=True)
+
+    stats = image_processing.DetectionStats()
+    stream = image_processing.iter_assembly_images(img, return_coords=True, stats=stats)
+    first = next(stream)
+    # 最初の領域の時点では残りの枠はまだバリデーションされていない
+    assert 'regions' not in stats.counts
+    result = [first] + list(stream)
+
+    assert [{k: v for k, v in r.items() if k != 'image'} for r in result] == \
+           [{k: v for k, v in e.items() if k != 'image'} for e in expected]
+    assert all(np.array_equal(np.asarray(r['image']), np.asarray(e['image'])) for r, e in zip(result, expected))
+    assert stats.counts == expected_stats.counts
+
+@pytest.mark.parametrize('options', [{}, {'pyramid': True, 'working_size': 700}, {'max_memory_mb': 30}])
+def test_parallel_frame_checks_keep_results_and_order(options):
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    expected = image_processing.detect_assembly_regions(img, **options)
+    threads = cv2.getNumThreads()
+    cv2.setNumThreads(5)
+    try:
+        assert image_processing.detect_assembly_regions(img, workers=3, **options) == expected
+        assert cv2.getNumThreads() == 5
+        # 途中で止めた（yield 中の）ジェネレーターも OpenCV のスレッド数（プロセス全体の設定）を変更しない
+        regions = image_processing.iter_assembly_regions(img, workers=3, **options)
+        assert next(regions) == expected[0]
+        assert cv2.getNumThreads() == 5
+        regions.close()
+    finally:
+        cv2.setNumThreads(threads)
+
+def test_color_labels_match_hsv_ranges():
+    # すべての (H, S, V) の組み合わせで inRange による色マスクと一致すること
+    h, s, v = np.meshgrid(np.arange(180), np.arange(256), np.arange(256), indexing='ij')
+    hsv = np.stack([h, s, v], axis=-1).astype(np.uint8).reshape(180 * 256, 256, 3)
+    labels = image_processing._classify_hsv(hsv)
+    for color in image_processing._HSV_RANGES:
+        assert np.array_equal(image_processing._mask_from_labels(labels, color),
+                              image_processing._mask_from_hsv(hsv, color)), color
+
+def test_local_arrow_index_ignores_lines_crossing_the_frame():
+    img = np.full((400, 400, 3), 255, dtype=np.uint8)
+    cv2.rectangle(img, (100, 100), (300, 300), (30, 30, 30), 2)
+    bbox = (100, 100, 200, 200)
+    crossing = img.copy()
+    cv2.line(crossing, (20, 150), (380, 260), (30, 30, 30), 3)     # 枠を横切る線は内側で切れる
+    arrows = img.copy()
+    cv2.line(arrows, (30, 390), (150, 300), (30, 30, 30), 3)       # 下辺で終わる斜め線2本
+    cv2.line(arrows, (330, 390), (250, 300), (30, 30, 30), 3)
+    for page, connected in ((image_processing.PageAnalysis(crossing), False),
+                            (image_processing.PageAnalysis(arrows), True)):
+        index = image_processing._local_arrow_index(page, bbox)
+        assert image_processing._is_connected_to_arrow(page.img, bbox, index) == connected
+
+
+def test_arrow_check_ignores_arrows_outside_the_band():
+    img = np.full((1200, 1200, 3), 255, dtype=np.uint8)
+    cv2.rectangle(img, (600, 600), (900, 800), (30, 30, 30), 2)
+    bbox = (600, 600, 300, 200)
+    # 帯（枠の外側 100px）の外、枠周囲のクロップの座標で見た枠の位置 (120, 120) で終わる斜め線2本
+    far = img.copy()
+    cv2.line(far, (20, 420), (170, 320), (30, 30, 30), 3)
+    cv2.line(far, (420, 420), (370, 320), (30, 30, 30), 3)
+    # 枠の下辺で終わる斜め線2本
+    near = img.copy()
+    cv2.line(near, (550, 890), (700, 800), (30, 30, 30), 3)
+    cv2.line(near, (950, 890), (800, 800), (30, 30, 30), 3)
+    for page_img, expected in ((far, None), (near, 'arrow_connected')):
+        # page=None（タイル処理・pyramid）は枠周囲のクロップ、それ以外はページ全体で判定
+        for page in (None, image_processing.PageAnalysis(page_img)):
+            candidate = image_processing._FrameCandidate(page_img, page, bbox, [])
+            assert image_processing._check_arrow(candidate) == expected
+
+
+@pytest.mark.parametrize('filter_order', ['measured', ('frame_count', 'arrow', 'extracted_frame',
+                                                       'assembly_number', 'quantity_labels', 'blue_frame')])
+def test_filter_order_keeps_regions_and_records_checks(filter_order):
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    fixed_stats = image_processing.DetectionStats()
+    fixed = image_processing.detect_assembly_regions(img, stats=fixed_stats)
+    stats = image_processing.DetectionStats()
+    assert image_processing.detect_assembly_regions(img, filter_order=filter_order, stats=stats) == fixed
+
+    candidates = fixed_stats.counts['rectangles.after_nms']
+    for checks in (fixed_stats.checks, stats.checks):
+        assert set(checks) == set(image_processing.FRAME_CHECKS)
+        assert candidates - sum(c['rejected'] for c in checks.values()) == len(fixed)
+    order = image_processing._resolve_filter_order(filter_order)[0]
+    assert stats.checks[order[0]]['calls'] == candidates
+    with pytest.raises(ValueError):
+        image_processing.detect_assembly_regions(img, filter_order=('arrow',))
+
+
+def test_morph_line_detector_finds_axis_aligned_lines():
+    mask = np.zeros((300, 400), dtype=np.uint8)
+    cv2.rectangle(mask, (50, 40), (350, 240), 255, 3)
+    mask[38:43, 200:206] = 0                                  # 6px の切れ目は max_line_gap で埋める
+    cv2.line(mask, (60, 100), (300, 200), 255, 3)             # 斜め線は検出しない
+    h_lines, v_lines = image_processing._detect_lines_morph(mask, min_line_length=100)
+    h_lines = image_processing._merge_nearby_lines(h_lines, is_horizontal=True)
+    v_lines = image_processing._merge_nearby_lines(v_lines, is_horizontal=False)
+    assert h_lines == [(48, 352, 40), (48, 352, 240)]      # 太さ3の枠線は5px幅で描画される
+    assert v_lines == [(38, 242, 50), (38, 242, 350)]
+
+def test_morph_line_detector_matches_hough_regions():
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    keys = ('region_x', 'region_y', 'region_width', 'region_height')
+    hough = image_processing.detect_assembly_regions(img)
+    morph = image_processing.detect_assembly_regions(img, line_detector='morph')
+    assert len(morph) == len(hough)
+    for a, b in zip(hough, morph):
+        assert max(abs(a[k] - b[k]) for k in keys) <= 2
+    with pytest.raises(ValueError):
+        image_processing.detect_assembly_regions(img, line_detector='lsd')
+
+@pytest.mark.parametrize('options', [{}, {'pyramid': True, 'working_size': 1000}, {'max_memory_mb': 30}])
+def test_fused_line_detector_matches_morph(options):
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    page = image_processing.PageAnalysis(img)
+    masks = {color: page.mask(color) for color in ('red', 'black', 'blue')}
+    fused = image_processing._detect_lines_fused(masks, min_line_length=107)
+    assert fused == {color: image_processing._detect_lines_morph(mask, min_line_length=107)
+                     for color, mask in masks.items()}
+    assert (image_processing.detect_assembly_regions(img, line_detector='fused', **options) ==
+            image_processing.detect_assembly_regions(img, line_detector='morph', **options))
+
+
+def test_frame_line_index_validation_matches_crop_hough():
+    index = image_processing.FrameLineIndex({
+        'red': ([(0, 300, 50), (100, 200, 120), (0, 300, 200)], [(10, 85, 40)]),
+        'black': ([(20, 80, 60)], []),
+    })
+    # 枠内の線だけを枠に合わせて切り、枠の座標で返す（切った後に min_length 未満の線は除く）
+    assert index.lines_in((30, 40, 250, 130), ('red', 'black'), 50) == (
+        [(0, 219, 10), (70, 170, 80), (0, 50, 20)], [])
+
+    img = cv2.imread(os.path.join(SAMPLE_DIR, 'AssemblyDiagram.jpg'))
+    page = image_processing.PageAnalysis(img)
+    frames = image_processing._remove_duplicate_rectangles(
+        image_processing._detect_colored_frames(page, 'red', 107) +
+        image_processing._detect_colored_frames(page, 'black', 107))
+    index = image_processing._validation_line_index(
+        page, [image_processing._FrameCandidate(img, page, frame['bbox'], []).crop_box for frame in frames])
+    # 全枠候補で、ページの線から判定した結果が切り出し画像の Hough による判定と一致する
+    for frame in frames:
+        crop_hough = image_processing._FrameCandidate(img, page, frame['bbox'], [])
+        page_lines = image_processing._FrameCandidate(img, page, frame['bbox'], [], index)
+        for name in image_processing._VALIDATION_CHECKS:
+            check = image_processing.FRAME_CHECKS[name]
+            assert check(page_lines) == check(crop_hough)
+
+
+@pytest.mark.parametrize('options', [{}, {'pyramid': True, 'working_size': 700}])
+@pytest.mark.parametrize('path', SAMPLE_PAGES, ids=os.path.basename)
+def test_line_index_validation_accepts_same_regions_as_crop(path, options):
+    img = cv2.imread(path)
+    crop = image_processing.detect_assembly_regions(img, validation='crop', **options)
+    # 既定は切り出し画像ごとの Hough（validation='crop'）
+    assert image_processing.detect_assembly_regions(img, **options) == crop
+    assert image_processing.detect_assembly_regions(img, validation='lines', **options) == crop
+    assert image_processing.detect_assembly_regions(
+        img, validation='lines', filter_order=('extracted_frame', 'frame_count', 'blue_frame',
+                                               'quantity_labels', 'arrow', 'assembly_number'),
+        **options) == crop
+    with pytest.raises(ValueError):
+        image_processing.detect_assembly_regions(img, validation='coarse')
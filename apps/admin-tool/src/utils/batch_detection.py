@@ -0,0 +1,221 @@
+"""
+複数ページの組立番号・部品検出のプロセス並列実行
+
+ページごとに detect_assembly_regions（組立番号画像の領域）と、検出した各領域の detect_parts
+（部品）をプロセスプールで実行する。
+
+- デコード済みのページは multiprocessing.shared_memory に1回コピーし、ワーカーには
+  共有メモリ名・shape・dtype だけを渡す（数MBの NumPy 配列を pickle しない）
+- 戻り値は座標だけの軽量なレコード（PIL画像は作らない）。画像が必要な場合は
+  crop_assembly_regions / render_parts（contours=True の輪郭を使用）で親プロセス側で生成する
+- ワーカー数と、ワーカーごとの OpenCV のスレッド数（cv2.setNumThreads）を指定できる
+  （既定はワーカー数 = CPU数、OpenCV のスレッド数 = CPU数 // ワーカー数）
+
+Usage:
+    from utils.batch_detection import detect_pages, iter_detect_pages
+
+    records = detect_pages(["page1.jpg", "page2.jpg"], workers=4, lazy_upscale=True)
+    for record in iter_detect_pages(paths, workers=4):   # 終わったページから順に
+        ...
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+from utils import image_processing
+from utils.detection_cache import encode_parts_detection
+
+# detect_assembly_regions に渡せるオプション（workers= は枠ごとのスレッド数なので渡さない）
+DETECT_OPTIONS = ('pyramid', 'working_size', 'max_memory_mb', 'line_detector', 'filter_order',
+                  'validation')
+
+
+def _decode_page(page) -> Optional[np.ndarray]:
+    """ファイルパス・PIL Image・BGR配列をBGR配列にする（読めない場合はNone）"""
+    if isinstance(page, (str, os.PathLike)):
+        # cv2.imread は日本語を含むパスを読めないので、バイト列からデコードする
+        try:
+            data = np.fromfile(page, dtype=np.uint8)
+        except OSError:
+            return None
+        return cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+    if isinstance(page, np.ndarray):
+        return page
+    return image_processing._page_to_bgr(page)
+
+
+def _part_records(region: Dict, detection: dict) -> List[Dict]:
+    """detect_parts() の部品の bbox をページ座標の {'x', 'y', 'width', 'height'} にする"""
+    if detection['frame_roi'] is None:
+        return []
+    roi_x, roi_y = detection['frame_roi'][:2]
+    # 超解像あり: 部品座標は 2x の枠内画像、lazy_upscale: 原寸の枠内画像
+    scale = 1 if detection['lazy_upscale'] else 2
+    records = []
+    for part in detection['parts']:
+        x, y, w, h = (int(v) for v in part['bbox'])
+        x1, y1 = x // scale, y // scale
+        x2, y2 = -(-(x + w) // scale), -(-(y + h) // scale)
+        records.append({
+            'x': region['region_x'] + roi_x + x1,
+            'y': region['region_y'] + roi_y + y1,
+            'width': x2 - x1,
+            'height': y2 - y1,
+        })
+    return records
+
+
+def detect_page(img: np.ndarray, parts: bool = True, lazy_upscale: bool = False,
+                contours: bool = False, **options) -> Dict:
+    """
+    1ページ（BGR）の組立番号画像の領域と、領域ごとの部品を検出する。
+
+    Args:
+        parts: Falseの場合、部品検出を行わない
+        lazy_upscale: detect_parts の lazy_upscale
+        contours: Trueの場合、領域ごとに detect_parts の結果（'parts_detection'、
+                  encode_parts_detection の形式）も返す。領域の切り出し画像と一緒に
+                  render_parts(detection_cache.decode_parts_detection(...)) に渡すと部品画像を作れる
+        options: detect_assembly_regions のオプション（DETECT_OPTIONS）
+
+    Returns:
+        {'width': int, 'height': int, 'seconds': float,
+         'regions': [{'region_x', 'region_y', 'region_width', 'region_height',
+                      'parts': [{'x', 'y', 'width', 'height'}, ...]}, ...]}
+        （部品の座標もページ座標）
+    """
+    start = time.perf_counter()
+    regions = image_processing.detect_assembly_regions(img, **options)
+    for region in regions:
+        if not parts:
+            continue
+        x1, y1 = region['region_x'], region['region_y']
+        x2, y2 = x1 + region['region_width'], y1 + region['region_height']
+        detection = image_processing.detect_parts(img[y1:y2, x1:x2], lazy_upscale=lazy_upscale)
+        region['parts'] = _part_records(region, detection)
+        if contours:
+            region['parts_detection'] = encode_parts_detection(detection)
+    return {
+        'width': int(img.shape[1]),
+        'height': int(img.shape[0]),
+        'seconds': round(time.perf_counter() - start, 5),
+        'regions': regions,
+    }
+
+
+def _init_worker(opencv_threads: int) -> None:
+    cv2.setNumThreads(opencv_threads)
+
+
+def _detect_shared_page(name: str, shape: tuple, dtype: str, kwargs: Dict) -> Dict:
+    """ワーカー: 共有メモリ上のページを（コピーせずに）検出する"""
+    shm = shared_memory.SharedMemory(name=name)
+    # 例外時は traceback がページを参照したままなので閉じない（親プロセスが unlink する）
+    record = detect_page(np.ndarray(shape, dtype=dtype, buffer=shm.buf), **kwargs)
+    shm.close()
+    return record
+
+
+def _to_shared_memory(img: np.ndarray) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+    np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[...] = img
+    return shm
+
+
+def _failed_record(index: int, source) -> Dict:
+    return {'index': index, 'source': source, 'error': 'decode_failed', 'regions': []}
+
+
+def iter_detect_pages(pages: Iterable, workers: Optional[int] = None,
+                      opencv_threads: Optional[int] = None, max_pending: Optional[int] = None,
+                      parts: bool = True, lazy_upscale: bool = False, contours: bool = False,
+                      **options):
+    """
+    ページごとに detect_page を実行し、終わったページから順にレコードを yield する。
+
+    Args:
+        pages: ファイルパス・PIL Image・BGR配列の iterable（1枚ずつデコードして投入する）
+        workers: プロセス数（既定: CPU数）。1以下の場合はこのプロセスで順に実行する
+        opencv_threads: ワーカーごとの OpenCV のスレッド数（既定: CPU数 // workers、最低1）
+        max_pending: 同時に共有メモリに置くページ数の上限（既定: 2 * workers）
+        parts, lazy_upscale, contours, options: detect_page 参照
+
+    Yields:
+        detect_page の結果に 'index'（pages 内の順番）と 'source'（パスの場合はパス、それ以外は None）を
+        加えたもの。読めないファイルは {'index', 'source', 'error': 'decode_failed', 'regions': []}
+    """
+    unknown = set(options) - set(DETECT_OPTIONS)
+    if unknown:
+        raise TypeError(f"unexpected detection options: {sorted(unknown)}")
+    cpus = os.cpu_count() or 1
+    workers = cpus if workers is None else workers
+    kwargs = dict(options, parts=parts, lazy_upscale=lazy_upscale, contours=contours)
+
+    def source_of(page):
+        return os.fspath(page) if isinstance(page, (str, os.PathLike)) else None
+
+    if workers <= 1:
+        for index, page in enumerate(pages):
+            img = _decode_page(page)
+            if img is None:
+                yield _failed_record(index, source_of(page))
+                continue
+            yield {'index': index, 'source': source_of(page), **detect_page(img, **kwargs)}
+        return
+
+    opencv_threads = opencv_threads or max(1, cpus // workers)
+    max_pending = max_pending or 2 * workers
+    # spawn: fork したプロセスでは OpenCV の内部スレッドプールがデッドロックすることがある
+    context = multiprocessing.get_context('spawn')
+    pending = {}
+
+    def finished(done):
+        for future in done:
+            index, source, shm = pending.pop(future)
+            try:
+                record = future.result()
+            finally:
+                shm.close()
+                shm.unlink()
+            yield {'index': index, 'source': source, **record}
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(opencv_threads,)) as pool:
+        try:
+            for index, page in enumerate(pages):
+                img = _decode_page(page)
+                if img is None:
+                    yield _failed_record(index, source_of(page))
+                    continue
+                shm = _to_shared_memory(img)
+                future = pool.submit(_detect_shared_page, shm.name, img.shape, img.dtype.str, kwargs)
+                pending[future] = (index, source_of(page), shm)
+                del img
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from finished(done)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+        finally:
+            # 途中で打ち切られた・失敗した場合も共有メモリを解放する
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            for _, _, shm in pending.values():
+                shm.close()
+                shm.unlink()
+
+
+def detect_pages(pages: Iterable, workers: Optional[int] = None, **kwargs) -> List[Dict]:
+    """
+    iter_detect_pages の結果を pages の順に並べたリストで返す。
+    """
+    return sorted(iter_detect_pages(pages, workers=workers, **kwargs), key=lambda r: r['index'])
@@ -0,0 +1,455 @@
+"""
+製品の組立ページ → 組立番号画像 → 部品のヘッドレス一括登録
+
+製品ID（登録済みの assembly_pages）またはページ画像のディレクトリを入力に、全ページの組立番号画像
+（extract_assembly_images）と、各組立番号画像の部品（extract_parts）を検出して
+assembly_images / parts / assembly_image_parts（ディレクトリの場合は assembly_pages も）に登録する。
+
+- 検出は utils.batch_detection.iter_detect_pages でページごとにプロセス並列に行い、
+  切り出し・部品の透過画像の生成とアップロードは親プロセスで行う（アップロードはスレッド並列）
+- 行はページごとにテーブル単位でまとめて upsert する
+- ID はページ・組立番号画像・部品の位置から決まる UUID（uuid5）なので、途中で止まったページを
+  やり直しても同じ行・同じStorageのファイルが上書きされる（重複しない）。登録済みのページは
+  (product_id, page_number) で既存の行を使い、ページ画像が登録済みなら（手動で差し替えた画像を含む）
+  overwrite を指定しない限りアップロードせず image_url も変更しない
+- やり直したページで前回の行と組立番号が変わった・なくなった組立番号画像と部品の行は、書き込む前に削除する
+- 書き込みが終わったページはチェックポイント（JSON）に記録し、再実行時は飛ばす
+- 組立番号はページ番号順に start_number からの通し番号。手動で登録済みの組立番号画像がある
+  ページは変更せず、その最大の番号の次から続ける
+
+Usage:
+    from utils.batch_pipeline import Checkpoint, SupabaseWriter, product_page_jobs, run_pipeline
+
+    client = get_supabase_client()
+    jobs = product_page_jobs(client, product_id, work_dir)
+    summary = run_pipeline(jobs, SupabaseWriter(client), Checkpoint(work_dir / "checkpoint.json"), workers=4)
+"""
+
+import json
+import os
+import re
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils import batch_detection, image_processing
+from utils.detection_cache import decode_parts_detection
+from utils.supabase_client import IMAGE_MAX_SIZE, check_db_response, encode_image_webp, upload_image_to_supabase
+
+# pipeline_id の名前空間（変更すると再実行時に別の行として登録される）
+PIPELINE_NAMESPACE = uuid.UUID('6f1d3c2e-5b7a-4e08-9a41-2c8d0b6e7f53')
+
+# 書き込み順（外部キーの参照先から）
+TABLES = ('assembly_pages', 'parts', 'assembly_images', 'assembly_image_parts')
+
+# id 以外の一意キーで upsert するテーブル（UNIQUE 制約の列）
+ON_CONFLICT = {'assembly_pages': 'product_id,page_number'}
+
+REGION_KEYS = ('region_x', 'region_y', 'region_width', 'region_height')
+
+PAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+
+
+def pipeline_id(*keys) -> str:
+    """キーの並びから決まる UUID（例: pipeline_id(page_id, 'assembly', 1)）"""
+    return str(uuid.uuid5(PIPELINE_NAMESPACE, '/'.join(str(k) for k in keys)))
+
+
+class Checkpoint:
+    """
+    書き込みが終わったページの記録（JSON、ページのキーごとに件数と次の組立番号）
+
+    記録のたびに一時ファイルに書いてから置き換えるので、途中で止まっても壊れない。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.pages: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                self.pages = json.load(f).get('pages', {})
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.pages.get(key)
+
+    def mark(self, key: str, entry: Dict) -> None:
+        self.pages[key] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'pages': self.pages}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+class SupabaseWriter:
+    """Supabase（Storage + DB）に書き込む"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def upload(self, image, filename: str) -> str:
+        return upload_image_to_supabase(image, filename, client=self.client)
+
+    def select(self, table: str, column: str, values: List[str]) -> List[Dict]:
+        if not values:
+            return []
+        response = self.client.table(table).select("*").in_(column, values).execute()
+        return check_db_response(response, f"SELECT {table} ({column}, count={len(values)})") or []
+
+    def upsert(self, table: str, rows: List[Dict], on_conflict: Optional[str] = None) -> None:
+        if not rows:
+            return
+        query = self.client.table(table)
+        query = query.upsert(rows, on_conflict=on_conflict) if on_conflict else query.upsert(rows)
+        response = query.execute()
+        check_db_response(response, f"UPSERT {table} (count={len(rows)})")
+
+    def delete(self, table: str, ids: List[str]) -> None:
+        if not ids:
+            return
+        response = self.client.table(table).delete().in_("id", ids).execute()
+        check_db_response(response, f"DELETE {table} (count={len(ids)})")
+
+
+class LocalWriter:
+    """
+    Supabaseの代わりにディレクトリに書き込む（確認用）
+
+    画像は Storage と同じ WebP で <directory>/<filename> に、行は <directory>/<table>.json に
+    id をキーとして保存する。
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def upload(self, image, filename: str) -> str:
+        path = self.directory / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(encode_image_webp(image))
+        return path.as_uri()
+
+    def rows(self, table: str) -> Dict[str, Dict]:
+        path = self.directory / f"{table}.json"
+        if not path.exists():
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save(self, table: str, stored: Dict[str, Dict]) -> None:
+        with open(self.directory / f"{table}.json", 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2, ensure_ascii=False)
+
+    def select(self, table: str, column: str, values: List[str]) -> List[Dict]:
+        return [row for row in self.rows(table).values() if row[column] in values]
+
+    def upsert(self, table: str, rows: List[Dict], on_conflict: Optional[str] = None) -> None:
+        if not rows:
+            return
+        stored = self.rows(table)
+        if on_conflict:
+            # 一意キーが同じ行は置き換える（Supabase の on_conflict と同じ）
+            columns = on_conflict.split(',')
+            keys = {tuple(row[c] for c in columns) for row in rows}
+            stored = {key: row for key, row in stored.items() if tuple(row[c] for c in columns) not in keys}
+        stored.update((row['id'], row) for row in rows)
+        self._save(table, stored)
+
+    def delete(self, table: str, ids: List[str]) -> None:
+        if not ids:
+            return
+        stored = self.rows(table)
+        self._save(table, {key: row for key, row in stored.items() if key not in ids})
+
+
+def product_page_jobs(client, product_id: str, work_dir) -> List[Dict]:
+    """
+    製品の assembly_pages（ページ番号順）のジョブ。ページ画像は work_dir/pages にダウンロードする。
+    """
+    pages_response = client.table("assembly_pages").select("id, page_number, image_url") \
+        .eq("product_id", product_id).order("page_number").execute()
+    pages = check_db_response(pages_response, f"SELECT assembly_pages (product_id={product_id})") or []
+    existing = _existing_assembly_images(client, [page['id'] for page in pages])
+    return [{
+        'key': page['id'],
+        'page_id': page['id'],
+        'product_id': product_id,
+        'page_number': page['page_number'],
+        'path': Path(work_dir) / 'pages' / f"{page['id']}.webp",
+        'url': page['image_url'],
+        'register': False,
+        'upload_page': False,
+        'existing': existing.get(page['id'], []),
+    } for page in pages]
+
+
+def directory_page_jobs(pages_dir, product_id: Optional[str] = None, client=None,
+                        overwrite: bool = False) -> List[Dict]:
+    """
+    ディレクトリのページ画像のジョブ（ファイル名順）。assembly_pages の行も作る。
+
+    ページ番号はファイル名の最後の数字（なければ順番）。client を渡すと、同じページ番号で登録済みの
+    assembly_pages があればその ID を使い、登録済みの組立番号画像を確認する。登録済みのページに
+    image_url がある場合は、overwrite=True のときだけページ画像をアップロードして image_url を置き換える。
+    """
+    paths = sorted(p for p in Path(pages_dir).iterdir() if p.suffix.lower() in PAGE_EXTENSIONS)
+    jobs = []
+    for order, path in enumerate(paths, start=1):
+        numbers = re.findall(r'\d+', path.stem)
+        jobs.append({
+            'key': path.name,
+            'page_id': pipeline_id(product_id, 'page', path.name),
+            'product_id': product_id,
+            'page_number': int(numbers[-1]) if numbers else order,
+            'path': path,
+            'url': None,
+            'register': True,
+            'upload_page': True,
+            'existing': [],
+        })
+    jobs.sort(key=lambda job: job['page_number'])
+    if client is not None:
+        if product_id is not None:
+            registered = _registered_pages(client, product_id)
+            for job in jobs:
+                page = registered.get(job['page_number'])
+                if page is not None:
+                    job['page_id'] = page['id']
+                    job['upload_page'] = overwrite or not page['image_url']
+        existing = _existing_assembly_images(client, [job['page_id'] for job in jobs])
+        for job in jobs:
+            job['existing'] = existing.get(job['page_id'], [])
+    return jobs
+
+
+def _registered_pages(client, product_id: str) -> Dict[int, Dict]:
+    """製品の登録済みの assembly_pages（ページ番号 → 行: id, page_number, image_url）"""
+    response = client.table("assembly_pages").select("id, page_number, image_url") \
+        .eq("product_id", product_id).execute()
+    pages = check_db_response(response, f"SELECT assembly_pages (product_id={product_id})") or []
+    return {page['page_number']: page for page in pages}
+
+
+def _existing_assembly_images(client, page_ids: List[str]) -> Dict[str, List[Dict]]:
+    if not page_ids:
+        return {}
+    response = client.table("assembly_images").select("id, page_id, assembly_number, display_order") \
+        .in_("page_id", page_ids).execute()
+    existing = {}
+    for row in check_db_response(response, f"SELECT assembly_images (pages={len(page_ids)})") or []:
+        existing.setdefault(row['page_id'], []).append(row)
+    return existing
+
+
+def _manual_numbers(job: Dict) -> Optional[List[int]]:
+    """
+    パイプライン以外で登録された組立番号画像がある場合はその番号（数字のもの）、なければNone
+    （パイプラインが途中まで書いた行は ID で見分け、やり直す）
+    """
+    manual = [row for row in job['existing']
+              if row['id'] != pipeline_id(job['page_id'], 'assembly', row['display_order'])]
+    if not manual:
+        return None
+    return [int(row['assembly_number']) for row in manual if str(row['assembly_number']).isdigit()]
+
+
+def _page_paths(jobs: Iterable[Dict], log: Callable[[str], None]):
+    """ページ画像のパス（URLのページは未ダウンロードならダウンロードしてから）"""
+    for job in jobs:
+        path = Path(job['path'])
+        if job['url'] and not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + '.tmp')
+            try:
+                with urllib.request.urlopen(job['url'], timeout=60) as response:
+                    tmp.write_bytes(response.read())
+                os.replace(tmp, path)
+            except OSError as e:
+                log(f"ページ画像のダウンロードに失敗しました: {job['url']} ({e})")
+        yield path
+
+
+def _storage_scale(img: np.ndarray) -> float:
+    """upload_image_to_supabase で保存したページ画像の、元画像に対する倍率"""
+    height, width = img.shape[:2]
+    if max(width, height) <= IMAGE_MAX_SIZE:
+        return 1.0
+    return IMAGE_MAX_SIZE / max(width, height)
+
+
+def page_rows(job: Dict, img: np.ndarray, record: Dict, first_number: int):
+    """
+    1ページの検出結果（iter_detect_pages のレコード、contours=True）から登録する行と画像を作る。
+
+    Returns:
+        (rows, uploads)
+        rows: {table: [row, ...]}（image_url / parts_url は None）
+        uploads: [(row, URLの列名, PIL Image, Storageのファイル名), ...]
+    """
+    page_id = job['page_id']
+    rows = {table: [] for table in TABLES}
+    uploads = []
+    # 組立番号画像の座標は Storage のページ画像（長辺 IMAGE_MAX_SIZE px まで縮小）の座標
+    # （ページ画像をアップロードしない登録済みのページも同じ大きさで登録されているとみなす）
+    scale = _storage_scale(img) if job['register'] else 1.0
+    if job['upload_page']:
+        page = {'id': page_id, 'product_id': job['product_id'],
+                'page_number': job['page_number'], 'image_url': None}
+        rows['assembly_pages'].append(page)
+        uploads.append((page, 'image_url', Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)),
+                        f"assembly_pages/{page_id}.webp"))
+
+    crops = image_processing.crop_assembly_regions(img, record['regions'])
+    for i, (region, crop) in enumerate(zip(record['regions'], crops), start=1):
+        assembly_id = pipeline_id(page_id, 'assembly', i)
+        assembly = {
+            'id': assembly_id,
+            'page_id': page_id,
+            'assembly_number': str(first_number + i - 1),
+            'display_order': i,
+            'image_url': None,
+            **{key: int(round(region[key] * scale)) for key in REGION_KEYS},
+        }
+        rows['assembly_images'].append(assembly)
+        uploads.append((assembly, 'image_url', crop, f"assembly_images/{assembly_id}.webp"))
+
+        # 組立番号画像（切り出し）に対する extract_parts と同じ部品画像
+        x1, y1 = region['region_x'], region['region_y']
+        x2, y2 = x1 + region['region_width'], y1 + region['region_height']
+        part_images = image_processing.render_parts(img[y1:y2, x1:x2],
+                                                    decode_parts_detection(region['parts_detection']))
+        for j, part_image in enumerate(part_images, start=1):
+            part_id = pipeline_id(assembly_id, 'part', j)
+            part = {'id': part_id, 'parts_url': None, 'name': f"パーツ {j}", 'color': "不明", 'parts_code': None}
+            rows['parts'].append(part)
+            uploads.append((part, 'parts_url', part_image, f"parts/{part_id}.webp"))
+            rows['assembly_image_parts'].append({
+                'id': pipeline_id(assembly_id, 'slot', j),
+                'assembly_image_id': assembly_id,
+                'part_id': part_id,
+                'quantity': 1,
+                'display_order': j,
+            })
+    return rows, uploads
+
+
+def _delete_previous_rows(writer, page_id: str, rows: Dict[str, List[Dict]]) -> None:
+    """
+    ページに前回書き込んだ組立番号画像・部品のうち、今回の行に置き換わらないものを削除する。
+
+    組立番号が変わる組立番号画像（start_number の変更など）は、UNIQUE(page_id, assembly_number) に
+    当たらないよう削除してから書き直す。今回の行と同じ ID の部品は削除せず上書きする
+    （部品を参照する task_part_requests を消さないため）。パイプライン以外で追加された部品は残す。
+    """
+    numbers = {row['id']: row['assembly_number'] for row in rows['assembly_images']}
+    previous = writer.select('assembly_images', 'page_id', [page_id])
+    stale_images = {row['id'] for row in previous if numbers.get(row['id']) != row['assembly_number']}
+    links = writer.select('assembly_image_parts', 'assembly_image_id', [row['id'] for row in previous])
+    link_ids = {row['id'] for row in rows['assembly_image_parts']}
+    part_ids = {row['id'] for row in rows['parts']}
+    # 削除する組立番号画像の紐付けはすべて、残る組立番号画像はパイプラインが作った紐付けのうち今回ないもの
+    stale_links = [link for link in links
+                   if link['assembly_image_id'] in stale_images or
+                   (link['id'] not in link_ids and
+                    link['id'] == pipeline_id(link['assembly_image_id'], 'slot', link['display_order']))]
+    stale_parts = [link['part_id'] for link in stale_links
+                   if link['part_id'] not in part_ids and
+                   link['part_id'] == pipeline_id(link['assembly_image_id'], 'part', link['display_order'])]
+    writer.delete('assembly_image_parts', [link['id'] for link in stale_links])
+    writer.delete('parts', stale_parts)
+    writer.delete('assembly_images', sorted(stale_images))
+
+
+def write_page(job: Dict, img: np.ndarray, record: Dict, first_number: int, writer,
+               upload_threads: int = 4) -> Dict[str, List[Dict]]:
+    """1ページ分の画像をアップロードし、前回の行を整理してから行をテーブルごとにまとめて書き込む"""
+    rows, uploads = page_rows(job, img, record, first_number)
+    with ThreadPoolExecutor(max_workers=max(1, upload_threads)) as pool:
+        urls = list(pool.map(lambda u: writer.upload(u[2], u[3]), uploads))
+    for (row, column, _, _), url in zip(uploads, urls):
+        row[column] = url
+    _delete_previous_rows(writer, job['page_id'], rows)
+    for table in TABLES:
+        writer.upsert(table, rows[table], on_conflict=ON_CONFLICT.get(table))
+    return rows
+
+
+def run_pipeline(jobs: List[Dict], writer, checkpoint: Checkpoint, workers: Optional[int] = None,
+                 start_number: int = 1, upload_threads: int = 4,
+                 max_memory_mb: Optional[float] = image_processing.TILED_MEMORY_BUDGET_MB,
+                 log: Callable[[str], None] = print) -> Dict:
+    """
+    ジョブ（ページ番号順）を検出・登録する。
+
+    検出はページを並列に行い、書き込みはページ番号順に行う（組立番号を通し番号にするため）。
+    読めないページがあった場合はそこで止める（以降のページは次回の実行でやり直す）。
+
+    Args:
+        jobs: product_page_jobs / directory_page_jobs の結果
+        writer: SupabaseWriter または LocalWriter
+        checkpoint: 書き込みが終わったページの記録
+        workers: 検出のプロセス数（iter_detect_pages 参照）
+        start_number: 最初のページの最初の組立番号
+        upload_threads: 画像アップロードのスレッド数
+        max_memory_mb: detect_assembly_regions の max_memory_mb
+
+    Returns:
+        {'pages': 登録したページ数, 'skipped': 飛ばしたページ数, 'assembly_images': int,
+         'parts': int, 'failed': 読めなかったページのキー or None}
+    """
+    pending = [job for job in jobs
+               if checkpoint.get(job['key']) is None and _manual_numbers(job) is None]
+    records = batch_detection.iter_detect_pages(
+        _page_paths(pending, log), workers=workers, lazy_upscale=True, contours=True,
+        max_memory_mb=max_memory_mb)
+    summary = {'pages': 0, 'skipped': 0, 'assembly_images': 0, 'parts': 0, 'failed': None}
+    finished = {}
+    position = 0
+    next_number = start_number
+    try:
+        for job in jobs:
+            entry = checkpoint.get(job['key'])
+            manual = _manual_numbers(job) if entry is None else None
+            if entry is not None or manual is not None:
+                if entry is not None:
+                    next_number = entry['next_number']
+                elif manual:
+                    next_number = max(next_number, max(manual) + 1)
+                summary['skipped'] += 1
+                continue
+
+            # 検出は終わった順、書き込みはページ番号順
+            while position not in finished:
+                record = next(records)
+                finished[record['index']] = record
+            record = finished.pop(position)
+            position += 1
+            img = batch_detection._decode_page(job['path']) if not record.get('error') else None
+            if img is None:
+                summary['failed'] = job['key']
+                log(f"ページ {job['page_number']} ({job['key']}) を読めないため中断します")
+                break
+
+            rows = write_page(job, img, record, next_number, writer, upload_threads=upload_threads)
+            count = len(rows['assembly_images'])
+            next_number += count
+            checkpoint.mark(job['key'], {
+                'page_id': job['page_id'],
+                'assembly_images': count,
+                'parts': len(rows['parts']),
+                'next_number': next_number,
+            })
+            summary['pages'] += 1
+            summary['assembly_images'] += count
+            summary['parts'] += len(rows['parts'])
+            log(f"ページ {job['page_number']}: 組立番号画像 {count}件、部品 {len(rows['parts'])}件")
+    finally:
+        # 途中で止めた場合もワーカーと共有メモリを片付ける
+        records.close()
+    return summary
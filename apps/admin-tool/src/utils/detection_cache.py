@@ -0,0 +1,333 @@
+"""
+検出結果の永続キャッシュ
+
+extract_assembly_images / extract_parts の検出結果（座標・輪郭のみ、PIL画像は保存しない）を
+画像内容のハッシュ + アルゴリズムバージョン + パラメータをキーとしてSQLiteに保存する。
+キャッシュヒット時は切り出し・透過画像の生成のみ行う。
+
+- 保存先: 環境変数 DETECTION_CACHE_DIR（デフォルト: apps/admin-tool/cache）
+- 上限サイズ: 環境変数 DETECTION_CACHE_MAX_MB（デフォルト: 64MB）、超えたら最終アクセスが古い順に削除（LRU）
+- 環境変数 DETECTION_CACHE_ENABLED=0 で無効化
+
+Usage:
+    from utils.detection_cache import cached_extract_assembly_images, cached_iter_assembly_images, cached_extract_parts
+
+    detected = cached_extract_assembly_images(image, return_coords=True)
+    for item in cached_iter_assembly_images(image, return_coords=True):
+        ...
+    parts = cached_extract_parts(image, lazy_upscale=True)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils import image_processing
+
+CACHE_DIR = Path(os.getenv("DETECTION_CACHE_DIR", Path(__file__).parent.parent.parent / "cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("DETECTION_CACHE_MAX_MB", 64)) * 1024 * 1024)
+CACHE_ENABLED = os.getenv("DETECTION_CACHE_ENABLED", "1") != "0"
+
+
+def image_digest(img: np.ndarray) -> str:
+    """
+    画像内容（画素・形状・型）のハッシュ
+    """
+    img = np.ascontiguousarray(img)
+    h = hashlib.sha256()
+    h.update(f"{img.shape}|{img.dtype}".encode())
+    h.update(memoryview(img).cast("B"))
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """
+    サイズ上限付きLRUのキー・バリューストア（SQLite、値はJSON）
+
+    Streamlitのスレッド・プロセス間で共有できるよう、操作ごとに接続を開く。
+    """
+
+    def __init__(self, path, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        """接続を開いてトランザクション（正常終了でコミット）を実行し、最後に接続を閉じる"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        """
+        値を返す（なければNone）。ヒットした場合は最終アクセス時刻を更新する。
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value) -> None:
+        """
+        値を保存し、合計サイズが上限を超えたら最終アクセスが古い順に削除する。
+        """
+        data = json.dumps(value, separators=(",", ":"))
+        size = len(data.encode())
+        if size > self.max_bytes:
+            return
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            # 古い順に、上限以下になるまで削除
+            evict = []
+            for old_key, old_size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                evict.append((old_key,))
+                total -= old_size
+            conn.executemany("DELETE FROM entries WHERE key = ?", evict)
+
+    def total_bytes(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+_default_cache: Optional[DetectionCache] = None
+
+
+def get_detection_cache() -> Optional[DetectionCache]:
+    """
+    デフォルトのキャッシュ（無効化されている・作成できない場合はNone）
+    """
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        try:
+            _default_cache = DetectionCache(CACHE_DIR / "detection.sqlite3")
+        except (OSError, sqlite3.Error):
+            return None
+    return _default_cache
+
+
+def _cache_key(kind: str, img: np.ndarray, **params) -> str:
+    return "|".join([
+        kind,
+        f"v{image_processing.DETECTION_VERSION}",
+        json.dumps(params, sort_keys=True),
+        image_digest(img),
+    ])
+
+
+def _to_bgr(image) -> np.ndarray:
+    if isinstance(image, Image.Image):
+        img = np.array(image)
+        if len(img.shape) == 3 and img.shape[2] == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        return img
+    return image
+
+
+def _lookup(cache: Optional[DetectionCache], key: str):
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except (sqlite3.Error, ValueError):
+        return None
+
+
+def _store(cache: Optional[DetectionCache], key: str, value) -> None:
+    if cache is None:
+        return
+    try:
+        cache.put(key, value)
+    except sqlite3.Error:
+        pass
+
+
+def encode_parts_detection(detection: dict) -> dict:
+    """
+    detect_parts() の結果を JSON にできる形（輪郭は [[x, y], ...]）にする
+    """
+    return {
+        'frame_roi': detection['frame_roi'],
+        'lazy_upscale': detection['lazy_upscale'],
+        'parts': [
+            {'bbox': [int(v) for v in p['bbox']], 'contour': p['contour'].reshape(-1, 2).tolist()}
+            for p in detection['parts']
+        ],
+    }
+
+
+def decode_parts_detection(stored: dict) -> dict:
+    """
+    encode_parts_detection() の結果を render_parts() に渡せる形に戻す
+    """
+    return {
+        'frame_roi': stored['frame_roi'],
+        'lazy_upscale': stored['lazy_upscale'],
+        'parts': [
+            {'bbox': tuple(p['bbox']),
+             'contour': np.array(p['contour'], dtype=np.int32).reshape(-1, 1, 2)}
+            for p in stored['parts']
+        ],
+    }
+
+
+def cached_extract_assembly_images(image, return_coords: bool = False,
+                                   pyramid: bool = False,
+                                   working_size: int = image_processing.PYRAMID_WORKING_SIZE,
+                                   max_memory_mb: Optional[float] = None,
+                                   workers: int = 1,
+                                   line_detector: str = 'hough',
+                                   filter_order='fixed',
+                                   validation: str = 'crop',
+                                   cache: Optional[DetectionCache] = None,
+                                   return_stats: bool = False) -> List:
+    """
+    extract_assembly_images と同じ結果を返す。検出領域はキャッシュから取得する。
+
+    Args:
+        cache: 使用するキャッシュ（省略時は get_detection_cache()）
+        return_stats: Trueの場合、(結果, DetectionStats) を返す（キャッシュのヒット・ミスも記録）
+    """
+    stats = image_processing.DetectionStats() if return_stats else image_processing._NO_STATS
+    cache = cache if cache is not None else get_detection_cache()
+    img = _to_bgr(image)
+    key = _cache_key("assembly_regions", img, pyramid=pyramid,
+                     working_size=working_size if pyramid else None,
+                     max_memory_mb=max_memory_mb, line_detector=line_detector, validation=validation)
+
+    with stats.stage('cache_lookup'):
+        regions = _lookup(cache, key)
+    if regions is None:
+        stats.count('cache.miss')
+        regions = image_processing.detect_assembly_regions(img, pyramid=pyramid, working_size=working_size,
+                                                           max_memory_mb=max_memory_mb, workers=workers,
+                                                           line_detector=line_detector,
+                                                           filter_order=filter_order, validation=validation,
+                                                           stats=stats)
+        _store(cache, key, regions)
+    else:
+        stats.count('cache.hit')
+
+    with stats.stage('crop'):
+        images = image_processing.crop_assembly_regions(img, regions, return_coords=return_coords)
+    return (images, stats) if return_stats else images
+
+
+def cached_iter_assembly_images(image, return_coords: bool = False,
+                                pyramid: bool = False,
+                                working_size: int = image_processing.PYRAMID_WORKING_SIZE,
+                                max_memory_mb: Optional[float] = None,
+                                workers: int = 1,
+                                line_detector: str = 'hough',
+                                filter_order='fixed',
+                                validation: str = 'crop',
+                                cache: Optional[DetectionCache] = None,
+                                stats: image_processing.DetectionStats = image_processing._NO_STATS):
+    """
+    iter_assembly_images と同じ順に yield する。キャッシュヒット時は切り出しのみ行う。
+    キャッシュミス時は検出しながら yield し、最後まで消費された場合のみ結果を保存する。
+
+    Args:
+        cache: 使用するキャッシュ（省略時は get_detection_cache()）
+        stats: 処理時間・件数（キャッシュのヒット・ミスも記録）
+    """
+    cache = cache if cache is not None else get_detection_cache()
+    img = image_processing._page_to_bgr(image, max_memory_mb)
+    key = _cache_key("assembly_regions", img, pyramid=pyramid,
+                     working_size=working_size if pyramid else None,
+                     max_memory_mb=max_memory_mb, line_detector=line_detector, validation=validation)
+
+    with stats.stage('cache_lookup'):
+        regions = _lookup(cache, key)
+    hit = regions is not None
+    if hit:
+        stats.count('cache.hit')
+    else:
+        stats.count('cache.miss')
+        regions = image_processing.iter_assembly_regions(img, pyramid=pyramid, working_size=working_size,
+                                                         max_memory_mb=max_memory_mb, workers=workers,
+                                                         line_detector=line_detector,
+                                                         filter_order=filter_order, validation=validation,
+                                                         stats=stats)
+
+    found = []
+    for region in regions:
+        found.append(region)
+        with stats.stage('crop'):
+            item = image_processing.crop_assembly_regions(img, [region], return_coords=return_coords)[0]
+        yield item
+
+    if not hit:
+        _store(cache, key, found)
+
+
+def cached_extract_parts(image, lazy_upscale: bool = False,
+                         cache: Optional[DetectionCache] = None,
+                         return_stats: bool = False) -> list:
+    """
+    extract_parts と同じ結果を返す。部品の検出結果（bbox・輪郭）はキャッシュから取得する。
+
+    Args:
+        cache: 使用するキャッシュ（省略時は get_detection_cache()）
+        return_stats: Trueの場合、(結果, DetectionStats) を返す（キャッシュのヒット・ミスも記録）
+    """
+    stats = image_processing.DetectionStats() if return_stats else image_processing._NO_STATS
+    cache = cache if cache is not None else get_detection_cache()
+    if isinstance(image, Image.Image):
+        img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    else:
+        img = image
+    key = _cache_key("parts", img, lazy_upscale=lazy_upscale)
+
+    with stats.stage('cache_lookup'):
+        stored = _lookup(cache, key)
+    frame_enhanced = None
+    if stored is None:
+        stats.count('cache.miss')
+        # 検出で拡大・鮮鋭化した枠をそのまま部品画像の生成に使う
+        detection, frame_enhanced = image_processing._detect_parts(img, lazy_upscale, stats)
+        _store(cache, key, encode_parts_detection(detection))
+    else:
+        stats.count('cache.hit')
+        detection = decode_parts_detection(stored)
+
+    parts = image_processing.render_parts(img, detection, stats=stats, frame_enhanced=frame_enhanced)
+    return (parts, stats) if return_stats else parts
@@ -1,8 +1,96 @@
+import bisect
+import heapq
+import threading
+import time
 import cv2
 import numpy as np
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import cached_property
 from typing import List, Tuple, Dict, Optional
 
+# Version of the detection algorithms and parameters. Bump it whenever
+# detect_parts() or detect_assembly_regions() may return different results;
+# results cached under another version are then ignored (utils.detection_cache).
+DETECTION_VERSION = 7
+
+
+class DetectionStats:
+    """
+    Stage timings and counters of one detection call.
+
+    Pass return_stats=True to extract_assembly_images / extract_parts (or a
+    DetectionStats as stats= to the detect_* functions) to record them. The
+    default _NO_STATS ignores everything, so disabled instrumentation only
+    costs a no-op call per stage.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # Per frame check (FRAME_CHECKS): {'calls', 'rejected', 'seconds'}
+        self.checks: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Add the time spent in the with-block to timings[name]."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+
+    def record_check(self, name: str, seconds: float, rejected: bool):
+        """Add one run of a frame check (may be called from the workers= threads)."""
+        with self._lock:
+            entry = self.checks.setdefault(name, {'calls': 0, 'rejected': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['rejected'] += int(rejected)
+            entry['seconds'] += seconds
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.timings.values())
+
+    def as_dict(self) -> dict:
+        return {
+            'timings': {k: round(v, 5) for k, v in self.timings.items()},
+            'counts': dict(self.counts),
+            'checks': {k: dict(v, seconds=round(v['seconds'], 5)) for k, v in self.checks.items()},
+        }
+
+    def log(self, label: str):
+        """Write the stats to the application log (utils.logger)."""
+        from utils.logger import logger
+
+        timings = ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in self.timings.items())
+        counts = ", ".join(f"{k}={v}" for k, v in self.counts.items())
+        logger.info(f"{label}: total={self.total_time * 1000:.1f}ms | {timings} | {counts}")
+
+
+class _NoStats(DetectionStats):
+    """DetectionStats that records nothing (instrumentation disabled)."""
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name: str):
+        return self._context
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def record_check(self, name: str, seconds: float, rejected: bool):
+        pass
+
+
+_NO_STATS = _NoStats()
+
 class NumberExtractor:
     """
     アセンブリ番号（数字）の特徴量マッチングによる抽出クラス
@@ -35,18 +123,14 @@ class NumberExtractor:
         # 1. 色特徴（HSV）
         hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
         
+        labels = _classify_hsv(hsv)
+        
         # 黒の割合
-        lower_black = np.array([0, 0, 0])
-        upper_black = np.array([180, 255, 100])
-        mask_black = cv2.inRange(hsv, lower_black, upper_black)
+        mask_black = _mask_from_labels(labels, 'number_black')
         black_ratio = np.count_nonzero(mask_black) / (w * h)
         
         # 赤の割合
-        lower_red1 = np.array([0, 70, 50])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([170, 70, 50])
-        upper_red2 = np.array([180, 255, 255])
-        mask_red = cv2.inRange(hsv, lower_red1, upper_red1) + cv2.inRange(hsv, lower_red2, upper_red2)
+        mask_red = _mask_from_labels(labels, 'text_red')
         red_ratio = np.count_nonzero(mask_red) / (w * h)
         
         target_color = 'black'
@@ -102,112 +186,125 @@ class NumberExtractor:
         
         # 2. 候補検索
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        
-        if params['color'] == 'black':
-            lower = np.array([0, 0, 0])
-            upper = np.array([180, 255, 100])
-            mask = cv2.inRange(hsv, lower, upper)
-        else: # red
-            lower1 = np.array([0, 70, 50])
-            upper1 = np.array([10, 255, 255])
-            lower2 = np.array([170, 70, 50])
-            upper2 = np.array([180, 255, 255])
-            mask = cv2.inRange(hsv, lower1, upper1) + cv2.inRange(hsv, lower2, upper2)
-            
+        mask = _mask_from_hsv(hsv, 'number_black' if params['color'] == 'black' else 'text_red')
+
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        candidates = []
-        
+        xs, ys, ws, hs = _contour_bounding_rects(contours)
+        areas = ws * hs
+
         # 許容誤差を少し緩める（厳しすぎると何も検出されない）
         h_tol = 0.30  # 高さ ±30%
         a_tol = 0.40  # 面積 ±40%
-        
+
         min_h = params['height'] * (1 - h_tol)
         max_h = params['height'] * (1 + h_tol)
         min_a = params['area'] * (1 - a_tol)
         max_a = params['area'] * (1 + a_tol)
-        
-        filtered_by_height = 0
-        filtered_by_area = 0
-        filtered_by_aspect = 0
-        
-        for cnt in contours:
-            x, y, w, h = cv2.boundingRect(cnt)
-            area = w * h
-            
-            # サイズフィルタ
-            if not (min_h <= h <= max_h):
-                filtered_by_height += 1
-                continue
-            
-            # 面積フィルタ
-            if not (min_a <= area <= max_a):
-                filtered_by_area += 1
-                continue
-            
-            # アスペクト比チェック（少し緩める）
-            aspect = w / h if h > 0 else 999
-            if not (0.2 <= aspect <= 3.0):  # 0.3-2.5 から 0.2-3.0 に緩和
-                filtered_by_aspect += 1
-                continue
-                
-            candidates.append({'bbox': (x, y, w, h), 'center': (x + w/2, y + h/2)})
-            
+
+        # サイズ・面積・アスペクト比フィルタ（0.3-2.5 から 0.2-3.0 に緩和）を一括評価
+        ok_height = (min_h <= hs) & (hs <= max_h)
+        ok_area = ok_height & (min_a <= areas) & (areas <= max_a)
+        aspects = ws / hs
+        ok_aspect = ok_area & (0.2 <= aspects) & (aspects <= 3.0)
+
+        candidates = [
+            {'bbox': (x, y, w, h), 'center': (x + w/2, y + h/2)}
+            for x, y, w, h in zip(xs[ok_aspect].tolist(), ys[ok_aspect].tolist(),
+                                  ws[ok_aspect].tolist(), hs[ok_aspect].tolist())
+        ]
+
         # 3. グルーピング
+        # x順に並べ、y中心の帯ごとに候補を分けて掃引する
         dist_thresh = params['height'] * 1.5
+        y_thresh = params['height'] * 0.5
         grouped_regions = []
-        used_indices = set()
-        
+        used = [False] * len(candidates)
+
         candidates.sort(key=lambda c: c['bbox'][0])
-        
+
+        band_h = y_thresh if y_thresh > 0 else float('inf')
+        bands = {}
+        for idx, c in enumerate(candidates):
+            bands.setdefault(int(c['center'][1] // band_h), []).append(idx)
+
         for i, c1 in enumerate(candidates):
-            if i in used_indices:
+            if used[i]:
                 continue
-                
+
             group = [c1]
-            used_indices.add(i)
-            
+            used[i] = True
+
             current_right = c1['bbox'][0] + c1['bbox'][2]
             current_y_center = c1['center'][1]
-            
-            for j, c2 in enumerate(candidates):
-                if j in used_indices:
+
+            # |Δy| <= y_thresh を満たす候補は隣接する3つの帯のいずれかにある
+            band = int(current_y_center // band_h)
+            nearby = [bands.get(b, []) for b in (band - 1, band, band + 1)]
+            nearby = heapq.merge(*[lst[bisect.bisect_right(lst, i):] for lst in nearby])
+
+            for j in nearby:
+                c2 = candidates[j]
+                if used[j]:
                     continue
-                
-                if abs(c2['center'][1] - current_y_center) > (params['height'] * 0.5):
+
+                # x順に走査しているので、これ以降の候補は追加できない
+                if c2['bbox'][0] - current_right > dist_thresh:
+                    break
+
+                if abs(c2['center'][1] - current_y_center) > y_thresh:
                     continue
-                
+
                 dist = c2['bbox'][0] - current_right
                 if 0 <= dist <= dist_thresh:
                     group.append(c2)
-                    used_indices.add(j)
+                    used[j] = True
                     current_right = c2['bbox'][0] + c2['bbox'][2]
-            
+
             min_x = min(c['bbox'][0] for c in group)
             min_y = min(c['bbox'][1] for c in group)
             max_x = max(c['bbox'][0] + c['bbox'][2] for c in group)
             max_y = max(c['bbox'][1] + c['bbox'][3] for c in group)
-            
+
             # マージンを追加して少し広めに取る
             margin = 5
             h_img, w_img = image.shape[:2]
-            
+
             final_x = max(0, min_x - margin)
             final_y = max(0, min_y - margin)
             final_w = min(w_img - final_x, (max_x - min_x) + margin * 2)
             final_h = min(h_img - final_y, (max_y - min_y) + margin * 2)
-            
+
             grouped_regions.append({
                 'bbox': (final_x, final_y, final_w, final_h),
                 'count': len(group)
             })
-            
+
         return {
             'regions': grouped_regions,
             'params': params,
             'candidates_count': len(candidates)
         }
 
+
+def _contour_bounding_rects(contours) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bounding rects of all contours at once (same values as cv2.boundingRect).
+
+    Returns:
+        Tuple of (xs, ys, ws, hs) int arrays in contour order
+    """
+    if len(contours) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty
+
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    offsets = np.cumsum([0] + [len(c) for c in contours[:-1]])
+    mins = np.minimum.reduceat(points, offsets, axis=0)
+    maxs = np.maximum.reduceat(points, offsets, axis=0)
+    sizes = maxs - mins + 1
+    return mins[:, 0], mins[:, 1], sizes[:, 0], sizes[:, 1]
+
+
 # --- Part Extraction Logic (v2 - Transparent Background) ---
 
 def find_rectangular_contours(gray_img, min_area=1000):
@@ -244,19 +341,16 @@ def find_rectangular_contours(gray_img, min_area=1000):
 def _is_blue_indicator(frame_img, bbox):
     """
     Check if the region is a blue indicator (quantity indicator like ③ or size label like 2x3).
+
+    Args:
+        frame_img: BGR image or PageAnalysis
     """
     x, y, w, h = bbox
+    page = _as_page_analysis(frame_img)
 
-    # Check if it's predominantly blue
-    roi = frame_img[y:y+h, x:x+w]
-    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-
-    # Blue color range in HSV
-    lower_blue = np.array([90, 50, 50])
-    upper_blue = np.array([130, 255, 255])
-    mask_blue = cv2.inRange(hsv, lower_blue, upper_blue)
-
-    blue_ratio = np.count_nonzero(mask_blue) / (w * h) if (w * h) > 0 else 0
+    # Check if it's predominantly blue (HSV 90-130, see _HSV_RANGES)
+    blue_count = page.count_pixels('blue', x, y, x + w, y + h)
+    blue_ratio = blue_count / (w * h) if (w * h) > 0 else 0
 
     # If more than 20% is blue, it's likely a blue indicator (circle or label)
     return blue_ratio > 0.2
@@ -265,6 +359,9 @@ def _is_blue_indicator(frame_img, bbox):
 def _is_red_text(frame_img, bbox, max_size=100):
     """
     Check if the region is red text (quantity labels like x2, x1).
+
+    Args:
+        frame_img: BGR image or PageAnalysis
     """
     x, y, w, h = bbox
 
@@ -272,18 +369,10 @@ def _is_red_text(frame_img, bbox, max_size=100):
     if w > max_size or h > max_size:
         return False
 
-    # Check if it's predominantly red
-    roi = frame_img[y:y+h, x:x+w]
-    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-
-    # Red color range in HSV (red wraps around 0/180)
-    lower_red1 = np.array([0, 70, 50])
-    upper_red1 = np.array([10, 255, 255])
-    lower_red2 = np.array([170, 70, 50])
-    upper_red2 = np.array([180, 255, 255])
-    mask_red = cv2.inRange(hsv, lower_red1, upper_red1) | cv2.inRange(hsv, lower_red2, upper_red2)
-
-    red_ratio = np.count_nonzero(mask_red) / (w * h) if (w * h) > 0 else 0
+    # Check if it's predominantly red (red wraps around 0/180, see _HSV_RANGES)
+    page = _as_page_analysis(frame_img)
+    red_count = page.count_pixels('text_red', x, y, x + w, y + h)
+    red_ratio = red_count / (w * h) if (w * h) > 0 else 0
 
     # If more than 30% is red, it's likely red text
     return red_ratio > 0.3
@@ -350,6 +439,8 @@ def _detect_black_text_mask(img):
 def _count_significant_objects(image_crop, min_area=50, significant_ratio=0.5):
     """
     Count significant objects in a crop (to detect merged parts).
+
+    Reference implementation of _count_significant_objects_in_boxes for one BGR crop.
     """
     if image_crop.size == 0:
         return 0
@@ -367,31 +458,121 @@ def _count_significant_objects(image_crop, min_area=50, significant_ratio=0.5):
     return len(significant)
 
 
-def _extract_parts_with_contours(frame_img, min_size=20, max_size=2000, min_area=1800):
+def _count_significant_objects_in_boxes(gray: np.ndarray, xs, ys, ws, hs,
+                                        min_area=50, significant_ratio=0.5) -> np.ndarray:
+    """
+    Count significant objects inside each bbox (to detect merged parts).
+
+    Same counts as _count_significant_objects on each crop: every bbox is
+    Otsu-binarized on its own, and the external contours of the crop (objects
+    partially inside the bbox included, clipped to it) whose area is >= min_area
+    and larger than significant_ratio * (largest such area) are counted.
+    The grayscale frame is converted once instead of once per crop.
+
+    This stays a loop over the boxes on purpose: the Otsu threshold depends on
+    each crop, and one labelling pass over the frame with a single threshold
+    changes which parts are rejected. Only the boxes that pass the array
+    filters of _filter_part_contours and are not thin reach this check.
+
+    Returns:
+        Array of object counts, one per bbox
+    """
+    counts = np.zeros(len(xs), dtype=np.int64)
+    for i, (x, y, w, h) in enumerate(zip(xs, ys, ws, hs)):
+        crop = gray[y:y + h, x:x + w]
+        if crop.size == 0:
+            continue
+        _, thresh = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        areas = _contour_areas(contours)
+        areas = areas[areas >= min_area]
+        if len(areas):
+            counts[i] = np.count_nonzero(areas > areas.max() * significant_ratio)
+    return counts
+
+
+def _contour_areas(contours) -> np.ndarray:
+    """
+    Areas of all contours at once (same values as cv2.contourArea, shoelace formula).
+    """
+    if len(contours) == 0:
+        return np.empty(0, dtype=np.float64)
+
+    lengths = np.array([len(c) for c in contours])
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    offsets = np.cumsum(lengths) - lengths
+
+    # Index of the next vertex, wrapping around at the end of each contour
+    nxt = np.arange(1, len(points) + 1)
+    nxt[offsets + lengths - 1] = offsets
+
+    cross = points[:, 0] * points[nxt, 1] - points[nxt, 0] * points[:, 1]
+    return np.abs(np.add.reduceat(cross, offsets)) / 2.0
+
+
+# Part detection kernels for the 2x super-resolved frame (scale 1.0) and for the
+# native frame used by extract_parts(lazy_upscale=True) (scale 0.5). The native
+# set was tuned on the sample pages to find the same parts as the 2x set.
+_PART_DETECTION_KERNELS = {
+    1.0: {'median': 7, 'edge': 5, 'adaptive_block': 21, 'open': 3, 'close': 7},
+    0.5: {'median': 5, 'edge': 3, 'adaptive_block': 11, 'open': 3, 'close': 7},
+}
+
+
+def _extract_parts_with_contours(frame_img, min_size=20, max_size=2000, min_area=1800, scale=1.0,
+                                 stats: DetectionStats = _NO_STATS):
     """
     Extract parts with contour information for transparent background.
     Enhanced to detect gray parts using edge detection and adaptive thresholding.
 
+    Args:
+        scale: Resolution of frame_img relative to the 2x super-resolved frame
+               (1.0 or 0.5). Size thresholds are given for the 2x frame.
+        stats: Records the 'part_masks', 'part_contours' and 'part_filtering'
+               stages and the contours rejected by each filter
+
     Returns:
         list of dict: [{'bbox': (x,y,w,h), 'contour': np.array}, ...]
     """
+    with stats.stage('part_masks'):
+        combined_mask = _part_mask(frame_img, scale)
+
+    # Find external contours
+    with stats.stage('part_contours'):
+        contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    stats.count('contours', len(contours))
+
+    if len(contours) == 0:
+        return []
+
+    with stats.stage('part_filtering'):
+        parts = _filter_part_contours(frame_img, contours, min_size, max_size, min_area, scale, stats)
+    stats.count('parts', len(parts))
+    return parts
+
+
+def _part_mask(frame_img, scale=1.0):
+    """
+    Binary mask of part candidates (Otsu + edges + adaptive threshold).
+    """
+    kernels = _PART_DETECTION_KERNELS[scale]
+
     # Noise reduction
-    frame_denoised = cv2.medianBlur(frame_img, 7)
+    frame_denoised = cv2.medianBlur(frame_img, kernels['median'])
     gray = cv2.cvtColor(frame_denoised, cv2.COLOR_BGR2GRAY)
-    img_h, img_w = frame_img.shape[:2]
 
     # 1. Otsu's Binarization (Inverse - parts are white)
     _, thresh_otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
     # 2. Edge detection for gray parts (low contrast parts)
     edges = cv2.Canny(gray, 30, 100)
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernels['edge'], kernels['edge']))
     edges_dilated = cv2.dilate(edges, kernel, iterations=2)
     edges_closed = cv2.morphologyEx(edges_dilated, cv2.MORPH_CLOSE, kernel, iterations=2)
 
     # 3. Adaptive thresholding for local contrast detection
     adaptive_thresh = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 21, 5
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, kernels['adaptive_block'], 5
     )
 
     # 4. Combine all masks
@@ -399,69 +580,88 @@ def _extract_parts_with_contours(frame_img, min_size=20, max_size=2000, min_area
     combined_mask = cv2.bitwise_or(combined_mask, adaptive_thresh)
 
     # 5. Remove edge noise (clear 10 pixels from image borders)
-    border_margin = 10
+    border_margin = int(10 * scale)
     combined_mask[:border_margin, :] = 0  # Top
     combined_mask[-border_margin:, :] = 0  # Bottom
     combined_mask[:, :border_margin] = 0  # Left
     combined_mask[:, -border_margin:] = 0  # Right
 
     # 6. Morphological cleanup
-    kernel_small = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    kernel_small = cv2.getStructuringElement(cv2.MORPH_RECT, (kernels['open'], kernels['open']))
     combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel_small)
 
-    kernel_close = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
-    combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel_close)
+    kernel_close = cv2.getStructuringElement(cv2.MORPH_RECT, (kernels['close'], kernels['close']))
+    return cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel_close)
 
-    # Find external contours
-    contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # Maximum allowed area (30% of image to prevent frame detection)
-    max_allowed_area = img_h * img_w * 0.3
+def _filter_part_contours(frame_img, contours, min_size, max_size, min_area, scale,
+                          stats: DetectionStats = _NO_STATS):
+    """
+    Keep the contours that look like a single part.
+
+    Returns:
+        list of dict: [{'bbox': (x,y,w,h), 'contour': np.array}, ...] sorted by x
+    """
+    img_h, img_w = frame_img.shape[:2]
 
-    parts = []
+    # Component stats table: one row per contour
+    xs, ys, ws, hs = _contour_bounding_rects(contours)
+    areas = _contour_areas(contours)
+    box_areas = ws * hs
+    aspects = ws / np.maximum(hs, 1)
 
-    for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-        area = cv2.contourArea(cnt)
-        aspect = w / h if h > 0 else 0
+    # Size thresholds are given for the 2x frame
+    min_size, max_size = min_size * scale, max_size * scale
+    min_area = min_area * scale * scale
+
+    # Maximum allowed area (30% of image to prevent frame detection)
+    max_allowed_area = img_h * img_w * 0.3
 
-        # Filtering criteria
-        is_valid = True
+    # Blue / red summed-area tables are built once; each bbox test is O(1)
+    analysis = PageAnalysis(frame_img)
+    blue_ratio = analysis.count_pixels('blue', xs, ys, xs + ws, ys + hs) / box_areas
+    red_ratio = analysis.count_pixels('text_red', xs, ys, xs + ws, ys + hs) / box_areas
 
+    # Filtering criteria (reason -> rejected contours)
+    rejections = {
         # Exclude regions that are too large (frame misdetection prevention)
-        if w * h > max_allowed_area:
-            is_valid = False
+        'too_large': box_areas > max_allowed_area,
         # Exclude large regions touching image edges (boundary noise)
-        elif (x <= 5 or y <= 5) and (w * h > img_h * img_w * 0.1):
-            is_valid = False
+        'border': ((xs <= 5 * scale) | (ys <= 5 * scale)) & (box_areas > img_h * img_w * 0.1),
         # Blue indicator filter (quantity indicators like ③ or size labels like 2x3)
-        elif _is_blue_indicator(frame_img, (x, y, w, h)):
-            is_valid = False
+        'blue_indicator': blue_ratio > 0.2,
         # Red text filter (quantity labels like x2, x1)
-        elif _is_red_text(frame_img, (x, y, w, h)):
-            is_valid = False
-        elif w < min_size or h < min_size:
-            is_valid = False
-        elif w > max_size or h > max_size:
-            is_valid = False
-        elif area < min_area:
-            is_valid = False
-        elif aspect < 0.15 or aspect > 6.0:  # Relaxed for thin parts (rods)
-            is_valid = False
-        else:
-            # Object count check - avoid multiple objects merged together
-            part_crop = frame_img[y:y+h, x:x+w]
-            obj_count = _count_significant_objects(part_crop)
-            if obj_count > 1:
-                # Exception: very thin/elongated parts (rods)
-                if not (aspect < 0.35 or aspect > 3.0):
-                    is_valid = False
-
-        if is_valid:
-            parts.append({
-                'bbox': (x, y, w, h),
-                'contour': cnt,
-            })
+        'red_label': (ws <= 100 * scale) & (hs <= 100 * scale) & (red_ratio > 0.3),
+        'size': (ws < min_size) | (hs < min_size) | (ws > max_size) | (hs > max_size),
+        'area': areas < min_area,
+        'aspect': (aspects < 0.15) | (aspects > 6.0),  # Relaxed for thin parts (rods)
+    }
+    rejected = np.zeros(len(contours), dtype=bool)
+    for reason, mask in rejections.items():
+        if stats.enabled:
+            # Each contour is counted under the first filter that rejects it
+            stats.count(f'rejected.{reason}', np.count_nonzero(mask & ~rejected))
+        rejected |= mask
+    is_valid = ~rejected
+
+    # Object count check - avoid multiple objects merged together
+    # Exception: very thin/elongated parts (rods), which are not counted
+    is_thin = (aspects < 0.35) | (aspects > 3.0)
+    candidates = np.nonzero(is_valid & ~is_thin)[0]
+    obj_counts = _count_significant_objects_in_boxes(
+        analysis.gray, xs[candidates], ys[candidates], ws[candidates], hs[candidates],
+        min_area=50 * scale * scale
+    )
+    is_valid[candidates] = obj_counts <= 1
+    stats.count('rejected.multiple_objects', len(candidates) - np.count_nonzero(is_valid[candidates]))
+
+    parts = [
+        {
+            'bbox': (int(xs[i]), int(ys[i]), int(ws[i]), int(hs[i])),
+            'contour': contours[i],
+        }
+        for i in np.nonzero(is_valid)[0]
+    ]
 
     # Sort by x position
     parts.sort(key=lambda p: p['bbox'][0])
@@ -493,24 +693,26 @@ def _create_part_with_transparent_bg(frame_img, part_info, margin=10):
     x2 = min(w_img, x + w + margin)
     y2 = min(h_img, y + h + margin)
 
+    # Draw the mask directly in the bbox + margin ROI (contours shifted by -x1, -y1)
+    # so memory and time depend on the part size, not the frame size.
+    # Pixels outside the ROI are never set, so the result equals cropping a
+    # full-frame mask.
+    offset = (-x1, -y1)
+    mask_crop = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+
     # Create a mask using convex hull to ensure entire object is covered
     # This prevents issues with light-colored areas being excluded
-    full_mask = np.zeros((h_img, w_img), dtype=np.uint8)
-
-    # Use convex hull for more robust filling
     hull = cv2.convexHull(contour)
-    cv2.drawContours(full_mask, [hull], -1, 255, thickness=cv2.FILLED)
+    cv2.drawContours(mask_crop, [hull], -1, 255, thickness=cv2.FILLED, offset=offset)
 
     # Also draw the original contour to capture any concave details
-    cv2.drawContours(full_mask, [contour], -1, 255, thickness=cv2.FILLED)
+    cv2.drawContours(mask_crop, [contour], -1, 255, thickness=cv2.FILLED, offset=offset)
 
     # Dilate mask to include edge pixels and fill small gaps
     kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    full_mask = cv2.dilate(full_mask, kernel, iterations=2)
+    mask_crop = cv2.dilate(mask_crop, kernel, iterations=2)
 
-    # Crop the mask and image
-    mask_crop = full_mask[y1:y2, x1:x2].copy()
-    img_crop = frame_img[y1:y2, x1:x2].copy()
+    img_crop = frame_img[y1:y2, x1:x2]
 
     # Note: Black text removal (x1, x2) was disabled because it causes
     # false detection issues with black-colored parts.
@@ -588,16 +790,65 @@ def create_transparent_crop(image, left: int, top: int, width: int, height: int,
     return Image.fromarray(img_rgba, mode='RGBA')
 
 
-def extract_parts(image) -> list:
+def _enhance_for_parts(img):
+    """
+    Super-resolution (2x) and sharpening used for part cutouts.
+    """
+    upscaled = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    blurred = cv2.GaussianBlur(upscaled, (0, 0), 3)
+    return cv2.addWeighted(upscaled, 1.5, blurred, -0.5, 0)
+
+
+# Native pixels of context around a lazily enhanced part crop. Covers the cubic
+# kernel (2 px) and the sharpening Gaussian (sigma 3 at 2x, radius 9 px), so the
+# crop pixels equal those of the whole enhanced frame.
+_ENHANCE_CONTEXT = 8
+
+
+def _create_part_from_native(frame_roi, part_info, margin=10):
+    """
+    Build a 2x part cutout from a part found in the native frame, enhancing
+    only the bbox + margin (+ context) instead of the whole frame.
+
+    Args:
+        frame_roi: Native BGR frame
+        part_info: dict with 'bbox' and 'contour' in native coordinates
+        margin: margin around the bounding box in 2x pixels
+
+    Returns:
+        PIL.Image: RGBA image with transparent background
+    """
+    x, y, w, h = part_info['bbox']
+    h_img, w_img = frame_roi.shape[:2]
+
+    pad = (margin + 1) // 2 + _ENHANCE_CONTEXT
+    nx1, ny1 = max(0, x - pad), max(0, y - pad)
+    nx2, ny2 = min(w_img, x + w + pad), min(h_img, y + h + pad)
+    enhanced = _enhance_for_parts(frame_roi[ny1:ny2, nx1:nx2])
+
+    # Native pixel (i, j) covers 2x pixels (2i..2i+1, 2j..2j+1)
+    offset = np.array([nx1, ny1])
+    part_2x = {
+        'bbox': (2 * (x - nx1), 2 * (y - ny1), 2 * w, 2 * h),
+        'contour': (part_info['contour'] - offset) * 2,
+    }
+    return _create_part_with_transparent_bg(enhanced, part_2x, margin=margin)
+
+
+def extract_parts(image, lazy_upscale: bool = False, return_stats: bool = False) -> list:
     """
     Extract part images from an assembly diagram image.
     Parts are extracted with transparent backgrounds.
 
     Args:
         image: PIL Image or numpy array (BGR)
+        lazy_upscale: Find parts in the native frame and super-resolve/sharpen
+                      only each part's crop, instead of the whole frame
+        return_stats: Also return a DetectionStats with stage timings and counters
 
     Returns:
         list: List of PIL Images (RGBA) containing extracted parts with transparent backgrounds
+        (parts, DetectionStats) when return_stats is True
     """
     # Convert PIL to BGR if necessary
     if isinstance(image, Image.Image):
@@ -606,13 +857,48 @@ def extract_parts(image) -> list:
     else:
         img = image.copy()
 
+    stats = DetectionStats() if return_stats else _NO_STATS
+    detection, frame_enhanced = _detect_parts(img, lazy_upscale, stats)
+    parts = render_parts(img, detection, stats=stats, frame_enhanced=frame_enhanced)
+    return (parts, stats) if return_stats else parts
+
+
+def detect_parts(img: np.ndarray, lazy_upscale: bool = False,
+                 stats: DetectionStats = _NO_STATS) -> dict:
+    """
+    Detect parts in a BGR assembly image without building the part images
+    (steps 1-4 of extract_parts).
+
+    Args:
+        stats: Records stage timings and contour counts (see DetectionStats)
+
+    Returns:
+        dict: {'frame_roi': (x1, y1, x2, y2) or None, 'lazy_upscale': bool,
+               'parts': [{'bbox': (x,y,w,h), 'contour': np.array}, ...]}
+        Part coordinates are in the 2x enhanced frame ROI, or in the native
+        frame ROI when lazy_upscale is True.
+    """
+    return _detect_parts(img, lazy_upscale, stats)[0]
+
+
+def _detect_parts(img: np.ndarray, lazy_upscale: bool,
+                  stats: DetectionStats) -> Tuple[dict, Optional[np.ndarray]]:
+    """
+    detect_parts() and the 2x enhanced frame ROI the parts were found in
+    (None with lazy_upscale or without a frame), so that render_parts can
+    reuse it instead of enhancing the frame again.
+    """
+    detection = {'frame_roi': None, 'lazy_upscale': lazy_upscale, 'parts': []}
+
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
     # 1. Detect Frames
-    frames = find_rectangular_contours(gray)
+    with stats.stage('frame'):
+        frames = find_rectangular_contours(gray)
+    stats.count('frame_candidates', len(frames))
 
     if not frames:
-        return []
+        return detection, None
 
     # 2. Select Largest Frame
     frames_with_area = [(fx, fy, fw, fh, fw * fh) for fx, fy, fw, fh in frames]
@@ -623,66 +909,312 @@ def extract_parts(image) -> list:
     # Crop INSIDE the frame to avoid the border line
     frame_margin = 10
     if fw > 2 * frame_margin and fh > 2 * frame_margin:
-        frame_roi = img[fy+frame_margin : fy+fh-frame_margin, fx+frame_margin : fx+fw-frame_margin]
+        x1, y1, x2, y2 = fx + frame_margin, fy + frame_margin, fx + fw - frame_margin, fy + fh - frame_margin
     else:
-        frame_roi = img[fy:fy+fh, fx:fx+fw]
+        x1, y1, x2, y2 = fx, fy, fx + fw, fy + fh
+    detection['frame_roi'] = (int(x1), int(y1), int(x2), int(y2))
+    frame_roi = img[y1:y2, x1:x2]
 
-    # 3. Super-resolution (2x) and Sharpening
-    frame_roi_upscaled = cv2.resize(frame_roi, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    if lazy_upscale:
+        # 3-4. Detect at native resolution; part crops are enhanced when rendering
+        detection['parts'] = _extract_parts_with_contours(frame_roi, scale=0.5, stats=stats)
+        return detection, None
 
-    blurred = cv2.GaussianBlur(frame_roi_upscaled, (0, 0), 3)
-    frame_enhanced = cv2.addWeighted(frame_roi_upscaled, 1.5, blurred, -0.5, 0)
+    # 3. Super-resolution (2x) and Sharpening
+    with stats.stage('enhance'):
+        frame_enhanced = _enhance_for_parts(frame_roi)
 
     # 4. Extract Parts with contour information
-    parts_info = _extract_parts_with_contours(frame_enhanced)
+    detection['parts'] = _extract_parts_with_contours(frame_enhanced, stats=stats)
+    return detection, frame_enhanced
 
-    # 5. Create transparent background images
-    extracted_images = []
-    part_margin = 10  # Margin around each part
 
-    for part_info in parts_info:
-        part_img = _create_part_with_transparent_bg(frame_enhanced, part_info, margin=part_margin)
-        extracted_images.append(part_img)
+def render_parts(img: np.ndarray, detection: dict, margin: int = 10,
+                 stats: DetectionStats = _NO_STATS,
+                 frame_enhanced: Optional[np.ndarray] = None) -> list:
+    """
+    Build the transparent part images for a detect_parts() result.
 
-    return extracted_images
+    Args:
+        img: BGR image passed to detect_parts
+        detection: detect_parts() result
+        margin: Margin around each part (2x pixels)
+        frame_enhanced: 2x enhanced frame ROI of the same detection, when it was
+                        just computed (skips enhancing the frame again)
+
+    Returns:
+        list: List of PIL Images (RGBA)
+    """
+    if detection['frame_roi'] is None or not detection['parts']:
+        return []
+
+    x1, y1, x2, y2 = detection['frame_roi']
+    frame_roi = img[y1:y2, x1:x2]
+
+    with stats.stage('render'):
+        if detection['lazy_upscale']:
+            return [_create_part_from_native(frame_roi, part_info, margin=margin)
+                    for part_info in detection['parts']]
+
+        # 5. Create transparent background images
+        if frame_enhanced is None:
+            frame_enhanced = _enhance_for_parts(frame_roi)
+        return [_create_part_with_transparent_bg(frame_enhanced, part_info, margin=margin)
+                for part_info in detection['parts']]
 
 
 # --- Assembly Number Image Extraction (v2 - Line Detection) ---
 
+# HSV thresholds per color: list of (lower, upper) ranges that are OR-ed together
+_HSV_RANGES = {
+    'red': [((0, 50, 50), (10, 255, 255)), ((170, 50, 50), (180, 255, 255))],
+    'black': [((0, 0, 0), (180, 80, 100))],
+    'blue': [((90, 50, 50), (130, 255, 255))],
+    # Quantity labels (x1, x2) - wider hue and lower saturation than frame red
+    'label_red': [((0, 30, 30), (15, 255, 255)), ((160, 30, 30), (180, 255, 255))],
+    # Red text inside assembly images (part extraction, NumberExtractor)
+    'text_red': [((0, 70, 50), (10, 255, 255)), ((170, 70, 50), (180, 255, 255))],
+    # Black digits for NumberExtractor (any saturation)
+    'number_black': [((0, 0, 0), (180, 255, 100))],
+}
+
+
+def _mask_from_hsv(hsv: np.ndarray, color: str) -> np.ndarray:
+    """
+    Create a binary mask for a color from an HSV image using _HSV_RANGES.
+    """
+    ranges = _HSV_RANGES.get(color)
+    if not ranges:
+        return np.zeros(hsv.shape[:2], dtype=np.uint8)
+
+    mask = None
+    for lower, upper in ranges:
+        part = cv2.inRange(hsv, np.array(lower), np.array(upper))
+        mask = part if mask is None else mask | part
+    return mask
+
+
+def _build_hsv_channel_luts() -> List[np.ndarray]:
+    """
+    Lookup tables for the H, S and V channels: entry v of a channel's table
+    holds the bits (_COLOR_BITS) of the colors whose _HSV_RANGES admit value v
+    on that channel. The ranges of one color may only differ in hue, so a pixel
+    has a color exactly when its three channel entries all have the color's
+    bit (AND of the channels).
+    """
+    values = np.arange(256)
+    luts = [np.zeros(256, dtype=np.uint8) for _ in range(3)]
+    for color, ranges in _HSV_RANGES.items():
+        bit = _COLOR_BITS[color]
+        if len({(lower[1:], upper[1:]) for lower, upper in ranges}) != 1:
+            raise ValueError(f"HSV ranges of '{color}' must share the saturation and value bounds")
+        for lower, upper in ranges:
+            luts[0][(values >= lower[0]) & (values <= upper[0])] |= bit
+        lower, upper = ranges[0]
+        for channel in (1, 2):
+            luts[channel][(values >= lower[channel]) & (values <= upper[channel])] |= bit
+    return luts
+
+
+# One bit per color of _HSV_RANGES in the label image of _classify_hsv()
+_COLOR_BITS = {color: 1 << i for i, color in enumerate(_HSV_RANGES)}
+_HSV_CHANNEL_LUTS = _build_hsv_channel_luts()
+# label image -> 0/255 mask of one color
+_COLOR_MASK_LUTS = {color: np.where(np.arange(256) & bit, 255, 0).astype(np.uint8)
+                    for color, bit in _COLOR_BITS.items()}
+
+
+def _classify_hsv(hsv: np.ndarray) -> np.ndarray:
+    """
+    Label every pixel with the bits of all _HSV_RANGES colors in one pass
+    (a LUT per channel and two ANDs instead of an inRange per range and color).
+    """
+    h, s, v = (cv2.LUT(channel, lut) for channel, lut in zip(cv2.split(hsv), _HSV_CHANNEL_LUTS))
+    return cv2.bitwise_and(cv2.bitwise_and(h, s), v)
+
+
+def _mask_from_labels(labels: np.ndarray, color: str) -> np.ndarray:
+    """
+    Binary mask of a color from a label image of _classify_hsv()
+    (identical to _mask_from_hsv on the same HSV image).
+    """
+    if color not in _COLOR_MASK_LUTS:
+        return np.zeros(labels.shape[:2], dtype=np.uint8)
+    return cv2.LUT(labels, _COLOR_MASK_LUTS[color])
+
+
 def _get_color_mask(img: np.ndarray, color: str) -> np.ndarray:
     """
     Create a mask for specific color (red, black, or blue lines).
 
     Args:
         img: BGR image
-        color: 'red', 'black', or 'blue'
+        color: 'red', 'black', 'blue' or 'label_red'
 
     Returns:
         Binary mask
     """
+    if color not in _HSV_RANGES:
+        return np.zeros(img.shape[:2], dtype=np.uint8)
     hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    return _mask_from_hsv(hsv, color)
 
-    if color == 'red':
-        lower_red1 = np.array([0, 50, 50])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([170, 50, 50])
-        upper_red2 = np.array([180, 255, 255])
-        mask = cv2.inRange(hsv, lower_red1, upper_red1) | cv2.inRange(hsv, lower_red2, upper_red2)
-    elif color == 'black':
-        lower_black = np.array([0, 0, 0])
-        upper_black = np.array([180, 80, 100])
-        mask = cv2.inRange(hsv, lower_black, upper_black)
-    elif color == 'blue':
-        lower_blue = np.array([90, 50, 50])
-        upper_blue = np.array([130, 255, 255])
-        mask = cv2.inRange(hsv, lower_blue, upper_blue)
-    else:
-        mask = np.zeros(img.shape[:2], dtype=np.uint8)
 
-    return mask
+class PageAnalysis:
+    """
+    Per-page analysis context.
+
+    HSV, color masks, grayscale and Canny edges are computed lazily once for the
+    whole page. region() returns a view whose arrays are zero-copy slices of the
+    page-level arrays, so per-frame helpers never re-convert pixels.
+
+    HSV, grayscale and color masks are per-pixel, so a slice is identical to
+    converting the crop itself. Edges are page-level (Canny on a crop differs
+    at the crop border); arrow detection runs Canny on its own per-frame band
+    (_local_arrow_index) instead.
+
+    downscaled() returns a coarse copy of the page for pyramid detection.
+    """
+
+    def __init__(self, img: np.ndarray):
+        self.img = img
+        self.height, self.width = img.shape[:2]
+        # Page that owns the arrays of a region() view (None for the page itself;
+        # not a self-reference, so a dropped page is freed without the GC)
+        self._parent = None
+        self._offset = (0, 0)
+        self._masks = {}
+        self._integrals = {}
+
+    def downscaled(self, factor: int) -> 'PageAnalysis':
+        """
+        Return a new page analysis of this image reduced by an integer factor.
+
+        Each coarse pixel covers exactly factor x factor page pixels (up to
+        factor-1 trailing rows/columns are dropped), so coordinates map back
+        exactly as x_page = x_coarse * factor. The BGR image is reduced before
+        any HSV / mask / edge computation, which then runs on the coarse image
+        only. Each channel keeps the darkest value of its block: frame lines are
+        dark or saturated on a light background, so a 1-2 px line keeps its
+        color (averaging would turn a 2 px black line into light gray from
+        factor 3 up, above the V limit of the black mask).
+        """
+        width, height = max(1, self.width // factor), max(1, self.height // factor)
+        crop = self.img[:height * factor, :width * factor]
+        # Erosion with the block as kernel (anchored at its top-left pixel), then every f-th pixel
+        kernel = np.ones((factor, factor), dtype=np.uint8)
+        return PageAnalysis(np.ascontiguousarray(cv2.erode(crop, kernel, anchor=(0, 0))[::factor, ::factor]))
+
+    def region(self, x1: int, y1: int, x2: int, y2: int) -> 'PageAnalysis':
+        """
+        Return a view of the rectangle [x1, x2) x [y1, y2) (coordinates of this view).
+        """
+        ox, oy = self._offset
+        view = PageAnalysis.__new__(PageAnalysis)
+        view._parent = self._root
+        view._offset = (ox + x1, oy + y1)
+        view._masks = {}
+        view.img = self.img[y1:y2, x1:x2]
+        view.height, view.width = view.img.shape[:2]
+        return view
+
+    @property
+    def _root(self) -> 'PageAnalysis':
+        return self if self._parent is None else self._parent
+
+    def _view(self, arr: np.ndarray) -> np.ndarray:
+        if self._root is self:
+            return arr
+        ox, oy = self._offset
+        return arr[oy:oy + self.height, ox:ox + self.width]
+
+    @cached_property
+    def hsv(self) -> np.ndarray:
+        if self._root is self:
+            return cv2.cvtColor(self.img, cv2.COLOR_BGR2HSV)
+        return self._view(self._root.hsv)
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        if self._root is self:
+            return cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY)
+        return self._view(self._root.gray)
+
+    @cached_property
+    def labels(self) -> np.ndarray:
+        """Color label image (_classify_hsv) from which all masks are derived."""
+        if self._root is self:
+            return _classify_hsv(self.hsv)
+        return self._view(self._root.labels)
+
+    @cached_property
+    def edges(self) -> np.ndarray:
+        if self._root is self:
+            return cv2.Canny(self.gray, 50, 150)
+        return self._view(self._root.edges)
+
+    def mask(self, color: str) -> np.ndarray:
+        """
+        Binary mask for a color in _HSV_RANGES (read-only; copy before modifying).
+        """
+        if color not in self._masks:
+            if self._root is self:
+                self._masks[color] = _mask_from_labels(self.labels, color)
+            else:
+                self._masks[color] = self._view(self._root.mask(color))
+        return self._masks[color]
+
+    def integral(self, color: str) -> np.ndarray:
+        """
+        Summed-area table of mask(color) for the whole page, shape (H+1, W+1).
+        """
+        root = self._root
+        if color not in root._integrals:
+            binary = (root.mask(color) != 0).astype(np.uint8)
+            root._integrals[color] = cv2.integral(binary, sdepth=cv2.CV_32S)
+        return root._integrals[color]
+
+    def count_pixels(self, color: str, x1, y1, x2, y2):
+        """
+        Number of mask(color) pixels in [x1, x2) x [y1, y2) using four lookups.
+        Coordinates are clipped to this view like NumPy slicing. Accepts scalars
+        (returns int) or equally shaped arrays (returns an array of counts).
+        """
+        x1 = np.clip(x1, 0, self.width)
+        x2 = np.clip(x2, x1, self.width)
+        y1 = np.clip(y1, 0, self.height)
+        y2 = np.clip(y2, y1, self.height)
+
+        ox, oy = self._offset
+        ii = self.integral(color)
+        x1, x2, y1, y2 = x1 + ox, x2 + ox, y1 + oy, y2 + oy
+        counts = ii[y2, x2] - ii[y1, x2] - ii[y2, x1] + ii[y1, x1]
+        return counts if np.ndim(counts) else int(counts)
+
+
+def _as_page_analysis(img) -> PageAnalysis:
+    """
+    Accept either a BGR image or an existing PageAnalysis.
+    """
+    if isinstance(img, PageAnalysis):
+        return img
+    return PageAnalysis(img)
+
+
+def _scaled(value: int, scale: float, minimum: int = 1, slack: int = 0) -> int:
+    """
+    Scale a pixel threshold tuned for the original page resolution.
+
+    slack is added on downscaled pages to absorb the +-1 px quantization of
+    line positions (e.g. for merge distances).
+    """
+    if scale == 1.0:
+        return value
+    return max(minimum, int(round(value * scale)) + slack)
 
 
-def _detect_lines_hough(mask: np.ndarray, min_line_length: int = 50, max_line_gap: int = 10) -> Tuple[List, List]:
+def _detect_lines_hough(mask: np.ndarray, min_line_length: int = 50, max_line_gap: int = 10,
+                        threshold: int = 50) -> Tuple[List, List]:
     """
     Detect lines using Hough Line Transform.
 
@@ -693,7 +1225,7 @@ def _detect_lines_hough(mask: np.ndarray, min_line_length: int = 50, max_line_ga
     kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
 
-    lines = cv2.HoughLinesP(mask, 1, np.pi/180, threshold=50,
+    lines = cv2.HoughLinesP(mask, 1, np.pi/180, threshold=threshold,
                             minLineLength=min_line_length, maxLineGap=max_line_gap)
 
     horizontal_lines = []
@@ -718,37 +1250,170 @@ def _detect_lines_hough(mask: np.ndarray, min_line_length: int = 50, max_line_ga
     return horizontal_lines, vertical_lines
 
 
-def _detect_all_lines_hough(mask: np.ndarray, min_line_length: int = 30, max_line_gap: int = 5) -> List:
+def _row_runs(binary: np.ndarray, min_length: int) -> List[Tuple[int, int, int]]:
     """
-    Detect ALL lines (including diagonal/arrow lines) using Hough Line Transform.
+    (start, end, row) of every run of nonzero pixels at least min_length long
+    in each row of binary (end inclusive, like the Hough segments).
+    """
+    rows = np.flatnonzero(binary.any(axis=1))
+    if rows.size == 0:
+        return []
+    steps = np.diff((binary[rows] > 0).astype(np.int8), axis=1, prepend=0, append=0)
+    run_rows, starts = np.nonzero(steps == 1)
+    _, ends = np.nonzero(steps == -1)
+    keep = ends - starts >= min_length
+    return list(zip(starts[keep].tolist(), (ends[keep] - 1).tolist(), rows[run_rows[keep]].tolist()))
+
+
+def _detect_lines_morph(mask: np.ndarray, min_line_length: int = 50,
+                        max_line_gap: int = 10) -> Tuple[List, List]:
+    """
+    Detect axis-aligned lines with morphology instead of HoughLinesP.
+
+    Gaps up to max_line_gap are closed with a 1-D kernel along each axis, an
+    opening with a min_line_length kernel keeps only runs at least that long,
+    and the runs are read off row by row (column by column for vertical lines).
+    A line N px thick gives N adjacent runs, which _merge_nearby_lines joins
+    like the parallel Hough segments of the same line.
 
     Returns:
-        List of (x1, y1, x2, y2, angle) tuples
+        Same as _detect_lines_hough: (horizontal_lines, vertical_lines) of (start, end, position)
     """
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
 
-    lines = cv2.HoughLinesP(mask, 1, np.pi/180, threshold=30,
-                            minLineLength=min_line_length, maxLineGap=max_line_gap)
+    # Odd kernel lengths: an even kernel shifts the result by one pixel
+    bridge = (max(1, max_line_gap) + 1) | 1
+    length = (min_line_length - 1) | 1
+    horizontal = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (bridge, 1)))
+    horizontal = cv2.morphologyEx(horizontal, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (length, 1)))
+    vertical = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (1, bridge)))
+    vertical = cv2.morphologyEx(vertical, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, length)))
 
-    all_lines = []
-    if lines is None:
-        return all_lines
+    return _row_runs(horizontal, min_line_length), _row_runs(np.ascontiguousarray(vertical.T), min_line_length)
 
-    for line in lines:
-        x1, y1, x2, y2 = line[0]
-        if x2 - x1 == 0:
-            angle = 90
-        else:
-            angle = abs(np.degrees(np.arctan((y2 - y1) / (x2 - x1))))
-        all_lines.append((x1, y1, x2, y2, angle))
 
-    return all_lines
+def _detect_lines_fused(masks: Dict[str, np.ndarray], min_line_length: int = 50,
+                        max_line_gap: int = 10) -> Dict[str, Tuple[List, List]]:
+    """
+    _detect_lines_morph for several color masks at once, with the same lines.
 
+    Closing and opening are increasing, so every line of one color lies on a
+    line of the union of the masks. The long 1-D closing / opening runs once on
+    the union, and each color repeats it only on the rows (columns) where the
+    union has a line; a 1-D kernel treats every row (column) on its own, so
+    this gives exactly the lines of the full-page pass.
 
-def _merge_nearby_lines(lines: List, is_horizontal: bool = True, merge_threshold: int = 15) -> List:
+    Returns:
+        {color: (horizontal_lines, vertical_lines)} as returned by _detect_lines_morph
     """
-    Merge lines that are close together.
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    closed = {color: cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel) for color, mask in masks.items()}
+    union = np.zeros_like(next(iter(closed.values())))
+    for mask in closed.values():
+        cv2.bitwise_or(union, mask, dst=union)
+
+    bridge = (max(1, max_line_gap) + 1) | 1
+    length = (min_line_length - 1) | 1
+    h_kernels = (cv2.getStructuringElement(cv2.MORPH_RECT, (bridge, 1)),
+                 cv2.getStructuringElement(cv2.MORPH_RECT, (length, 1)))
+    v_kernels = (cv2.getStructuringElement(cv2.MORPH_RECT, (1, bridge)),
+                 cv2.getStructuringElement(cv2.MORPH_RECT, (1, length)))
+
+    def bridge_and_open(mask, kernels):
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernels[0])
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernels[1])
+
+    rows = np.flatnonzero(bridge_and_open(union, h_kernels).any(axis=1))
+    cols = np.flatnonzero(bridge_and_open(union, v_kernels).any(axis=0))
+    row_pos, col_pos = rows.tolist(), cols.tolist()
+
+    lines = {}
+    for color, mask in closed.items():
+        h_lines, v_lines = [], []
+        if rows.size:
+            horizontal = bridge_and_open(mask[rows], h_kernels)
+            h_lines = [(s, e, row_pos[r]) for s, e, r in _row_runs(horizontal, min_line_length)]
+        if cols.size:
+            vertical = bridge_and_open(np.ascontiguousarray(mask[:, cols]), v_kernels)
+            v_lines = [(s, e, col_pos[c]) for s, e, c in
+                       _row_runs(np.ascontiguousarray(vertical.T), min_line_length)]
+        lines[color] = (h_lines, v_lines)
+    return lines
+
+
+# Line detectors for frame detection (line_detector= of extract_assembly_images)
+LINE_DETECTORS = ('hough', 'morph', 'fused')
+
+
+def _detect_frame_lines(mask: np.ndarray, line_detector: str = 'hough', min_line_length: int = 50,
+                        max_line_gap: int = 10, threshold: int = 50) -> Tuple[List, List]:
+    """
+    Horizontal and vertical frame lines of a color mask with the selected detector
+    (threshold is the Hough vote threshold and is not used by 'morph' / 'fused';
+    'fused' on a single mask is 'morph', see _detect_page_frame_lines).
+    """
+    if line_detector == 'hough':
+        return _detect_lines_hough(mask, min_line_length=min_line_length,
+                                   max_line_gap=max_line_gap, threshold=threshold)
+    if line_detector in ('morph', 'fused'):
+        return _detect_lines_morph(mask, min_line_length=min_line_length, max_line_gap=max_line_gap)
+    raise ValueError(f"line_detector must be one of {LINE_DETECTORS}, got {line_detector!r}")
+
+
+def _detect_page_frame_lines(page: 'PageAnalysis', colors: Tuple[str, ...], line_detector: str = 'hough',
+                             min_line_length: int = 50, scale: float = 1.0,
+                             stats: DetectionStats = _NO_STATS) -> Dict[str, Tuple[List, List]]:
+    """
+    Frame lines of several color masks of one page: one _detect_lines_fused
+    pass for 'fused', one _detect_frame_lines call per color otherwise.
+
+    Returns:
+        {color: (horizontal_lines, vertical_lines)}
+    """
+    with stats.stage('masks'):
+        masks = {color: page.mask(color) for color in colors}
+    max_line_gap = _scaled(10, scale)
+    with stats.stage('hough'):
+        if line_detector == 'fused':
+            return _detect_lines_fused(masks, min_line_length=min_line_length, max_line_gap=max_line_gap)
+        return {color: _detect_frame_lines(mask, line_detector, min_line_length=min_line_length,
+                                           max_line_gap=max_line_gap,
+                                           threshold=_scaled(50, scale, minimum=10))
+                for color, mask in masks.items()}
+
+
+def _detect_all_lines_hough(mask: np.ndarray, min_line_length: int = 30, max_line_gap: int = 5) -> List:
+    """
+    Detect ALL lines (including diagonal/arrow lines) using Hough Line Transform.
+
+    Returns:
+        List of (x1, y1, x2, y2, angle) tuples
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+    lines = cv2.HoughLinesP(mask, 1, np.pi/180, threshold=30,
+                            minLineLength=min_line_length, maxLineGap=max_line_gap)
+
+    all_lines = []
+    if lines is None:
+        return all_lines
+
+    for line in lines:
+        x1, y1, x2, y2 = line[0]
+        if x2 - x1 == 0:
+            angle = 90
+        else:
+            angle = abs(np.degrees(np.arctan((y2 - y1) / (x2 - x1))))
+        all_lines.append((x1, y1, x2, y2, angle))
+
+    return all_lines
+
+
+def _merge_nearby_lines(lines: List, is_horizontal: bool = True, merge_threshold: int = 15) -> List:
+    """
+    Merge lines that are close together.
     """
     if not lines:
         return []
@@ -777,13 +1442,142 @@ def _merge_nearby_lines(lines: List, is_horizontal: bool = True, merge_threshold
     return merged
 
 
+# Upper bound on rectangles emitted by _find_rectangles_from_lines (guards
+# against combinatorial blow-up on pages with hundreds of Hough segments)
+MAX_RECTANGLE_CANDIDATES = 20000
+
+# Upper bound on the (bottom line x vertical pair) boolean matrix per chunk
+_RECT_MATRIX_CHUNK = 1 << 20
+
+
+def _lines_to_array(lines: List) -> np.ndarray:
+    """
+    Convert a list of (start, end, position) tuples to an (N, 3) int64 array.
+    """
+    if not lines:
+        return np.empty((0, 3), dtype=np.int64)
+    return np.asarray(lines, dtype=np.int64).reshape(-1, 3)
+
+
 def _find_rectangles_from_lines(horizontal_lines: List, vertical_lines: List,
                                  min_width: int = 80, min_height: int = 60,
                                  max_width_ratio: float = 0.9, max_height_ratio: float = 0.9,
                                  img_width: int = None, img_height: int = None,
-                                 tolerance: int = 20) -> List[Dict]:
+                                 tolerance: int = 20,
+                                 max_candidates: int = MAX_RECTANGLE_CANDIDATES) -> List[Dict]:
     """
     Find rectangles formed by intersecting horizontal and vertical lines.
+
+    Equivalent to _find_rectangles_from_lines_reference (same rectangles in the
+    same order), but bottom lines are looked up through a y-sorted index and the
+    span/coverage tests for all (bottom line, vertical pair) combinations of a
+    top line are evaluated with NumPy broadcasting.
+
+    Args:
+        max_candidates: Hard cap on the number of rectangles returned.
+    """
+    rectangles = []
+
+    if img_width is None or img_height is None:
+        return rectangles
+
+    h_arr = _lines_to_array(horizontal_lines)
+    v_arr = _lines_to_array(vertical_lines)
+    if len(h_arr) < 2 or len(v_arr) < 2 or max_candidates <= 0:
+        return rectangles
+
+    max_width = img_width * max_width_ratio
+    max_height = img_height * max_height_ratio
+
+    h_start, h_end, h_pos = h_arr[:, 0], h_arr[:, 1], h_arr[:, 2]
+
+    # Verticals sorted by x so that every subset keeps the left-to-right order
+    v_arr = v_arr[np.argsort(v_arr[:, 2], kind='stable')]
+    v_start, v_end, v_x = v_arr[:, 0], v_arr[:, 1], v_arr[:, 2]
+
+    # Sorted interval index over horizontal line positions
+    y_order = np.argsort(h_pos, kind='stable')
+    y_sorted = h_pos[y_order]
+
+    for i in range(len(h_arr)):
+        top_y = int(h_pos[i])
+
+        # Bottom candidates: min_height <= bottom_y - top_y <= max_height, index > i
+        lo = np.searchsorted(y_sorted, top_y + min_height - 1, side='left')
+        hi = np.searchsorted(y_sorted, top_y + max_height + 1, side='right')
+        bottoms = y_order[lo:hi]
+        bottoms = np.sort(bottoms[bottoms > i])
+        if len(bottoms) == 0:
+            continue
+        heights = h_pos[bottoms] - top_y
+        bottoms = bottoms[(heights >= min_height) & (heights <= max_height)]
+        if len(bottoms) == 0:
+            continue
+
+        # Verticals reaching the top line
+        cand = np.nonzero(v_start <= top_y + tolerance)[0]
+        if len(cand) < 2:
+            continue
+        xs = v_x[cand]
+
+        # Vertical pairs (a, b), a < b in x order, with a valid width
+        b_lo = np.searchsorted(xs, xs + min_width - 1, side='left')
+        b_hi = np.searchsorted(xs, xs + max_width + 1, side='right')
+        b_lo = np.maximum(b_lo, np.arange(len(xs)) + 1)
+        counts = np.maximum(b_hi - b_lo, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        pair_a = np.repeat(np.arange(len(xs)), counts)
+        pair_b = np.repeat(b_lo - np.cumsum(counts) + counts, counts) + np.arange(total)
+        left_x = xs[pair_a]
+        right_x = xs[pair_b]
+        widths = right_x - left_x
+
+        # Top line must span the pair
+        keep = ((widths >= min_width) & (widths <= max_width) &
+                (h_start[i] <= left_x + tolerance) & (h_end[i] >= right_x - tolerance))
+        if not keep.any():
+            continue
+        left_x = left_x[keep]
+        right_x = right_x[keep]
+        widths = widths[keep]
+        pair_v_end = np.minimum(v_end[cand[pair_a[keep]]], v_end[cand[pair_b[keep]]])
+
+        # Broadcast bottom-line coverage tests over (bottom, pair)
+        chunk = max(1, _RECT_MATRIX_CHUNK // len(left_x))
+        for c in range(0, len(bottoms), chunk):
+            b_idx = bottoms[c:c + chunk, None]
+            ok = ((pair_v_end[None, :] >= h_pos[b_idx] - tolerance) &
+                  (h_start[b_idx] <= left_x[None, :] + tolerance) &
+                  (h_end[b_idx] >= right_x[None, :] - tolerance))
+            rows, cols = np.nonzero(ok)
+            if len(rows) == 0:
+                continue
+
+            remaining = max_candidates - len(rectangles)
+            rows, cols = rows[:remaining], cols[:remaining]
+            r_heights = (h_pos[bottoms[c + rows]] - top_y).tolist()
+            for lx, w, rh in zip(left_x[cols].tolist(), widths[cols].tolist(), r_heights):
+                rectangles.append({
+                    'bbox': (lx, top_y, w, rh),
+                    'area': w * rh
+                })
+
+            if len(rectangles) >= max_candidates:
+                return rectangles
+
+    return rectangles
+
+
+def _find_rectangles_from_lines_reference(horizontal_lines: List, vertical_lines: List,
+                                          min_width: int = 80, min_height: int = 60,
+                                          max_width_ratio: float = 0.9, max_height_ratio: float = 0.9,
+                                          img_width: int = None, img_height: int = None,
+                                          tolerance: int = 20) -> List[Dict]:
+    """
+    Original O(H^2 * V^2) rectangle assembly.
+    Kept as the reference for equivalence tests and benchmarks.
     """
     rectangles = []
 
@@ -833,9 +1627,63 @@ def _find_rectangles_from_lines(horizontal_lines: List, vertical_lines: List,
     return rectangles
 
 
+# Upper bound on the IoU matrix elements computed per NMS batch
+_NMS_MATRIX_CHUNK = 1 << 20
+
+
 def _remove_duplicate_rectangles(rectangles: List[Dict], iou_threshold: float = 0.5) -> List[Dict]:
     """
-    Remove duplicate/overlapping rectangles.
+    Remove duplicate/overlapping rectangles (greedy non-maximum suppression).
+
+    Rectangles are visited in descending area order and a rectangle is dropped
+    when its IoU with an already kept one exceeds iou_threshold. IoU is computed
+    with NumPy for a batch of rows against all remaining rectangles at once.
+    Same result as _remove_duplicate_rectangles_reference.
+    """
+    if not rectangles:
+        return []
+
+    areas = np.array([r['area'] for r in rectangles], dtype=np.float64)
+    order = np.argsort(-areas, kind='stable')
+    boxes = np.array([r['bbox'] for r in rectangles], dtype=np.int64).reshape(-1, 4)[order]
+
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    box_areas = boxes[:, 2] * boxes[:, 3]
+
+    n = len(boxes)
+    suppressed = np.zeros(n, dtype=bool)
+    keep = []
+    batch = max(1, _NMS_MATRIX_CHUNK // n)
+
+    for start in range(0, n, batch):
+        stop = min(n, start + batch)
+
+        # IoU of rows [start, stop) against columns [start, n)
+        iw = (np.minimum(x2[start:stop, None], x2[None, start:]) -
+              np.maximum(x1[start:stop, None], x1[None, start:]))
+        ih = (np.minimum(y2[start:stop, None], y2[None, start:]) -
+              np.maximum(y1[start:stop, None], y1[None, start:]))
+        overlap = (iw > 0) & (ih > 0)
+        intersection = np.where(overlap, iw * ih, 0)
+        union = box_areas[start:stop, None] + box_areas[None, start:] - intersection
+        with np.errstate(divide='ignore', invalid='ignore'):
+            duplicate = overlap & (intersection / union > iou_threshold)
+
+        for row in range(stop - start):
+            i = start + row
+            if suppressed[i]:
+                continue
+            keep.append(i)
+            suppressed[start:] |= duplicate[row]
+
+    return [rectangles[k] for k in order[keep]]
+
+
+def _remove_duplicate_rectangles_reference(rectangles: List[Dict], iou_threshold: float = 0.5) -> List[Dict]:
+    """
+    Original pure-Python duplicate removal.
+    Kept as the reference for equivalence tests and benchmarks.
     """
     if not rectangles:
         return []
@@ -870,22 +1718,55 @@ def _remove_duplicate_rectangles(rectangles: List[Dict], iou_threshold: float =
     return result
 
 
-def _detect_blue_frames(img: np.ndarray, min_line_length: int = 50) -> List[Tuple]:
+def _rectangles_from_frame_lines(h_lines: List, v_lines: List, img_w: int, img_h: int,
+                                 min_width: int, min_height: int, scale: float = 1.0) -> List[Dict]:
     """
-    Detect blue frames to exclude them and any frames inside them.
+    Merge the Hough lines of one frame color and assemble them into rectangles.
+
+    Args:
+        min_width, min_height: Minimum frame size on the original page
+        scale: Resolution of the lines relative to the original page
     """
-    mask = _get_color_mask(img, 'blue')
-    h_lines, v_lines = _detect_lines_hough(mask, min_line_length=min_line_length)
-    h_lines = _merge_nearby_lines(h_lines, is_horizontal=True)
-    v_lines = _merge_nearby_lines(v_lines, is_horizontal=False)
+    merge_threshold = _scaled(15, scale, slack=1)
+    h_lines = _merge_nearby_lines(h_lines, is_horizontal=True, merge_threshold=merge_threshold)
+    v_lines = _merge_nearby_lines(v_lines, is_horizontal=False, merge_threshold=merge_threshold)
 
-    img_h, img_w = img.shape[:2]
-    rectangles = _find_rectangles_from_lines(
+    return _find_rectangles_from_lines(
         h_lines, v_lines,
-        min_width=60, min_height=40,
-        img_width=img_w, img_height=img_h
+        min_width=_scaled(min_width, scale), min_height=_scaled(min_height, scale),
+        img_width=img_w, img_height=img_h,
+        tolerance=_scaled(20, scale, slack=1)
     )
 
+
+def _detect_blue_frames(img, min_line_length: int = 50, scale: float = 1.0,
+                        line_detector: str = 'hough',
+                        lines: Optional[Tuple[List, List]] = None,
+                        stats: DetectionStats = _NO_STATS) -> List[Tuple]:
+    """
+    Detect blue frames to exclude them and any frames inside them.
+
+    Args:
+        img: BGR image or PageAnalysis
+        scale: Resolution of img relative to the original page (pyramid mode);
+               pixel thresholds tuned for the original page are scaled by it
+        line_detector: 'hough' (HoughLinesP) or 'morph' (_detect_lines_morph)
+        lines: Blue (horizontal_lines, vertical_lines) already detected with the
+               other colors (_detect_page_frame_lines); skips line detection
+        stats: Records the 'masks', 'hough' (line detection) and 'rectangles' stages
+    """
+    page = _as_page_analysis(img)
+    if lines is None:
+        lines = _detect_page_frame_lines(page, ('blue',), line_detector, min_line_length,
+                                         scale=scale, stats=stats)['blue']
+    h_lines, v_lines = lines
+    stats.count('lines.blue', len(h_lines) + len(v_lines))
+
+    with stats.stage('rectangles'):
+        rectangles = _rectangles_from_frame_lines(h_lines, v_lines, page.width, page.height,
+                                                  min_width=60, min_height=40, scale=scale)
+    stats.count('rectangles.blue', len(rectangles))
+
     return [r['bbox'] for r in rectangles]
 
 
@@ -916,45 +1797,44 @@ def _is_inside_blue_frame(frame_bbox: Tuple, blue_frames: List[Tuple], margin: i
     return False
 
 
-def _has_quantity_labels(img: np.ndarray, frame_bbox: Tuple) -> bool:
+def _has_quantity_labels(img, frame_bbox: Tuple) -> bool:
     """
     Check if the frame contains quantity labels like 'x1', 'x2', etc.
+
+    Args:
+        img: BGR image or PageAnalysis
     """
+    page = _as_page_analysis(img)
     x, y, w, h = frame_bbox
-    img_h, img_w = img.shape[:2]
+    img_h, img_w = page.height, page.width
 
     x1 = max(0, x)
     y1 = max(0, y)
     x2 = min(img_w, x + w)
     y2 = min(img_h, y + h)
-    frame_img = img[y1:y2, x1:x2]
 
-    if frame_img.size == 0:
+    if x2 <= x1 or y2 <= y1:
         return False
 
-    hsv = cv2.cvtColor(frame_img, cv2.COLOR_BGR2HSV)
-
-    lower_red1 = np.array([0, 30, 30])
-    upper_red1 = np.array([15, 255, 255])
-    lower_red2 = np.array([160, 30, 30])
-    upper_red2 = np.array([180, 255, 255])
-
-    mask_red = cv2.inRange(hsv, lower_red1, upper_red1) | cv2.inRange(hsv, lower_red2, upper_red2)
-
-    fh, fw = frame_img.shape[:2]
-    red_pixel_count = np.count_nonzero(mask_red)
+    fh, fw = y2 - y1, x2 - x1
+    red_pixel_count = page.count_pixels('label_red', x1, y1, x2, y2)
     red_ratio = red_pixel_count / (fh * fw)
 
     min_red_pixels = 50
     return red_ratio > 0.0003 or red_pixel_count > min_red_pixels
 
 
-def _find_nearby_number(img: np.ndarray, frame_bbox: Tuple, search_margin: int = 100) -> Tuple[Optional[str], bool]:
+def _find_nearby_number(img, frame_bbox: Tuple, search_margin: int = 100) -> Tuple[Optional[str], bool]:
     """
     Find assembly numbers near the frame (outside the frame).
+
+    Args:
+        img: BGR image or PageAnalysis
     """
+    page = _as_page_analysis(img)
+    img = page.gray
     x, y, w, h = frame_bbox
-    img_h, img_w = img.shape[:2]
+    img_h, img_w = page.height, page.width
 
     regions = []
 
@@ -971,8 +1851,7 @@ def _find_nearby_number(img: np.ndarray, frame_bbox: Tuple, search_margin: int =
         if region.size == 0 or region.shape[0] < 10 or region.shape[1] < 10:
             continue
 
-        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
-        _, thresh = cv2.threshold(gray, 120, 255, cv2.THRESH_BINARY_INV)
+        _, thresh = cv2.threshold(region, 120, 255, cv2.THRESH_BINARY_INV)
 
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
@@ -987,62 +1866,142 @@ def _find_nearby_number(img: np.ndarray, frame_bbox: Tuple, search_margin: int =
     return None, False
 
 
-def _is_connected_to_arrow(img: np.ndarray, frame_bbox: Tuple, all_lines: List, tolerance: int = 10) -> bool:
+class LineEndpointIndex:
     """
-    Check if the frame is connected to arrow/diagonal lines.
+    Grid index over the endpoints of arrow candidate lines.
+
+    Only diagonal lines (20-70 degrees, length >= min_arrow_length) are indexed.
+    Endpoints are bucketed into square cells and stored sorted by cell key, so a
+    frame only looks at endpoints in the cells along its four edges.
     """
-    x, y, w, h = frame_bbox
 
-    left_edge = x
-    right_edge = x + w
-    top_edge = y
-    bottom_edge = y + h
+    def __init__(self, all_lines: List, min_arrow_length: int = 30, cell_size: int = 32):
+        self.cell_size = cell_size
 
-    min_arrow_length = 30
-    arrow_connections = 0
+        lines = np.asarray([l[:4] for l in all_lines if 20 <= l[4] <= 70],
+                           dtype=np.int64).reshape(-1, 4)
+        if len(lines):
+            lengths = np.sqrt(((lines[:, 2] - lines[:, 0]) ** 2 +
+                               (lines[:, 3] - lines[:, 1]) ** 2).astype(np.float64))
+            lines = lines[lengths >= min_arrow_length]
 
-    for line in all_lines:
-        x1, y1, x2, y2, angle = line
+        # Two entries per line: (endpoint, other endpoint, line id)
+        n = len(lines)
+        points = np.concatenate([lines[:, 0:2], lines[:, 2:4]])
+        others = np.concatenate([lines[:, 2:4], lines[:, 0:2]])
+        line_ids = np.concatenate([np.arange(n), np.arange(n)])
 
-        if not (20 <= angle <= 70):
-            continue
+        cells = np.maximum(points, 0) // cell_size
+        self._cols = int(cells[:, 0].max()) + 1 if n else 1
+        keys = cells[:, 1] * self._cols + cells[:, 0]
+        order = np.argsort(keys, kind='stable')
 
-        line_length = np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-        if line_length < min_arrow_length:
-            continue
+        self._keys = keys[order]
+        self._points = points[order]
+        self._others = others[order]
+        self._line_ids = line_ids[order]
 
-        for (px, py), (ox, oy) in [((x1, y1), (x2, y2)), ((x2, y2), (x1, y1))]:
-            on_left = abs(px - left_edge) < tolerance and top_edge < py < bottom_edge
-            on_right = abs(px - right_edge) < tolerance and top_edge < py < bottom_edge
-            on_top = abs(py - top_edge) < tolerance and left_edge < px < right_edge
-            on_bottom = abs(py - bottom_edge) < tolerance and left_edge < px < right_edge
+    def __len__(self):
+        return len(self._keys) // 2
 
-            if on_left or on_right or on_top or on_bottom:
-                other_outside = (ox < left_edge - tolerance or ox > right_edge + tolerance or
-                                oy < top_edge - tolerance or oy > bottom_edge + tolerance)
+    def _candidates(self, bands: List[Tuple[int, int, int, int]]) -> np.ndarray:
+        """
+        Endpoint indices in the cells covering the given (x1, y1, x2, y2) bands.
+        """
+        cs = self.cell_size
+        lo_keys, hi_keys = [], []
+        for bx1, by1, bx2, by2 in bands:
+            cx1 = min(max(bx1, 0) // cs, self._cols - 1)
+            cx2 = min(max(bx2, 0) // cs, self._cols - 1)
+            rows = np.arange(max(by1, 0) // cs, max(by2, 0) // cs + 1)
+            lo_keys.append(rows * self._cols + cx1)
+            hi_keys.append(rows * self._cols + cx2)
+
+        starts = np.searchsorted(self._keys, np.concatenate(lo_keys), side='left')
+        ends = np.searchsorted(self._keys, np.concatenate(hi_keys), side='right')
+        counts = ends - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        return np.unique(idx)
+
+    def count_connections(self, frame_bbox: Tuple, tolerance: int = 10) -> int:
+        """
+        Number of distinct lines with one endpoint on a frame edge and the other
+        endpoint outside the frame.
+        """
+        if len(self._keys) == 0:
+            return 0
+
+        x, y, w, h = frame_bbox
+        left_edge, right_edge = x, x + w
+        top_edge, bottom_edge = y, y + h
+
+        idx = self._candidates([
+            (left_edge - tolerance, top_edge, left_edge + tolerance, bottom_edge),
+            (right_edge - tolerance, top_edge, right_edge + tolerance, bottom_edge),
+            (left_edge, top_edge - tolerance, right_edge, top_edge + tolerance),
+            (left_edge, bottom_edge - tolerance, right_edge, bottom_edge + tolerance),
+        ])
+        if len(idx) == 0:
+            return 0
+
+        px, py = self._points[idx, 0], self._points[idx, 1]
+        ox, oy = self._others[idx, 0], self._others[idx, 1]
+
+        inside_y = (top_edge < py) & (py < bottom_edge)
+        inside_x = (left_edge < px) & (px < right_edge)
+        on_edge = (((np.abs(px - left_edge) < tolerance) & inside_y) |
+                   ((np.abs(px - right_edge) < tolerance) & inside_y) |
+                   ((np.abs(py - top_edge) < tolerance) & inside_x) |
+                   ((np.abs(py - bottom_edge) < tolerance) & inside_x))
+        other_outside = ((ox < left_edge - tolerance) | (ox > right_edge + tolerance) |
+                         (oy < top_edge - tolerance) | (oy > bottom_edge + tolerance))
+
+        return len(np.unique(self._line_ids[idx[on_edge & other_outside]]))
+
+
+def _is_connected_to_arrow(img: np.ndarray, frame_bbox: Tuple, all_lines, tolerance: int = 10) -> bool:
+    """
+    Check if the frame is connected to arrow/diagonal lines.
 
-                if other_outside:
-                    arrow_connections += 1
-                    break
+    Args:
+        all_lines: LineEndpointIndex, or list of (x1, y1, x2, y2, angle) tuples
+    """
+    if not isinstance(all_lines, LineEndpointIndex):
+        all_lines = LineEndpointIndex(all_lines)
 
-    return arrow_connections >= 2
+    return all_lines.count_connections(frame_bbox, tolerance=tolerance) >= 2
 
 
-def _detect_colored_frames(img: np.ndarray, color: str = 'red', min_line_length: int = 50) -> List[Dict]:
+def _detect_colored_frames(img, color: str = 'red', min_line_length: int = 50,
+                           scale: float = 1.0, line_detector: str = 'hough',
+                           lines: Optional[Tuple[List, List]] = None,
+                           stats: DetectionStats = _NO_STATS) -> List[Dict]:
     """
     Detect frames of a specific color using line detection.
+
+    Args:
+        img: BGR image or PageAnalysis
+        scale: Resolution of img relative to the original page (pyramid mode);
+               pixel thresholds tuned for the original page are scaled by it
+        line_detector: 'hough' (HoughLinesP) or 'morph' (_detect_lines_morph)
+        lines: (horizontal_lines, vertical_lines) of this color already detected with
+               the other colors (_detect_page_frame_lines); skips line detection
+        stats: Records the 'masks', 'hough' (line detection) and 'rectangles' stages
     """
-    mask = _get_color_mask(img, color)
-    h_lines, v_lines = _detect_lines_hough(mask, min_line_length=min_line_length)
-    h_lines = _merge_nearby_lines(h_lines, is_horizontal=True)
-    v_lines = _merge_nearby_lines(v_lines, is_horizontal=False)
+    page = _as_page_analysis(img)
+    if lines is None:
+        lines = _detect_page_frame_lines(page, (color,), line_detector, min_line_length,
+                                         scale=scale, stats=stats)[color]
+    h_lines, v_lines = lines
+    stats.count(f'lines.{color}', len(h_lines) + len(v_lines))
 
-    img_h, img_w = img.shape[:2]
-    rectangles = _find_rectangles_from_lines(
-        h_lines, v_lines,
-        min_width=80, min_height=60,
-        img_width=img_w, img_height=img_h
-    )
+    with stats.stage('rectangles'):
+        rectangles = _rectangles_from_frame_lines(h_lines, v_lines, page.width, page.height,
+                                                  min_width=80, min_height=60, scale=scale)
+    stats.count(f'rectangles.{color}', len(rectangles))
 
     for rect in rectangles:
         rect['color'] = color
@@ -1050,22 +2009,34 @@ def _detect_colored_frames(img: np.ndarray, color: str = 'red', min_line_length:
     return rectangles
 
 
-def _validate_extracted_frame(frame_img: np.ndarray) -> Tuple[bool, str]:
+def _validate_extracted_frame(frame_img) -> Tuple[bool, str]:
     """
     Validate that the extracted image contains exactly ONE rectangular frame.
+
+    Args:
+        frame_img: BGR image or PageAnalysis region
     """
-    if frame_img is None or frame_img.size == 0:
+    if frame_img is None:
         return False, "empty_image"
 
-    img_h, img_w = frame_img.shape[:2]
+    page = _as_page_analysis(frame_img)
+    if page.img.size == 0:
+        return False, "empty_image"
+
+    img_h, img_w = page.height, page.width
 
-    black_mask = _get_color_mask(frame_img, 'black')
-    red_mask = _get_color_mask(frame_img, 'red')
-    combined_mask = cv2.bitwise_or(black_mask, red_mask)
+    combined_mask = cv2.bitwise_or(page.mask('black'), page.mask('red'))
 
     min_line_length = max(30, img_w // 4)
     h_lines, _ = _detect_lines_hough(combined_mask, min_line_length=min_line_length, max_line_gap=10)
+    return _validate_frame_lines(h_lines, img_w)
+
 
+def _validate_frame_lines(h_lines: List, img_w: int) -> Tuple[bool, str]:
+    """
+    Horizontal separator test of _validate_extracted_frame on the horizontal
+    black / red lines of an extracted image of width img_w.
+    """
     if not h_lines:
         return True, "valid"
 
@@ -1097,19 +2068,33 @@ def _validate_extracted_frame(frame_img: np.ndarray) -> Tuple[bool, str]:
     return True, "valid"
 
 
-def _count_frames_in_image(frame_img: np.ndarray, color: str = 'red') -> int:
+def _count_frames_in_image(frame_img, color: str = 'red') -> int:
     """
     Count how many LARGE rectangular frames exist in the image.
+
+    Args:
+        frame_img: BGR image or PageAnalysis region
     """
-    if frame_img is None or frame_img.size == 0:
+    if frame_img is None:
         return 0
 
-    img_h, img_w = frame_img.shape[:2]
+    page = _as_page_analysis(frame_img)
+    if page.img.size == 0:
+        return 0
+
+    img_h, img_w = page.height, page.width
     min_line_length = max(50, min(img_w, img_h) // 4)
 
-    mask = _get_color_mask(frame_img, color)
+    mask = page.mask(color)
     h_lines, v_lines = _detect_lines_hough(mask, min_line_length=min_line_length)
+    return _count_frame_rectangles(h_lines, v_lines, img_w, img_h)
+
 
+def _count_frame_rectangles(h_lines: List, v_lines: List, img_w: int, img_h: int) -> int:
+    """
+    Frame count of _count_frames_in_image from the lines of one color of an
+    extracted image of img_w x img_h.
+    """
     if not h_lines or not v_lines:
         return 0
 
@@ -1130,118 +2115,841 @@ def _count_frames_in_image(frame_img: np.ndarray, color: str = 'red') -> int:
     return len(rectangles)
 
 
-def extract_assembly_images(image, return_coords: bool = False) -> List:
+class FrameLineIndex:
     """
-    組立ページ画像から組立番号ごとの部品一覧枠を検出・抽出する。
+    Page-level frame lines per mask for the post-extraction validation
+    (validation='lines', built by _validation_line_index).
 
-    Args:
-        image: PIL Image または numpy array (BGR)
-        return_coords: Trueの場合、座標情報も一緒に返す
+    The horizontal / vertical lines are stored sorted by position, so
+    validating one extracted image only visits the lines whose row / column
+    falls inside it instead of rerunning Hough on its pixels.
+    """
 
-    Returns:
-        return_coords=False: List[PIL.Image]: 抽出された組立番号画像のリスト（RGB形式）
-        return_coords=True: List[dict]: {'image': PIL.Image, 'region_x': int, 'region_y': int, 'region_width': int, 'region_height': int}
+    def __init__(self, lines: Dict[str, Tuple[List, List]]):
+        self._lines = {}
+        for color, (h_lines, v_lines) in lines.items():
+            self._lines[color] = tuple(self._sorted(l) for l in (h_lines, v_lines))
+
+    @staticmethod
+    def _sorted(lines: List) -> np.ndarray:
+        array = _lines_to_array(lines)
+        return array[np.argsort(array[:, 2], kind='stable')]
+
+    @staticmethod
+    def _clip(lines: np.ndarray, lo: int, hi: int, start: int, end: int, min_length: int) -> np.ndarray:
+        """Lines at positions lo..hi-1, clipped to start..end-1, relative to (start, lo)."""
+        i, j = np.searchsorted(lines[:, 2], (lo, hi))
+        selected = lines[i:j]
+        clipped = np.column_stack((np.maximum(selected[:, 0], start) - start,
+                                   np.minimum(selected[:, 1], end - 1) - start,
+                                   selected[:, 2] - lo))
+        return clipped[clipped[:, 1] - clipped[:, 0] >= min_length]
+
+    def lines_in(self, box: Tuple[int, int, int, int], colors: Tuple[str, ...],
+                 min_length: int) -> Tuple[List, List]:
+        """
+        (horizontal_lines, vertical_lines) of the given colors inside box
+        (x1, y1, x2, y2), clipped to it and in box coordinates. Lines shorter
+        than min_length after clipping are dropped, like the minLineLength of
+        a Hough run on the crop.
+        """
+        x1, y1, x2, y2 = box
+        h_parts, v_parts = [], []
+        for color in colors:
+            h_lines, v_lines = self._lines[color]
+            h_parts.append(self._clip(h_lines, y1, y2, x1, x2, min_length))
+            v_parts.append(self._clip(v_lines, x1, x2, y1, y2, min_length))
+        return ([tuple(l) for l in np.concatenate(h_parts).tolist()],
+                [tuple(l) for l in np.concatenate(v_parts).tolist()])
+
+
+def _validate_extracted_frame_lines(frame_lines: FrameLineIndex,
+                                    box: Tuple[int, int, int, int]) -> Tuple[bool, str]:
     """
-    # Convert PIL to BGR if necessary
-    if isinstance(image, Image.Image):
-        img = np.array(image)
-        if len(img.shape) == 3 and img.shape[2] == 3:
-            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-    else:
-        img = image.copy()
+    _validate_extracted_frame for the extracted image at box (x1, y1, x2, y2)
+    of the page, from the page-level frame lines inside it.
+    """
+    img_w = box[2] - box[0]
+    h_lines, _ = frame_lines.lines_in(box, ('black_red',), max(30, img_w // 4))
+    return _validate_frame_lines(h_lines, img_w)
+
+
+def _count_frames_in_box(frame_lines: FrameLineIndex, box: Tuple[int, int, int, int],
+                         color: str = 'red') -> int:
+    """
+    _count_frames_in_image for the extracted image at box (x1, y1, x2, y2) of
+    the page, from the page-level frame lines inside it.
+    """
+    img_w, img_h = box[2] - box[0], box[3] - box[1]
+    h_lines, v_lines = frame_lines.lines_in(box, (color,), max(50, min(img_w, img_h) // 4))
+    return _count_frame_rectangles(h_lines, v_lines, img_w, img_h)
+
+
+FRAME_VALIDATIONS = ('crop', 'lines')
+
+# Shortest minLineLength of the post-extraction validation (max(30, w // 4) in
+# _validate_extracted_frame, max(50, min(w, h) // 4) in _count_frames_in_image)
+_VALIDATION_MIN_LINE_LENGTH = 30
+
+
+def _validation_line_index(page: PageAnalysis, boxes: List[Tuple[int, int, int, int]]) -> FrameLineIndex:
+    """
+    FrameLineIndex for validation='lines': the full-resolution lines of the
+    masks the post-extraction validation runs Hough on ('black_red' for
+    _validate_extracted_frame, 'red' / 'black' for _count_frames_in_image),
+    detected once with its shortest minLineLength. Each extracted image then
+    keeps the lines inside it that reach its own threshold.
+
+    Only the pixels inside boxes (the extracted images (x1, y1, x2, y2) of the
+    frame candidates) are searched: nothing outside them is ever queried, and
+    text and drawings between the frames would dominate the Hough time.
+    """
+    region = np.zeros((page.height, page.width), dtype=np.uint8)
+    for x1, y1, x2, y2 in boxes:
+        region[y1:y2, x1:x2] = 255
+    red = cv2.bitwise_and(page.mask('red'), region)
+    black = cv2.bitwise_and(page.mask('black'), region)
+    masks = {'red': red, 'black': black, 'black_red': cv2.bitwise_or(black, red)}
+    return FrameLineIndex({color: _detect_lines_hough(mask, min_line_length=_VALIDATION_MIN_LINE_LENGTH)
+                           for color, mask in masks.items()})
+
+
+# Arrow lines are detected only in a band around each frame candidate:
+# from ARROW_SEARCH_MARGIN px outside to _ARROW_INNER_MARGIN px inside its edges
+# (connection tolerance of _is_connected_to_arrow 10 px + line width / Canny offset)
+ARROW_SEARCH_MARGIN = 100
+_ARROW_INNER_MARGIN = 15
+
+# Minimum long side (px) of the coarse page in extract_assembly_images(pyramid=True);
+# the page is reduced by factor = long_side // PYRAMID_WORKING_SIZE (>= 2)
+PYRAMID_WORKING_SIZE = 1000
+
+# Working memory budget (MB) used by the Streamlit pages for extract_assembly_images;
+# larger pages are processed in tiles (max_memory_mb)
+TILED_MEMORY_BUDGET_MB = 256
+
+# Peak working memory of detect_assembly_regions per page pixel (HSV, gray, color
+# masks, label integral and OpenCV temporaries; measured as the peak RSS growth)
+_DETECTION_BYTES_PER_PIXEL = 14
 
+# Smallest tile side (px) in tiled mode, whatever the memory budget
+_MIN_TILE_SIZE = 512
+
+
+def _refine_edge(profile: np.ndarray, start: int, coarse_pos: int, min_count: float) -> int:
+    """
+    Position of the strongest line in a band projection, or coarse_pos when the
+    band has no line. The position is the projection-weighted centre of the run
+    of rows/columns around the peak, so a slightly skewed border spread over
+    several rows resolves to its midline.
+    """
+    if profile.size == 0 or profile.max() < min_count:
+        return coarse_pos
+    peak = int(np.argmax(profile))
+    strong = profile >= profile[peak] * 0.2
+    lo = peak
+    while lo > 0 and strong[lo - 1]:
+        lo -= 1
+    hi = peak
+    while hi < len(profile) - 1 and strong[hi + 1]:
+        hi += 1
+    run = profile[lo:hi + 1].astype(np.float64)
+    centre = lo + float(np.dot(np.arange(len(run)), run) / run.sum())
+    return start + int(round(centre))
+
+
+def _refine_frame_bbox(img: np.ndarray, color: str, bbox: Tuple, radius: int) -> Tuple[int, int, int, int]:
+    """
+    Snap the borders of a frame found on the coarse page to the full-resolution
+    color mask. Each border is searched within +-radius px of its mapped
+    position, using the mask projection along the frame side. The color mask
+    is computed only on these four bands of img, never on the whole page.
+    """
+    x, y, w, h = bbox
     img_h, img_w = img.shape[:2]
-    min_line_length = max(50, min(img_w, img_h) // 20)
 
-    # Detect red frames
-    red_frames = _detect_colored_frames(img, 'red', min_line_length)
+    def band_mask(bx1, by1, bx2, by2):
+        return PageAnalysis(img[by1:by2, bx1:bx2]).mask(color)
 
-    # Detect black frames
-    black_frames = _detect_colored_frames(img, 'black', min_line_length)
+    x1, y1, x2, y2 = x, y, x + w, y + h
 
-    # Combine all frames
-    all_frames = red_frames + black_frames
-    all_frames = _remove_duplicate_rectangles(all_frames)
+    # Only the inner part of each side, so the perpendicular borders do not count
+    cx1, cx2 = max(0, x1 + radius), min(img_w, x2 - radius)
+    cy1, cy2 = max(0, y1 + radius), min(img_h, y2 - radius)
 
-    # Detect blue frames (to exclude frames inside them)
-    blue_frames = _detect_blue_frames(img, min_line_length)
+    def rows(pos):
+        lo, hi = max(0, pos - radius), min(img_h, pos + radius + 1)
+        return _refine_edge(np.count_nonzero(band_mask(cx1, lo, cx2, hi), axis=1), lo, pos,
+                            0.25 * (cx2 - cx1))
 
-    # Detect ALL lines (including diagonal) for arrow detection
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    all_lines = _detect_all_lines_hough(edges, min_line_length=30)
+    def cols(pos):
+        lo, hi = max(0, pos - radius), min(img_w, pos + radius + 1)
+        return _refine_edge(np.count_nonzero(band_mask(lo, cy1, hi, cy2), axis=0), lo, pos,
+                            0.25 * (cy2 - cy1))
 
-    # Filter frames
-    valid_frames = []
+    if cx2 > cx1:
+        y1, y2 = rows(y1), rows(y2)
+    if cy2 > cy1:
+        x1, x2 = cols(x1), cols(x2)
 
-    for frame in all_frames:
-        bbox = frame['bbox']
+    return (int(x1), int(y1), int(x2 - x1), int(y2 - y1))
 
-        # Check 0: Is inside a blue frame
-        if _is_inside_blue_frame(bbox, blue_frames):
-            continue
 
-        # Check 1: Has quantity labels
-        if not _has_quantity_labels(img, bbox):
-            continue
+def _detect_frame_candidates_pyramid(img: np.ndarray, min_line_length: int,
+                                     working_size: int = PYRAMID_WORKING_SIZE,
+                                     line_detector: str = 'hough',
+                                     stats: DetectionStats = _NO_STATS):
+    """
+    Detect red/black frames and blue frames on a downscaled page.
 
-        # Check 2: Has nearby assembly number
-        _, has_number = _find_nearby_number(img, bbox)
-        if not has_number:
-            continue
+    The BGR page is reduced by an integer factor to a long side of
+    working_size..2*working_size px (PageAnalysis.downscaled) and HSV, masks,
+    Hough and Canny run on the reduced page only, so their cost no longer grows
+    with the scan resolution. Frame borders are then refined at full resolution
+    in bands around each candidate (_refine_frame_bbox).
 
-        # Check 3: Is connected to arrow lines
-        if _is_connected_to_arrow(img, bbox, all_lines):
-            continue
+    Returns:
+        Tuple of (frames, blue_frames) in full-resolution coordinates
+    """
+    factor = max(img.shape[:2]) // working_size
+    with stats.stage('downscale'):
+        coarse = PageAnalysis(img).downscaled(factor)
+    scale = 1.0 / factor
+    coarse_min_line = _scaled(min_line_length, scale)
+    radius = 3 * factor
+
+    # Coarse pixel v covers page pixels [v * factor, (v + 1) * factor)
+    def to_page(bbox):
+        x, y, w, h = (int(v) for v in bbox)
+        return (x * factor + factor // 2, y * factor + factor // 2, w * factor, h * factor)
+
+    # 'fused': the lines of all three colors in one pass, handed to the per-color helpers
+    coarse_lines = {}
+    if line_detector == 'fused':
+        coarse_lines = _detect_page_frame_lines(coarse, ('red', 'black', 'blue'), line_detector,
+                                                coarse_min_line, scale=scale, stats=stats)
+
+    frames = []
+    for color in ('red', 'black'):
+        coarse_rects = _detect_colored_frames(coarse, color, coarse_min_line, scale=scale,
+        line_detector=line_detector, lines=coarse_lines.get(color), stats=stats)
+        with stats.stage('refine'):
+            for rect in coarse_rects:
+                bbox = _refine_frame_bbox(img, color, to_page(rect['bbox']), radius)
+                frames.append({'bbox': bbox, 'area': bbox[2] * bbox[3], 'color': color})
+
+    coarse_blue = _detect_blue_frames(coarse, coarse_min_line, scale=scale,
+    line_detector=line_detector, lines=coarse_lines.get('blue'), stats=stats)
+    with stats.stage('refine'):
+        blue_frames = [_refine_frame_bbox(img, 'blue', to_page(b), radius) for b in coarse_blue]
+
+    return frames, blue_frames
+
+
+def _local_arrow_index(page: PageAnalysis, frame_bbox: Tuple, margin: int = ARROW_SEARCH_MARGIN,
+                       inner_margin: int = _ARROW_INNER_MARGIN) -> LineEndpointIndex:
+    """
+    LineEndpointIndex of the lines around one frame, in page coordinates.
+
+    Canny and Hough run only on the band from margin px outside to inner_margin
+    px inside the frame edges; the frame interior (parts drawings) is blanked.
+    A line running into the frame is cut inner_margin px inside the edge, out
+    of reach of count_connections (endpoints closer than 10 px to an edge).
+    """
+    x, y, w, h = frame_bbox
+    x1, y1 = max(0, x - margin), max(0, y - margin)
+    x2, y2 = min(page.width, x + w + margin), min(page.height, y + h + margin)
+    edges = cv2.Canny(page.region(x1, y1, x2, y2).gray, 50, 150)
+    ix1, iy1 = x + inner_margin - x1, y + inner_margin - y1
+    ix2, iy2 = x + w - inner_margin - x1, y + h - inner_margin - y1
+    if ix2 > ix1 and iy2 > iy1:
+        edges[iy1:iy2, ix1:ix2] = 0
+    lines = _detect_all_lines_hough(edges, min_line_length=30)
+    return LineEndpointIndex([(lx1 + x1, ly1 + y1, lx2 + x1, ly2 + y1, angle)
+                              for lx1, ly1, lx2, ly2, angle in lines])
+
+
+def _tile_grid(width: int, height: int, core: int, overlap: int) -> List[Tuple]:
+    """
+    Split the page into core cells of core x core px; each tile is its core
+    cell extended by overlap px on every side (clipped to the page).
 
-        valid_frames.append(frame)
+    Returns:
+        List of ((x1, y1, x2, y2) tile, (x1, y1, x2, y2) core)
+    """
+    tiles = []
+    for cy in range(0, height, core):
+        for cx in range(0, width, core):
+            core_box = (cx, cy, min(width, cx + core), min(height, cy + core))
+            tile_box = (max(0, cx - overlap), max(0, cy - overlap),
+                        min(width, core_box[2] + overlap), min(height, core_box[3] + overlap))
+            tiles.append((tile_box, core_box))
+    return tiles
+
+
+def _detect_frame_candidates_tiled(img: np.ndarray, min_line_length: int, max_memory_mb: float,
+                                   line_detector: str = 'hough',
+                                   stats: DetectionStats = _NO_STATS):
+    """
+    Detect red/black frames and blue frames tile by tile, so that only one
+    tile's HSV / masks are alive at a time.
 
-    # Sort by position (top-to-bottom, left-to-right)
-    valid_frames.sort(key=lambda f: (f['bbox'][1], f['bbox'][0]))
+    Tiles overlap by min_line_length px, so a frame border cut by a seam
+    leaves a piece of Hough-detectable length on both sides; the pieces (and
+    the duplicates found in the overlap) share the same row/column and are
+    joined by _merge_nearby_lines before the rectangles are assembled for the
+    whole page.
 
-    # Extract valid frames with post-extraction validation
-    extracted_images = []
+    Returns:
+        Tuple of (frames, blue_frames) in page coordinates
+    """
+    img_h, img_w = img.shape[:2]
+    overlap = min_line_length
+    tile_side = int(np.sqrt(max_memory_mb * 2**20 / _DETECTION_BYTES_PER_PIXEL))
+    core = max(_MIN_TILE_SIZE, tile_side - 2 * overlap)
+
+    lines = {color: ([], []) for color in ('red', 'black', 'blue')}
+    tiles = _tile_grid(img_w, img_h, core, overlap)
+    stats.count('tiles', len(tiles))
+
+    for (x1, y1, x2, y2), _ in tiles:
+        tile = PageAnalysis(img[y1:y2, x1:x2])
+
+        tile_lines = _detect_page_frame_lines(tile, tuple(lines), line_detector, min_line_length, stats=stats)
+        for color, (h_lines, v_lines) in lines.items():
+            tile_h, tile_v = tile_lines[color]
+            h_lines.extend((s + x1, e + x1, pos + y1) for s, e, pos in tile_h)
+            v_lines.extend((s + y1, e + y1, pos + x1) for s, e, pos in tile_v)
+
+        # Release this tile's arrays before the next one is analysed
+        del tile, tile_lines
+
+    frames = []
+    blue_frames = []
+    for color, (h_lines, v_lines) in lines.items():
+        stats.count(f'lines.{color}', len(h_lines) + len(v_lines))
+        min_size = (60, 40) if color == 'blue' else (80, 60)
+        with stats.stage('rectangles'):
+            rectangles = _rectangles_from_frame_lines(h_lines, v_lines, img_w, img_h, *min_size)
+        stats.count(f'rectangles.{color}', len(rectangles))
+        if color == 'blue':
+            blue_frames = [r['bbox'] for r in rectangles]
+        else:
+            for rect in rectangles:
+                rect['color'] = color
+            frames.extend(rectangles)
+
+    return frames, blue_frames
+
+
+# Page pixels around a frame needed by _has_quantity_labels / _find_nearby_number
+# (search margin 100 px + 20 px side extension) and _local_arrow_index (ARROW_SEARCH_MARGIN)
+_FRAME_CONTEXT_MARGIN = 120
+
+
+def _frame_context(img: np.ndarray, frame_bbox: Tuple,
+                   margin: int = _FRAME_CONTEXT_MARGIN) -> Tuple['PageAnalysis', Tuple]:
+    """
+    PageAnalysis of the page crop around a frame and the frame bbox in crop
+    coordinates. The per-frame checks clip their search regions to the page,
+    and a crop extending margin px beyond the frame (clipped the same way)
+    gives them exactly the same pixels.
+    """
+    x, y, w, h = frame_bbox
+    img_h, img_w = img.shape[:2]
+    x1, y1 = max(0, x - margin), max(0, y - margin)
+    x2, y2 = min(img_w, x + w + margin), min(img_h, y + h + margin)
+    return PageAnalysis(img[y1:y2, x1:x2]), (x - x1, y - y1, w, h)
 
-    for frame in valid_frames:
-        x, y, w, h = frame['bbox']
 
-        # Add margin
+class _FrameCandidate:
+    """
+    One frame candidate and the page crops its checks need, built on first use
+    so that a frame rejected early never pays for the crops of later checks.
+    page is None in tiled and pyramid modes (the crops are then cut from img). With
+    frame_lines, the post-extraction validation queries the page-level lines
+    inside the extracted image instead of running Hough on its pixels.
+    """
+
+    def __init__(self, img: np.ndarray, page: Optional[PageAnalysis], bbox: Tuple,
+                 blue_frames: List[Tuple], frame_lines: Optional[FrameLineIndex] = None):
+        self.img = img
+        self.page = page
+        self.bbox = bbox
+        self.blue_frames = blue_frames
+        self.frame_lines = frame_lines
+
+    @cached_property
+    def context(self) -> Tuple[PageAnalysis, Tuple]:
+        """Page (or crop around the frame) and frame bbox for checks 1-3."""
+        if self.page is None:
+            return _frame_context(self.img, self.bbox)
+        return self.page, self.bbox
+
+    @cached_property
+    def crop_box(self) -> Tuple[int, int, int, int]:
+        """(x1, y1, x2, y2) of the extracted image: 30 px margin, 80 px below for the number."""
+        img_h, img_w = self.img.shape[:2]
+        x, y, w, h = self.bbox
         margin = 30
-        x1 = max(0, x - margin)
-        y1 = max(0, y - margin)
-        x2 = min(img_w, x + w + margin)
+        return (max(0, x - margin), max(0, y - margin),
+                min(img_w, x + w + margin), min(img_h, y + h + 80))
 
-        # Extend downward to capture assembly number
-        y2_extended = min(img_h, y + h + 80)
+    @cached_property
+    def crop(self) -> PageAnalysis:
+        """The extracted image checked by the post-extraction validation."""
+        x1, y1, x2, y2 = self.crop_box
+        if self.page is None:
+            return PageAnalysis(self.img[y1:y2, x1:x2])
+        return self.page.region(x1, y1, x2, y2)
 
-        frame_img = img[y1:y2_extended, x1:x2]
 
-        # Post-extraction validation
-        is_valid, _ = _validate_extracted_frame(frame_img)
-        if not is_valid:
-            continue
+def _check_blue_frame(candidate: _FrameCandidate) -> Optional[str]:
+    if _is_inside_blue_frame(candidate.bbox, candidate.blue_frames):
+        return 'inside_blue_frame'
+    return None
 
-        # Additional check: count frames using color detection
-        frame_count_red = _count_frames_in_image(frame_img, 'red')
-        frame_count_black = _count_frames_in_image(frame_img, 'black')
-        total_frame_count = frame_count_red + frame_count_black
 
-        if total_frame_count > 2:
-            continue
+def _check_quantity_labels(candidate: _FrameCandidate) -> Optional[str]:
+    if not _has_quantity_labels(*candidate.context):
+        return 'no_quantity_labels'
+    return None
+
+
+def _check_assembly_number(candidate: _FrameCandidate) -> Optional[str]:
+    _, has_number = _find_nearby_number(*candidate.context)
+    if not has_number:
+        return 'no_assembly_number'
+    return None
+
+
+def _check_arrow(candidate: _FrameCandidate) -> Optional[str]:
+    # Arrow lines only in a band around this frame (_local_arrow_index)
+    context, context_bbox = candidate.context
+    if _is_connected_to_arrow(context.img, context_bbox, _local_arrow_index(context, context_bbox)):
+        return 'arrow_connected'
+    return None
+
+
+def _check_extracted_frame(candidate: _FrameCandidate) -> Optional[str]:
+    if candidate.frame_lines is None:
+        is_valid, reason = _validate_extracted_frame(candidate.crop)
+    else:
+        is_valid, reason = _validate_extracted_frame_lines(candidate.frame_lines, candidate.crop_box)
+    return None if is_valid else reason
+
+
+def _check_frame_count(candidate: _FrameCandidate) -> Optional[str]:
+    # Count frames using color detection
+    if candidate.frame_lines is None:
+        total_frame_count = (_count_frames_in_image(candidate.crop, 'red') +
+                             _count_frames_in_image(candidate.crop, 'black'))
+    else:
+        total_frame_count = (_count_frames_in_box(candidate.frame_lines, candidate.crop_box, 'red') +
+                             _count_frames_in_box(candidate.frame_lines, candidate.crop_box, 'black'))
+    if total_frame_count > 2:
+        return 'frame_count'
+    return None
+
+
+# Frame checks of detect_assembly_regions (name -> check returning the rejection
+# reason or None), in the default ('fixed') order: checks 0-3 filter the
+# candidates, the post-extraction validation runs on the sorted survivors
+FRAME_CHECKS = {
+    'blue_frame': _check_blue_frame,
+    'quantity_labels': _check_quantity_labels,
+    'assembly_number': _check_assembly_number,
+    'arrow': _check_arrow,
+    'extracted_frame': _check_extracted_frame,
+    'frame_count': _check_frame_count,
+}
+_FILTER_CHECKS = ('blue_frame', 'quantity_labels', 'assembly_number', 'arrow')
+_VALIDATION_CHECKS = ('extracted_frame', 'frame_count')
+
+# filter_order='measured': ascending cost per rejection (seconds per call /
+# rejection rate, each check run first on all candidates) measured with
+# benchmarks/bench_filter_order.py on the sample and synthetic pages
+# (per call / rejection rate: blue_frame 0.01 ms / 4%, quantity_labels 1.7 ms / 13%,
+# arrow 8.3 ms / 29%, assembly_number 0.7 ms / 2%, extracted_frame 8.4 ms / 3%,
+# frame_count 15.3 ms / 5%)
+MEASURED_FILTER_ORDER = ('blue_frame', 'quantity_labels', 'arrow', 'assembly_number',
+                         'extracted_frame', 'frame_count')
+
+
+def _resolve_filter_order(filter_order) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    (checks run while filtering, checks run per frame while yielding) for the
+    filter_order= of detect_assembly_regions.
+    """
+    if filter_order == 'fixed':
+        return _FILTER_CHECKS, _VALIDATION_CHECKS
+    order = MEASURED_FILTER_ORDER if filter_order == 'measured' else tuple(filter_order)
+    if sorted(order) != sorted(FRAME_CHECKS):
+        raise ValueError(f"filter_order must be 'fixed', 'measured' or an order of {tuple(FRAME_CHECKS)}, "
+                         f"got {filter_order!r}")
+    return order, ()
+
+
+def _run_frame_checks(candidate: _FrameCandidate, checks: Tuple[str, ...],
+                      stats: DetectionStats = _NO_STATS) -> Optional[str]:
+    """Run the named checks in order and return the first rejection reason (None if all pass)."""
+    for name in checks:
+        if stats.enabled:
+            start = time.perf_counter()
+            reason = FRAME_CHECKS[name](candidate)
+            stats.record_check(name, time.perf_counter() - start, reason is not None)
+        else:
+            reason = FRAME_CHECKS[name](candidate)
+        if reason is not None:
+            return reason
+    return None
+
+
+def _reject_frame_candidate(img: np.ndarray, page: Optional[PageAnalysis], bbox: Tuple,
+                            blue_frames: List[Tuple], checks: Tuple[str, ...] = _FILTER_CHECKS,
+                            stats: DetectionStats = _NO_STATS,
+                            frame_lines: Optional[FrameLineIndex] = None) -> Optional[str]:
+    """
+    Checks 0-3 of detect_assembly_regions (or the given FRAME_CHECKS) for one
+    frame candidate: the rejection reason, or None if the frame passes. page is
+    None in tiled and pyramid modes (the checks then run on a crop around the
+    frame).
+
+    The checks run cheapest first; arrow lines are only detected (in a band
+    around the frame, _local_arrow_index) for frames that passed checks 0-2.
+    """
+    return _run_frame_checks(_FrameCandidate(img, page, bbox, blue_frames, frame_lines), checks, stats)
+
+
+def _validate_frame_candidate(img: np.ndarray, page: Optional[PageAnalysis], bbox: Tuple,
+                              checks: Tuple[str, ...] = _VALIDATION_CHECKS,
+                              stats: DetectionStats = _NO_STATS,
+                              frame_lines: Optional[FrameLineIndex] = None
+                              ) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Post-extraction validation of one filtered frame: (region, None) with the
+    crop region (margin + assembly number below), or (None, rejection reason).
+    frame_lines: page-level lines (FrameLineIndex, validation='lines');
+    without them the validation runs Hough on the crop.
+    """
+    candidate = _FrameCandidate(img, page, bbox, [], frame_lines)
+    reason = _run_frame_checks(candidate, checks, stats)
+    if reason is not None:
+        return None, reason
+
+    # Pythonのint型に変換
+    x1, y1, x2, y2 = candidate.crop_box
+    return {
+        'region_x': int(x1),
+        'region_y': int(y1),
+        'region_width': int(x2 - x1),
+        'region_height': int(y2 - y1)
+    }, None
+
+
+@contextmanager
+def _frame_map(workers: int):
+    """
+    Yield a map(func, frames) for the per-frame checks: the builtin (lazy) map
+    for workers <= 1, otherwise the map of a thread pool (results in input
+    order). OpenCV releases the GIL, so the checks run in parallel.
+
+    OpenCV's own thread count (cv2.setNumThreads) is process-global, so it is
+    left to the caller: lower it to about cpu_count // workers before
+    detecting if the pool and OpenCV's threads oversubscribe the cores.
+    """
+    if workers <= 1:
+        yield map
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield pool.map
+
+
+def _page_to_bgr(image, max_memory_mb: Optional[float] = None) -> np.ndarray:
+    """Convert PIL to BGR if necessary (numpy input is copied unless memory is bounded)."""
+    if isinstance(image, Image.Image):
+        img = np.array(image)
+        if len(img.shape) == 3 and img.shape[2] == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        return img
+    if max_memory_mb is not None:
+        # The page is only read; skip the full-size copy when memory is bounded
+        return image
+    return image.copy()
+
+
+def extract_assembly_images(image, return_coords: bool = False,
+                            pyramid: bool = False,
+                            working_size: int = PYRAMID_WORKING_SIZE,
+                            max_memory_mb: Optional[float] = None,
+                            workers: int = 1,
+                            line_detector: str = 'hough',
+                            filter_order='fixed',
+                            validation: str = 'crop',
+                            return_stats: bool = False) -> List:
+    """
+    組立ページ画像から組立番号ごとの部品一覧枠を検出・抽出する。
+
+    Args:
+        image: PIL Image または numpy array (BGR)
+        return_coords: Trueの場合、座標情報も一緒に返す
+        pyramid: Trueの場合、枠候補の検出（色変換・マスク・エッジを含む）を整数倍率で縮小した
+                 画像で行い、枠の境界付近と枠ごとのクロップのみ原寸で処理する（高解像度スキャン向け）。
+                 返す座標は原寸画像の座標。
+        working_size: pyramid=True時の縮小画像の長辺の下限 (px)。
+                      長辺がこの2倍未満の画像は通常処理
+        max_memory_mb: 検出処理の作業メモリの上限 (MB)。ページ全体を一度に処理すると超える場合は、
+                       重なりのあるタイルごとに処理する（入力画像自体のメモリは含まない。
+                       pyramid より優先）
+        workers: 枠候補ごとのチェック・抽出後バリデーションを実行するスレッド数。
+                 2以上の場合はスレッドプールで並列に実行する（結果と順序は workers=1 と同じ）。
+                 OpenCV のスレッド数（cv2.setNumThreads、プロセス全体の設定）は変更しないので、
+                 必要なら呼び出し側で CPU数 // workers 程度に下げる
+        line_detector: 枠線の検出方法。'hough'（HoughLinesP）、'morph'
+                       （縦横の長いカーネルによるオープニング + ランレングス抽出。大きなページで高速）
+                       または 'fused'（'morph' と同じ線を、赤・黒・青のマスクの和で1回だけ
+                       長いカーネルの処理をして求める。'morph' よりさらに高速）
+        filter_order: 枠ごとのチェック（FRAME_CHECKS）の実行順。'fixed' は青枠・数量ラベル・近接番号・
+                      矢印で絞り込んでから、残った枠を抽出後バリデーションしつつ順に返す。
+                      'measured'（MEASURED_FILTER_ORDER）またはチェック名の並びを指定すると、
+                      すべてのチェックをその順に実行し、最初に不合格になった時点で打ち切る
+                      （結果は 'fixed' と同じ。除外理由の件数は順序によって変わる）
+        validation: 抽出後バリデーション（1つの枠だけを含むか）の方法。'crop'（切り出した画像ごとに
+                    その大きさに応じた minLineLength で Hough を実行）または 'lines'（バリデーションする
+                    枠候補の切り出し範囲で原寸のマスクに最短の minLineLength で1回だけ Hough を実行し、
+                    各切り出し範囲内の線分のうちその画像の閾値以上のものを使う。枠ごとの処理は線分数に比例する）。
+                    HoughLinesP は点をランダムな順に処理するため、'lines' の結果は 'crop' とまれに異なる
+                    （サンプルページでは同じ）。タイル処理・pyramid では常に 'crop' で実行する
+        return_stats: Trueの場合、ステージごとの処理時間・件数（DetectionStats）も返す
+
+    Returns:
+        return_coords=False: List[PIL.Image]: 抽出された組立番号画像のリスト（RGB形式）
+        return_coords=True: List[dict]: {'image': PIL.Image, 'region_x': int, 'region_y': int, 'region_width': int, 'region_height': int}
+        return_stats=True: (上記のリスト, DetectionStats)
+    """
+    img = _page_to_bgr(image, max_memory_mb)
+    stats = DetectionStats() if return_stats else _NO_STATS
+    regions = detect_assembly_regions(img, pyramid=pyramid, working_size=working_size,
+                                      max_memory_mb=max_memory_mb, workers=workers,
+                                      line_detector=line_detector, filter_order=filter_order,
+                                      validation=validation, stats=stats)
+    with stats.stage('crop'):
+        images = crop_assembly_regions(img, regions, return_coords=return_coords)
+    return (images, stats) if return_stats else images
+
+
+def iter_assembly_images(image, return_coords: bool = False,
+                         pyramid: bool = False,
+                         working_size: int = PYRAMID_WORKING_SIZE,
+                         max_memory_mb: Optional[float] = None,
+                         workers: int = 1,
+                         line_detector: str = 'hough',
+                         filter_order='fixed',
+                         validation: str = 'crop',
+                         stats: DetectionStats = _NO_STATS):
+    """
+    extract_assembly_images のジェネレーター版。
+    枠が抽出後バリデーション（_validate_extracted_frame・_count_frames_in_image）を通過するたびに
+    切り出して yield する。順序・内容は extract_assembly_images と同じ。
+
+    Args:
+        stats: ステージごとの処理時間と件数を記録する DetectionStats
+               （最後まで消費すると extract_assembly_images(return_stats=True) と同じ項目になる）
+
+    Yields:
+        return_coords=False: PIL.Image（RGB形式）
+        return_coords=True: {'image': PIL.Image, 'region_x': int, 'region_y': int, 'region_width': int, 'region_height': int}
+    """
+    img = _page_to_bgr(image, max_memory_mb)
+    for region in iter_assembly_regions(img, pyramid=pyramid, working_size=working_size,
+                                        max_memory_mb=max_memory_mb, workers=workers,
+                                        line_detector=line_detector, filter_order=filter_order,
+                                        validation=validation, stats=stats):
+        with stats.stage('crop'):
+            item = crop_assembly_regions(img, [region], return_coords=return_coords)[0]
+        yield item
+
+
+def detect_assembly_regions(img: np.ndarray, pyramid: bool = False,
+                            working_size: int = PYRAMID_WORKING_SIZE,
+                            max_memory_mb: Optional[float] = None,
+                            workers: int = 1,
+                            line_detector: str = 'hough',
+                            filter_order='fixed',
+                            validation: str = 'crop',
+                            stats: DetectionStats = _NO_STATS) -> List[Dict]:
+    """
+    組立ページ画像（BGR）から組立番号画像の切り出し領域を検出する（画像は生成しない）。
+
+    Args:
+        max_memory_mb: 作業メモリの上限 (MB)。超える場合はタイル処理（extract_assembly_images 参照）
+        workers: 枠ごとのチェックを実行するスレッド数（extract_assembly_images 参照）
+        line_detector: 枠線の検出方法（extract_assembly_images 参照）
+        filter_order: 枠ごとのチェックの実行順（extract_assembly_images 参照）
+        validation: 抽出後バリデーションの方法（extract_assembly_images 参照）
+        stats: ステージごとの処理時間と件数（検出線分数・NMS前後の矩形数・
+               フィルタごとの除外数）、チェックごとの実行回数・除外数・処理時間
+               （DetectionStats.checks）を記録する DetectionStats
+
+    Returns:
+        List[dict]: {'region_x': int, 'region_y': int, 'region_width': int, 'region_height': int}
+    """
+    return list(iter_assembly_regions(img, pyramid=pyramid, working_size=working_size,
+                                      max_memory_mb=max_memory_mb, workers=workers,
+                                      line_detector=line_detector, filter_order=filter_order,
+                                      validation=validation, stats=stats))
+
+
+def iter_assembly_regions(img: np.ndarray, pyramid: bool = False,
+                          working_size: int = PYRAMID_WORKING_SIZE,
+                          max_memory_mb: Optional[float] = None,
+                          workers: int = 1,
+                          line_detector: str = 'hough',
+                          filter_order='fixed',
+                          validation: str = 'crop',
+                          stats: DetectionStats = _NO_STATS):
+    """
+    detect_assembly_regions のジェネレーター版。
+    枠候補の検出・フィルタリングはまとめて行い、抽出後バリデーションを通過した領域から順に yield する。
+    """
+    img_h, img_w = img.shape[:2]
+    min_line_length = max(50, min(img_w, img_h) // 20)
+    if validation not in FRAME_VALIDATIONS:
+        raise ValueError(f"validation must be one of {FRAME_VALIDATIONS}, got {validation!r}")
+    filter_checks, validation_checks = _resolve_filter_order(filter_order)
+
+    tiled = (max_memory_mb is not None and
+             img_h * img_w * _DETECTION_BYTES_PER_PIXEL > max_memory_mb * 2**20)
+
+    use_pyramid = not tiled and pyramid and max(img_h, img_w) // working_size >= 2
+
+    # HSV / masks / gray are computed once and shared by all helpers (tiled and
+    # pyramid modes never build full-resolution page-sized arrays: tiles or the
+    # reduced page, and per-frame crops only)
+    page = None if tiled or use_pyramid else PageAnalysis(img)
+
+    if tiled:
+        all_frames, blue_frames = _detect_frame_candidates_tiled(
+            img, min_line_length, max_memory_mb, line_detector=line_detector, stats=stats)
+        stats.count('rectangles.before_nms', len(all_frames))
+        with stats.stage('nms'):
+            all_frames = _remove_duplicate_rectangles(all_frames)
+    elif use_pyramid:
+        # Coarse-to-fine: candidates on the downscaled page, borders refined at full size
+        all_frames, blue_frames = _detect_frame_candidates_pyramid(
+            img, min_line_length, working_size, line_detector=line_detector, stats=stats)
+        stats.count('rectangles.before_nms', len(all_frames))
+        with stats.stage('nms'):
+            all_frames = _remove_duplicate_rectangles(all_frames)
+    else:
+        # 'fused': the lines of all three colors in one pass, handed to the per-color helpers
+        frame_lines = {}
+        if line_detector == 'fused':
+            frame_lines = _detect_page_frame_lines(page, ('red', 'black', 'blue'), line_detector,
+                                                   min_line_length, stats=stats)
+
+        # Detect red frames
+        red_frames = _detect_colored_frames(page, 'red', min_line_length, line_detector=line_detector,
+                                            lines=frame_lines.get('red'), stats=stats)
+
+        # Detect black frames
+        black_frames = _detect_colored_frames(page, 'black', min_line_length, line_detector=line_detector,
+                                              lines=frame_lines.get('black'), stats=stats)
+
+        # Combine all frames
+        all_frames = red_frames + black_frames
+        stats.count('rectangles.before_nms', len(all_frames))
+        with stats.stage('nms'):
+            all_frames = _remove_duplicate_rectangles(all_frames)
+
+        # Detect blue frames (to exclude frames inside them)
+        blue_frames = _detect_blue_frames(page, min_line_length, line_detector=line_detector,
+                                          lines=frame_lines.get('blue'), stats=stats)
+    stats.count('rectangles.after_nms', len(all_frames))
+
+    if workers > 1 and page is not None:
+        # The checks share the lazily cached page arrays: compute them before the threads start
+        with stats.stage('masks'):
+            page.gray
+            page.mask('red'), page.mask('black')
+            page.integral('label_red')
+
+    # validation='lines': the post-extraction validation looks up the lines
+    # inside each extracted image instead of running Hough on it (full-page
+    # mode only; tiled and pyramid modes have no page-sized masks and keep
+    # running Hough on each crop). The index covers
+    # the frames that reach the validation: all candidates when filter_order
+    # runs it while filtering, else the filtered frames
+    use_line_index = validation == 'lines' and page is not None
+
+    def validation_line_index(frames):
+        with stats.stage('validation'):
+            return _validation_line_index(
+                page, [_FrameCandidate(img, page, frame['bbox'], []).crop_box for frame in frames])
+
+    line_index = None
+    if use_line_index and set(filter_checks) & set(_VALIDATION_CHECKS):
+        line_index = validation_line_index(all_frames)
+
+    # Filter and validate frames (workers > 1: thread pool, results in input order;
+    # arrow lines are detected here, around the frames that passed the cheaper checks)
+    with _frame_map(workers) as frame_map:
+        with stats.stage('filtering'):
+            reasons = list(frame_map(
+                lambda frame: _reject_frame_candidate(img, page, frame['bbox'], blue_frames,
+                                                      filter_checks, stats, line_index),
+                all_frames))
+        valid_frames = []
+        for frame, reason in zip(all_frames, reasons):
+            if reason is None:
+                valid_frames.append(frame)
+            else:
+                stats.count(f'rejected.{reason}')
+
+        # Sort by position (top-to-bottom, left-to-right)
+        valid_frames.sort(key=lambda f: (f['bbox'][1], f['bbox'][0]))
+        if use_line_index and line_index is None and validation_checks:
+            line_index = validation_line_index(valid_frames)
+
+        # Extract valid frames with post-extraction validation
+        # (timed per frame so the consumer's time between yields is not counted)
+        n_regions = 0
+        results = frame_map(lambda frame: _validate_frame_candidate(img, page, frame['bbox'],
+                                                                    validation_checks, stats, line_index),
+                            valid_frames)
+        for _ in valid_frames:
+            with stats.stage('validation'):
+                region, reason = next(results)
+            if region is None:
+                stats.count(f'rejected.{reason}')
+                continue
+            n_regions += 1
+            yield region
+    stats.count('regions', n_regions)
+
+
+
+def crop_assembly_regions(img: np.ndarray, regions: List[Dict], return_coords: bool = False) -> List:
+    """
+    detect_assembly_regions() の領域を切り出して PIL Image（RGB）にする。
+
+    Returns:
+        extract_assembly_images と同じ形式
+    """
+    extracted_images = []
+
+    for region in regions:
+        x1, y1 = region['region_x'], region['region_y']
+        x2, y2 = x1 + region['region_width'], y1 + region['region_height']
 
         # Convert BGR to RGB and create PIL Image
-        frame_rgb = cv2.cvtColor(frame_img, cv2.COLOR_BGR2RGB)
+        frame_rgb = cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
         pil_img = Image.fromarray(frame_rgb)
 
         if return_coords:
-            # 座標情報も含めて返す（Pythonのint型に変換）
-            extracted_images.append({
-                'image': pil_img,
-                'region_x': int(x1),
-                'region_y': int(y1),
-                'region_width': int(x2 - x1),
-                'region_height': int(y2_extended - y1)
-            })
+            # 座標情報も含めて返す
+            extracted_images.append({'image': pil_img, **region})
         else:
             extracted_images.append(pil_img)
 
@@ -3,6 +3,7 @@ import time
 from dotenv import load_dotenv, find_dotenv
 from supabase import create_client, Client
 from io import BytesIO
+from typing import Optional
 
 # Load environment variables
 # Try to find .env file
@@ -65,27 +66,26 @@ def get_supabase_client() -> Client:
     _supabase = create_client(url, key)
     return _supabase
 
-def upload_image_to_supabase(image, filename: str) -> str:
+# Storageに保存する画像の長辺の上限 (px)
+IMAGE_MAX_SIZE = 2000
+
+def encode_image_webp(image) -> bytes:
     """
-    画像をSupabase Storageにアップロードし、公開URLを返す
+    画像をStorage保存用のWebPにする（長辺 IMAGE_MAX_SIZE px まで縮小）
 
     Args:
         image: PIL Imageオブジェクト（RGB or RGBA）
-        filename: 保存するファイル名
 
     Returns:
-        公開URL
+        WebPのバイト列
     """
-    supabase = get_supabase_client()
-
     # 画像をWebP形式に変換してバッファに保存
     buffer = BytesIO()
 
     # 画像のサイズを調整（最大2000px）
-    max_size = 2000
     width, height = image.size
-    if max(width, height) > max_size:
-        ratio = max_size / max(width, height)
+    if max(width, height) > IMAGE_MAX_SIZE:
+        ratio = IMAGE_MAX_SIZE / max(width, height)
         new_width = int(width * ratio)
         new_height = int(height * ratio)
         image = image.resize((new_width, new_height))
@@ -97,13 +97,25 @@ def upload_image_to_supabase(image, filename: str) -> str:
         image.save(buffer, format='WebP', lossless=True)
     else:
         image.save(buffer, format='WebP', quality=85)
-    buffer.seek(0)
+    return buffer.getvalue()
+
+def upload_image_to_supabase(image, filename: str, client: Optional[Client] = None) -> str:
+    """
+    画像をSupabase Storageにアップロードし、公開URLを返す
+
+    Args:
+        image: PIL Imageオブジェクト（RGB or RGBA）
+        filename: 保存するファイル名
+        client: 使用するクライアント（省略時は get_supabase_client()）
+
+    Returns:
+        公開URL
+    """
+    supabase = client if client is not None else get_supabase_client()
 
     # Supabase Storageにアップロード
     try:
-        # BytesIOをbytesに変換
-        buffer.seek(0)
-        file_data = buffer.getvalue()
+        file_data = encode_image_webp(image)
 
         # upsert: "true" で既存ファイルを上書き
         response = supabase.storage.from_("product-images").upload(